@@ -0,0 +1,214 @@
+"""
+ImageConverter benchmark
+
+Times every source -> target pair convert_image() supports on the
+synthetic corpus, with and without max_compression, and saves the
+results as JSON. Each case runs in a fresh process so its peak RSS is
+its own.
+
+Usage:
+    python benchmarks/bench_converter.py [--sizes small] [--repeat 5] [-o results.json]
+    python benchmarks/bench_converter.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import corpus  # noqa: E402
+from core.converter import OUTPUT_FORMATS, ImageConverter  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# "jpeg" is an alias of "jpg"; timing both adds nothing
+TARGETS = tuple(fmt for fmt in OUTPUT_FORMATS if fmt != "jpeg")
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, if available"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def run_case(case):
+    """Run one benchmark case (in a worker process)"""
+    from PIL import Image
+
+    out_dir = tempfile.mkdtemp(prefix="prism-bench-")
+    try:
+        latencies = []
+        save_path = None
+        error = None
+        rss_before = _peak_rss_mb()
+        for _ in range(case["warmup"] + case["repeat"]):
+            started = time.perf_counter()
+            try:
+                save_path = ImageConverter.convert_image(
+                    case["path"], case["target"], out_dir,
+                    preserve_metadata=False,
+                    max_compression=case["max_compression"]
+                )
+            except Exception as e:
+                error = str(e)
+                break
+            latencies.append(time.perf_counter() - started)
+        latencies = latencies[case["warmup"]:]
+
+        result = dict(case)
+        result["error"] = error
+        if error or not latencies:
+            return result
+
+        with Image.open(case["path"]) as img:
+            megapixels = img.size[0] * img.size[1] / 1e6
+        latency_ms = [t * 1000 for t in latencies]
+        mean = statistics.mean(latencies)
+        peak = _peak_rss_mb()
+        result.update({
+            "latency_ms": {
+                "min": min(latency_ms),
+                "p50": _percentile(latency_ms, 50),
+                "p90": _percentile(latency_ms, 90),
+                "p99": _percentile(latency_ms, 99),
+                "mean": statistics.mean(latency_ms),
+            },
+            "files_per_s": 1.0 / mean,
+            "mpix_per_s": megapixels / mean,
+            "input_bytes": os.path.getsize(case["path"]),
+            "output_bytes": os.path.getsize(save_path),
+            "peak_rss_mb": peak,
+            "peak_rss_delta_mb": None if peak is None else peak - rss_before,
+        })
+        return result
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def case_id(case):
+    """Stable identifier used to match cases across runs"""
+    mode = "maxc" if case["max_compression"] else "default"
+    return f'{case["kind"]}_{case["size"]}.{case["source"]}->{case["target"]}:{mode}'
+
+
+def build_cases(files, targets, repeat, warmup):
+    """Cross the corpus with every target and compression setting"""
+    cases = []
+    for path, kind, size_name, fmt in files:
+        for target in targets:
+            for max_compression in (False, True):
+                case = {
+                    "path": path, "kind": kind, "size": size_name,
+                    "source": fmt, "target": target,
+                    "max_compression": max_compression,
+                    "repeat": repeat, "warmup": warmup,
+                }
+                case["id"] = case_id(case)
+                cases.append(case)
+    return cases
+
+
+def run(args):
+    """Generate the corpus, run every case and write the JSON report"""
+    files = corpus.generate(args.corpus, args.sizes, args.sources)
+    cases = build_cases(files, args.targets, args.repeat, args.warmup)
+
+    from PIL import __version__ as pillow_version
+
+    # A fresh spawned process per case keeps peak RSS figures independent
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        for n, result in enumerate(pool.imap(run_case, cases), start=1):
+            results.append(result)
+            if result.get("error"):
+                status = "error: " + result["error"]
+            else:
+                status = "p50 %.1f ms, %d B" % (result["latency_ms"]["p50"], result["output_bytes"])
+            print(f"[{n}/{len(cases)}] {result['id']}: {status}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": pillow_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+    return 0
+
+
+def compare(before_path, after_path):
+    """Print per-case changes in median latency, output size and peak RSS"""
+    with open(before_path, encoding="utf-8") as f:
+        before = {r["id"]: r for r in json.load(f)["results"] if not r.get("error")}
+    with open(after_path, encoding="utf-8") as f:
+        after = {r["id"]: r for r in json.load(f)["results"] if not r.get("error")}
+
+    def change(old, new):
+        if not old or new is None:
+            return "     n/a"
+        return "%+7.1f%%" % ((new - old) / old * 100)
+
+    print(f"{'case':<48} {'p50':>8} {'size':>8} {'rss':>8}")
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        print(f"{key:<48} "
+              f"{change(old['latency_ms']['p50'], new['latency_ms']['p50'])} "
+              f"{change(old['output_bytes'], new['output_bytes'])} "
+              f"{change(old['peak_rss_mb'], new['peak_rss_mb'])}")
+    for key in sorted(set(before) ^ set(after)):
+        print(f"{key:<48} only in {'before' if key in before else 'after'}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ImageConverter")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "prism-bench-corpus"),
+                        help="Corpus folder (generated on first use)")
+    parser.add_argument("--sizes", nargs="+", choices=corpus.SIZES, default=["small"])
+    parser.add_argument("--sources", nargs="+", choices=corpus.SOURCE_FORMATS, default=None)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="Diff two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
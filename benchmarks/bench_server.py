@@ -0,0 +1,162 @@
+"""
+Conversion service load test
+
+Starts `prism serve` on a free localhost port (or targets a running
+one), then keeps a fixed number of clients posting the same synthetic
+image over keep-alive connections. Reports throughput, latency
+percentiles and how many requests were turned away with 429, followed
+by the service's own /metrics.
+
+Usage:
+    python benchmarks/bench_server.py [--clients 16] [--requests 200] [--format webp]
+    python benchmarks/bench_server.py --port 8765 --no-spawn
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import corpus  # noqa: E402
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def make_source(kind, size_name):
+    """Encode one corpus image as PNG bytes"""
+    img = corpus.make_image(kind, corpus.SIZES[size_name])
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def request(reader, writer, method, path, body=b""):
+    """Send one request on a keep-alive connection; returns (status, body)"""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n")
+    writer.write(head.encode("latin-1"))
+    writer.write(body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    close = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            close = value.strip().lower() == "close"
+    payload = await reader.readexactly(length)
+    return status, payload, close
+
+
+async def client(host, port, path, source, counter, results):
+    """Post the source until the shared request budget is used up"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] > 0:
+            counter[0] -= 1
+            started = time.perf_counter()
+            status, payload, close = await request(reader, writer, "POST", path, source)
+            results.append((status, time.perf_counter() - started, len(payload)))
+            if close:
+                writer.close()
+                if status == 429:
+                    await asyncio.sleep(0.05)
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+
+async def load(args, host, port, source):
+    """Run the clients and collect (status, seconds, bytes) per request"""
+    path = f"/convert?format={args.format}"
+    counter = [args.requests]
+    results = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, path, source, counter, results) for _ in range(args.clients)
+    ))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics, _ = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+    return results, elapsed, json.loads(metrics)
+
+
+def report(results, elapsed, metrics, source):
+    """Print a summary of a load run"""
+    statuses = {}
+    for status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    ok = [seconds * 1000 for status, seconds, _ in results if status == 200]
+    print(f"{len(results)} requests in {elapsed:.2f} s, source {len(source)} B")
+    print("status counts: " + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())))
+    if ok:
+        print(f"converted/s {len(ok) / elapsed:.1f}  latency ms "
+              f"p50 {_percentile(ok, 50):.1f}  p95 {_percentile(ok, 95):.1f}  "
+              f"p99 {_percentile(ok, 99):.1f}")
+    print(json.dumps(metrics, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the conversion service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0,
+                        help="Port of a running service (with --no-spawn)")
+    parser.add_argument("--no-spawn", action="store_true",
+                        help="Use an already running service instead of starting one")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections")
+    parser.add_argument("--requests", type=int, default=200, help="Total requests")
+    parser.add_argument("--format", default="webp", help="Target format")
+    parser.add_argument("--kind", choices=corpus.KINDS, default="photo")
+    parser.add_argument("--size", choices=corpus.SIZES, default="small")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Worker processes of the spawned service")
+    parser.add_argument("--queue", type=int, default=None,
+                        help="Admission queue of the spawned service")
+    args = parser.parse_args(argv)
+
+    source = make_source(args.kind, args.size)
+    service = None
+    port = args.port
+    if not args.no_spawn:
+        command = [sys.executable, os.path.join(ROOT, "prism.py"), "serve",
+                   "--host", args.host, "--port", "0"]
+        if args.workers:
+            command += ["-j", str(args.workers)]
+        if args.queue is not None:
+            command += ["--queue", str(args.queue)]
+        service = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        port = json.loads(service.stdout.readline())["port"]
+
+    try:
+        results, elapsed, metrics = asyncio.run(load(args, args.host, port, source))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+    report(results, elapsed, metrics, source)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
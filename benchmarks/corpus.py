@@ -0,0 +1,180 @@
+"""
+Deterministic synthetic image corpus for benchmarks
+
+Every image is derived from a fixed seed, so two machines (or two runs)
+generate identical pixels. Kinds:
+    photo  - smooth gradients with fine grain, like a camera photo
+    flat   - a few solid shapes, like UI screenshots or logos
+    alpha  - RGBA with a soft radial transparency mask
+    deep   - 16-bit grayscale gradient (high bit depth)
+
+Usage:
+    python benchmarks/corpus.py OUTPUT_DIR [--sizes small medium]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.converter import ensure_heif_support  # noqa: E402
+
+SEED = 20240601
+
+SIZES = {
+    "small": (640, 480),
+    "medium": (1920, 1080),
+    "large": (4000, 3000),
+}
+
+KINDS = ("photo", "flat", "alpha", "deep")
+
+# Source formats written for every kind, and kinds each format can hold
+SOURCE_FORMATS = {
+    "png": KINDS,
+    "jpg": ("photo", "flat"),
+    "webp": ("photo", "flat", "alpha"),
+    "tiff": KINDS,
+    "bmp": ("photo", "flat"),
+    "gif": ("flat",),
+    "heic": ("photo", "flat"),
+}
+
+
+def _noise(size, seed):
+    """Deterministic grayscale noise image"""
+    from PIL import Image
+
+    width, height = size
+    rng = random.Random(seed)
+    data = rng.getrandbits(8 * width * height).to_bytes(width * height, "little")
+    return Image.frombytes("L", size, data)
+
+
+def _gradient(size, direction):
+    """Linear gradient stretched to size"""
+    from PIL import Image
+
+    grad = Image.linear_gradient("L")
+    if direction == "horizontal":
+        grad = grad.rotate(90)
+    return grad.resize(size)
+
+
+def make_image(kind, size, seed=SEED):
+    """
+    Generate one synthetic image
+
+    Args:
+        kind: One of KINDS
+        size: (width, height)
+        seed: Base seed; the same arguments always give the same pixels
+
+    Returns:
+        PIL.Image.Image
+    """
+    from PIL import Image, ImageDraw, ImageFilter
+
+    # Distinct but reproducible stream per kind and size
+    seed = seed + KINDS.index(kind) * 1000 + size[0]
+
+    if kind == "photo":
+        red = _gradient(size, "vertical")
+        green = _gradient(size, "horizontal")
+        blue = Image.radial_gradient("L").resize(size)
+        base = Image.merge("RGB", (red, green, blue))
+        grain = _noise(size, seed).filter(ImageFilter.GaussianBlur(1.5))
+        return Image.blend(base, Image.merge("RGB", (grain, grain, grain)), 0.25)
+
+    if kind == "flat":
+        rng = random.Random(seed)
+        img = Image.new("RGB", size, (24, 24, 27))
+        draw = ImageDraw.Draw(img)
+        width, height = size
+        for _ in range(12):
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            x1, y1 = x0 + rng.randrange(width // 2), y0 + rng.randrange(height // 2)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            if rng.random() < 0.5:
+                draw.rectangle((x0, y0, x1, y1), fill=color)
+            else:
+                draw.ellipse((x0, y0, x1, y1), fill=color)
+        return img
+
+    if kind == "alpha":
+        img = make_image("photo", size, seed).convert("RGBA")
+        mask = Image.radial_gradient("L").resize(size)
+        img.putalpha(mask.point(lambda v: 255 - v))
+        return img
+
+    if kind == "deep":
+        grad = _gradient(size, "horizontal").convert("I")
+        return grad.point(lambda v: v * 257).convert("I;16")
+
+    raise ValueError(f"Unknown corpus kind: {kind}")
+
+
+def corpus_path(output_dir, kind, size_name, fmt):
+    """Path of one corpus file"""
+    return os.path.join(output_dir, f"{kind}_{size_name}.{fmt}")
+
+
+def generate(output_dir, sizes=("small", "medium"), formats=None):
+    """
+    Write the corpus, reusing files that already exist
+
+    Args:
+        output_dir: Folder for the corpus
+        sizes: Names from SIZES
+        formats: Source formats to write (defaults to all of SOURCE_FORMATS)
+
+    Returns:
+        list: (path, kind, size_name, fmt) for every corpus file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = []
+    for size_name in sizes:
+        for kind in KINDS:
+            img = None
+            for fmt in formats or SOURCE_FORMATS:
+                if kind not in SOURCE_FORMATS[fmt]:
+                    continue
+                path = corpus_path(output_dir, kind, size_name, fmt)
+                if not os.path.exists(path):
+                    if img is None:
+                        img = make_image(kind, SIZES[size_name])
+                    _save(img, path, fmt)
+                files.append((path, kind, size_name, fmt))
+    return files
+
+
+def _save(img, path, fmt):
+    """Save a corpus image in a source format"""
+    from PIL import Image
+
+    if fmt == "heic":
+        ensure_heif_support()
+    if fmt in ("jpg", "bmp", "heic") and img.mode != "RGB":
+        img = img.convert("RGB")
+    elif fmt == "gif":
+        img = img.convert("P", palette=Image.ADAPTIVE)
+    kwargs = {"quality": 90} if fmt in ("jpg", "webp", "heic") else {}
+    img.save(path, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the benchmark corpus")
+    parser.add_argument("output_dir")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    args = parser.parse_args(argv)
+
+    for path, _, _, _ in generate(args.output_dir, args.sizes):
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Startup-time budget check
+
+Imports each entry module in a fresh interpreter with `-X importtime`,
+reports the total import time and fails if a module exceeds its budget
+or pulls in a dependency that should only load on demand.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--scale FACTOR]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> (budget in ms, modules that must not be imported at startup)
+BUDGETS = {
+    "core.cli": (80, ("PIL", "pillow_heif", "tkinter", "customtkinter")),
+    "ui.app": (300, ("pillow_heif", "core.converter", "core.batch")),
+}
+
+
+def measure(module):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        tuple: (total import time in ms, set of imported module names)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    total_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        imported.add(name.strip())
+    return total_us / 1000.0, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Runs per module; the fastest is reported")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every budget (for slow CI machines)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        try:
+            runs = [measure(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            # Optional stacks (e.g. Tk on a headless box) may be missing
+            print(f"SKIP  {module}: {str(e).splitlines()[-1]}")
+            continue
+
+        best_ms = min(ms for ms, _ in runs)
+        imported = runs[0][1]
+        limit = budget * args.scale
+        leaked = [name for name in forbidden if name in imported]
+
+        ok = best_ms <= limit and not leaked
+        failed |= not ok
+        print(f"{'OK' if ok else 'FAIL':<5} {module}: {best_ms:.1f} ms (budget {limit:.0f} ms)")
+        for name in leaked:
+            print(f"      imports {name} eagerly")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
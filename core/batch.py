@@ -0,0 +1,930 @@
+"""Parallel batch conversion engine"""
+
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+
+from .converter import ImageConverter, classify_error, open_image
+from .dedupe import (
+    DEFAULT_COLLISION_POLICY, duplicate_groups, link_output, output_key, resolve_collisions
+)
+from .errors import OutputCollisionError
+from .journal import job_key
+from .manifest import OutputManifest
+from .memory import MemoryBudget, default_memory_budget, estimate_footprint
+from .metrics import NULL_RECORDER, StageRecorder
+from .quality import QualityCache, QualityTarget
+from .schedule import DEFAULT_SCHEDULE, schedule
+
+
+class BatchJob:
+    """A single file queued for conversion"""
+
+    def __init__(self, filepath, target_format, output_dir,
+                 preserve_metadata=False, max_compression=False,
+                 target_size=None, min_psnr=None, info=None, quantizer=None,
+                 background=None, priority=0):
+        """
+        Args:
+            filepath: Path to source image
+            target_format: Target format
+            output_dir: Output directory
+            preserve_metadata: Whether to preserve EXIF metadata
+            max_compression: Whether to use maximum compression
+            target_size: Optional output size goal in bytes
+            min_psnr: Optional quality floor in dB
+            info: Optional probed ImageInfo, reused for cost estimates
+            quantizer: Optional Quantizer for GIF palettes
+            background: Optional RGB color transparency is flattened onto
+                for JPG/PDF targets (white when None)
+            priority: Jobs with a higher priority are started first
+                (pinned files); the schedule orders jobs within one
+        """
+        self.filepath = filepath
+        self.target_format = target_format.lower()
+        self.output_dir = output_dir
+        self.preserve_metadata = preserve_metadata
+        self.max_compression = max_compression
+        self.target_size = target_size
+        self.min_psnr = min_psnr
+        self.info = info
+        self.quantizer = quantizer
+        self.background = background
+        self.priority = priority
+        self.quality_hint = None
+        # Natural output path -> path actually written (name collisions)
+        self.renames = {}
+
+    @property
+    def save_path(self):
+        """Path the conversion will write"""
+        path = ImageConverter.output_path(self.filepath, self.target_format, self.output_dir)
+        return self.renames.get(path, path)
+
+    @property
+    def target_formats(self):
+        """Every format this job encodes to"""
+        return [self.target_format]
+
+    def outputs(self):
+        """(save_path, target_format) for every file this job writes"""
+        return [(self.save_path, self.target_format)]
+
+    def execute(self, recorder=None, quality_target=None, data=None):
+        """
+        Run the conversion (inside a worker process)
+
+        Args:
+            recorder: Optional StageRecorder
+            quality_target: Optional QualityTarget
+            data: Source bytes prefetched by the pipeline reader; when
+                given, outputs are encoded but not written
+
+        Returns:
+            list: Paths of every saved file, or (save_path, bytes) pairs
+            when data was given
+        """
+        if data is None and not self.renames:
+            return [ImageConverter.convert_image(
+                self.filepath, self.target_format, self.output_dir,
+                preserve_metadata=self.preserve_metadata,
+                max_compression=self.max_compression,
+                recorder=recorder,
+                quality_target=quality_target,
+                quantizer=self.quantizer,
+                background=self.background
+            )]
+        buffer = ImageConverter.convert_to_buffer(
+            self.filepath, self.target_format,
+            preserve_metadata=self.preserve_metadata,
+            max_compression=self.max_compression,
+            recorder=recorder,
+            quality_target=quality_target,
+            fp=None if data is None else io.BytesIO(data),
+            quantizer=self.quantizer,
+            background=self.background
+        )
+        if data is not None:
+            return [(self.save_path, buffer.getvalue())]
+        try:
+            ImageConverter.write(buffer, self.save_path, recorder or NULL_RECORDER)
+        except Exception as e:
+            raise classify_error(self.filepath, "write", e) from e
+        return [self.save_path]
+
+    def encode_options(self):
+        """Settings that affect the encoded output"""
+        options = {
+            "preserve_metadata": bool(self.preserve_metadata),
+            "max_compression": bool(self.max_compression),
+        }
+        if self.target_size is not None:
+            options["target_size"] = self.target_size
+        if self.min_psnr is not None:
+            options["min_psnr"] = self.min_psnr
+        if self.quantizer is not None:
+            options["quantizer"] = self.quantizer.key()
+        if self.background is not None:
+            options["background"] = list(self.background)
+        return options
+
+    def quality_target(self):
+        """QualityTarget for this job, or None for fixed-quality encoding"""
+        if self.target_size is None and self.min_psnr is None:
+            return None
+        return QualityTarget(self.target_size, self.min_psnr, self.quality_hint)
+
+
+class FanoutJob(BatchJob):
+    """A source decoded once and encoded to several formats and sizes"""
+
+    def __init__(self, filepath, target_formats, output_dir, sizes=None,
+                 name_template=None, preserve_metadata=False, max_compression=False,
+                 info=None, quantizer=None, background=None, priority=0):
+        """
+        Args:
+            filepath: Path to source image
+            target_formats: Formats to encode to
+            output_dir: Output directory
+            sizes: Optional widths for a responsive image set
+            name_template: Output name pattern ({stem}, {ext}, {width}, {height})
+            preserve_metadata: Whether to preserve EXIF metadata
+            max_compression: Whether to use maximum compression
+            info: Optional probed ImageInfo
+            quantizer: Optional Quantizer for GIF palettes
+            background: Optional RGB color for flattening JPG/PDF outputs
+            priority: As for BatchJob
+        """
+        formats = [fmt.lower() for fmt in target_formats]
+        super().__init__(filepath, formats[0], output_dir,
+                         preserve_metadata=preserve_metadata,
+                         max_compression=max_compression, info=info,
+                         quantizer=quantizer, background=background,
+                         priority=priority)
+        self.formats = formats
+        self.sizes = list(sizes) if sizes else None
+        self.name_template = name_template
+
+    @property
+    def save_path(self):
+        outputs = self.outputs()
+        return outputs[0][0] if outputs else None
+
+    @property
+    def target_formats(self):
+        return list(self.formats)
+
+    def outputs(self):
+        """Output paths, reading the source header to resolve sizes"""
+        if self.info is not None and self.info.has_header:
+            size = (self.info.width, self.info.height)
+        else:
+            try:
+                with open_image(self.filepath) as img:
+                    size = img.size
+            except Exception:
+                return []
+        plan = ImageConverter.fanout_plan(
+            self.filepath, size, self.formats, self.output_dir,
+            self.sizes, self.name_template
+        )
+        rename = self.renamer()
+        written = [(rename(path), fmt) for _, outputs in plan for fmt, path in outputs]
+        return [(path, fmt) for path, fmt in written if path is not None]
+
+    def renamer(self):
+        """
+        Callable mapping each natural output path, in plan order, to the
+        path actually written, or None for an output that is dropped
+
+        A template can give several outputs of one job the same name, so
+        renames are looked up per occurrence of a path (see output_key()).
+        """
+        seen = {}
+
+        def rename(path):
+            seen[path] = seen.get(path, 0) + 1
+            return self.renames.get(output_key(path, seen[path]), path)
+        return rename
+
+    def quality_target(self):
+        # Quality searches are per encode; fan-out uses the fixed settings
+        return None
+
+    def execute(self, recorder=None, quality_target=None, data=None):
+        encoded = []
+        fp = sink = None
+        rename = self.renamer()
+        if data is not None:
+            fp = io.BytesIO(data)
+
+            def sink(save_path, buffer):
+                save_path = rename(save_path)
+                if save_path is not None:
+                    encoded.append((save_path, buffer.getvalue()))
+        elif self.renames:
+            def sink(save_path, buffer):
+                save_path = rename(save_path)
+                if save_path is not None:
+                    ImageConverter.write(buffer, save_path, recorder or NULL_RECORDER)
+        saved = ImageConverter.convert_fanout(
+            self.filepath, self.formats, self.output_dir,
+            sizes=self.sizes, name_template=self.name_template,
+            preserve_metadata=self.preserve_metadata,
+            max_compression=self.max_compression,
+            recorder=recorder, fp=fp, sink=sink, quantizer=self.quantizer,
+            background=self.background
+        )
+        if data is not None:
+            return encoded
+        rename = self.renamer()
+        return [path for path in map(rename, saved) if path is not None]
+
+
+class BatchControl:
+    """Pause and cancel switches for a running batch
+
+    Safe to flip from any thread. Pausing stops new jobs from starting;
+    cancelling also drops every job that has not started. Jobs already in
+    a worker always run to completion and are reported as usual.
+    """
+
+    # Seconds between checks of the switches while nothing finishes
+    POLL_INTERVAL = 0.1
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # Wake a paused batch so it can wind down
+        self._running.set()
+
+    def admitting(self):
+        """Whether new jobs may start"""
+        return self._running.is_set() and not self._cancelled.is_set()
+
+    def wait(self, timeout=POLL_INTERVAL):
+        """Sleep while paused with nothing in flight, until resumed or timeout"""
+        self._running.wait(timeout)
+
+
+class BatchResult:
+    """Outcome of a single BatchJob"""
+
+    def __init__(self, index, job, save_paths=None, error=None, cached=False,
+                 error_category=None, metrics=None, quality=None, duplicate_of=None):
+        self.index = index
+        self.job = job
+        self.save_paths = list(save_paths or [])
+        self.save_path = self.save_paths[0] if self.save_paths else None
+        self.error = error
+        self.cached = cached
+        self.error_category = error_category
+        self.metrics = metrics
+        self.quality = quality
+        # Source whose conversion was linked or copied instead of this one's
+        self.duplicate_of = duplicate_of
+
+    @property
+    def ok(self):
+        """Whether the conversion succeeded"""
+        return self.error is None
+
+    @property
+    def status(self):
+        """Status label for display ("Done", "Cached" or "Error")"""
+        if not self.ok:
+            return "Error"
+        return "Cached" if self.cached else "Done"
+
+
+def _run_job(job, collect_metrics=False, data=None):
+    """
+    Convert one job inside a worker process
+
+    Args:
+        job: BatchJob to run
+        collect_metrics: Whether to record stage timings
+        data: Source bytes from the pipeline reader; the encoded outputs
+            are then returned under "encoded" for the writer thread
+
+    Returns:
+        dict: save_paths, error message and category, metrics record and
+        the quality picked by a quality search (if any)
+    """
+    recorder = None
+    if collect_metrics:
+        recorder = StageRecorder(job.filepath, ",".join(job.target_formats))
+    quality_target = job.quality_target()
+    outcome = {"save_paths": [], "error": None, "category": None, "metrics": None,
+               "quality": None}
+    error = None
+    try:
+        if data is None:
+            outcome["save_paths"] = job.execute(recorder, quality_target)
+        else:
+            outcome["encoded"] = job.execute(recorder, quality_target, data)
+    except Exception as e:
+        error = e
+        outcome["error"] = str(e)
+        outcome["category"] = getattr(e, "category", "conversion")
+    if recorder is not None:
+        outcome["metrics"] = recorder.to_record(error)
+    if quality_target is not None:
+        outcome["quality"] = quality_target.chosen
+    return outcome
+
+
+def _read_source(filepath):
+    """Read a whole source file (on the pipeline's reader thread)"""
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+def _write_outputs(encoded):
+    """
+    Atomically write encoded outputs (on the pipeline's writer thread)
+
+    Returns:
+        float: Seconds spent writing
+    """
+    started = time.perf_counter()
+    for save_path, data in encoded:
+        ImageConverter.write(data, save_path)
+    return time.perf_counter() - started
+
+
+class _WorkerPool:
+    """Process pool that starts afresh when a worker process dies
+
+    A dead worker (a crashing decoder, the OOM killer) breaks a
+    ProcessPoolExecutor for good: every call in flight fails with
+    BrokenProcessPool and nothing more can be submitted.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._generation = 0
+        # Future -> generation of the executor running it
+        self._futures = {}
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._executor.shutdown(wait=True)
+
+    def _start(self):
+        # multiprocessing is slow to import, so load it only when needed
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._generation += 1
+
+    def submit(self, fn, *args):
+        """Schedule a call, on a fresh executor if the current one broke"""
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._start()
+            future = self._executor.submit(fn, *args)
+        self._futures[future] = self._generation
+        return future
+
+    def crashed(self, future):
+        """
+        Whether a finished call failed because a worker process died
+
+        The first such failure on the current executor replaces it.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        generation = self._futures.pop(future, None)
+        if future.cancelled() or not isinstance(future.exception(), BrokenProcessPool):
+            return False
+        if generation == self._generation:
+            self._start()
+        return True
+
+
+class _Pipeline:
+    """The jobs in each stage of one BatchConverter._convert_pipelined() run
+
+    Sources are read ahead on the reader thread, converted in the worker
+    pool, then written on the writer thread; each stage is a dict of its
+    futures.
+    """
+
+    def __init__(self, converter, jobs, indices, pool, reader, writer):
+        self.converter = converter
+        self.jobs = jobs
+        self.pool = pool
+        self.reader = reader
+        self.writer = writer
+        self.workers = pool.workers
+        self.budget = MemoryBudget(converter.memory_budget)
+        self.queue = deque(indices)
+        self.costs = {}
+        # Index -> read future, future -> index, future -> (index, outcome, encoded)
+        self.reads = {}
+        self.in_flight = {}
+        self.writing = {}
+        # Jobs that were in flight when a worker died
+        self.suspects = set()
+
+    @property
+    def busy(self):
+        return bool(self.queue or self.in_flight or self.writing)
+
+    def cancel(self):
+        """Drop queued jobs and reads; started jobs still finish"""
+        self.queue.clear()
+        for read in self.reads.values():
+            read.cancel()
+        self.reads.clear()
+        self.converter._cancel_queued(self.in_flight, self.budget, self.costs)
+
+    def read_ahead(self):
+        """Start reading the next few queued sources"""
+        for index in islice(self.queue, self.converter.prefetch):
+            self._read(index)
+
+    def _read(self, index):
+        if index not in self.reads:
+            self.reads[index] = self.reader.submit(_read_source, self.jobs[index].filepath)
+
+    def admit(self, control=None):
+        """Submit read jobs while workers, memory and the writer's backlog allow"""
+        converter = self.converter
+        queue = self.queue
+        while (queue and len(self.in_flight) < self.workers * 2
+               and len(self.writing) < converter.prefetch
+               and (control is None or control.admitting())):
+            index = queue[0]
+            if not converter._may_start(index, self.in_flight, self.suspects):
+                break
+            if (self.in_flight or self.writing) and not self.reads[index].done():
+                break
+            if index not in self.costs:
+                self.costs[index] = converter._estimate(self.jobs[index])
+            if not self.budget.can_admit(self.costs[index]):
+                break
+            queue.popleft()
+            self.budget.acquire(self.costs[index])
+            try:
+                data = self.reads.pop(index).result()
+            except OSError:
+                # Let the worker open the path and report the error
+                data = None
+            future = self.pool.submit(_run_job, self.jobs[index],
+                                      converter.metrics is not None, data)
+            self.in_flight[future] = index
+            if queue:
+                self._read(queue[0])
+
+    def waiting(self):
+        """Futures whose completion lets the run make progress"""
+        waiting = list(self.in_flight) + list(self.writing)
+        if self.queue and not self.reads[self.queue[0]].done():
+            # Wake up to admit the next job as soon as its read lands
+            waiting.append(self.reads[self.queue[0]])
+        return waiting
+
+    def collect(self, done):
+        """
+        Move finished futures on to their next stage
+
+        Yields:
+            BatchResult: Jobs that were written or failed
+        """
+        for future in done:
+            if future in self.in_flight:
+                result = self._encoded(future)
+            elif future in self.writing:
+                result = self._written(future)
+            else:
+                continue
+            if result is not None:
+                yield result
+
+    def _encoded(self, future):
+        """Hand a converted job to the writer; BatchResult if it failed"""
+        index = self.in_flight.pop(future)
+        job = self.jobs[index]
+        self.budget.release(self.costs[index])
+        if self.converter._retry_crashed(self.pool, future, index, self.queue,
+                                         self.suspects):
+            # Read again when it comes up
+            return None
+        outcome = self.converter._outcome(future, job)
+        encoded = outcome.pop("encoded", None)
+        if outcome["error"] is not None or encoded is None:
+            return self.converter._result(index, job, outcome)
+        self.writing[self.writer.submit(_write_outputs, encoded)] = (index, outcome, encoded)
+        return None
+
+    def _written(self, future):
+        """BatchResult of a job whose outputs the writer finished"""
+        index, outcome, encoded = self.writing.pop(future)
+        job = self.jobs[index]
+        try:
+            elapsed = future.result()
+        except Exception as e:
+            error = classify_error(job.filepath, "write", e)
+            outcome["error"] = str(error)
+            outcome["category"] = error.category
+        else:
+            outcome["save_paths"] = [path for path, _ in encoded]
+            record = outcome["metrics"]
+            if record is not None:
+                record["stages"]["write"] = elapsed
+                record["total"] += elapsed
+        if outcome["metrics"] is not None:
+            outcome["metrics"]["ok"] = outcome["error"] is None
+            outcome["metrics"]["error_category"] = outcome["category"]
+        return self.converter._result(index, job, outcome)
+
+
+class BatchConverter:
+    """Runs conversions across a pool of worker processes"""
+
+    def __init__(self, max_workers=None, incremental=False, hash_sources=False,
+                 memory_budget=None, metrics=None, pipeline=False, prefetch=None,
+                 journal=None, collisions=DEFAULT_COLLISION_POLICY, dedupe=None,
+                 schedule=DEFAULT_SCHEDULE):
+        """
+        Args:
+            max_workers: Number of worker processes (defaults to CPU count)
+            incremental: Skip jobs whose output is recorded as up to date
+                in the output folder's manifest
+            hash_sources: In incremental mode, also compare content hashes
+            memory_budget: Bytes of decoded image data allowed in flight.
+                None uses half of physical RAM; 0 disables the limit.
+            metrics: Optional ConversionMetrics receiving per-stage
+                timings for every conversion
+            pipeline: Read sources on a reader thread and write outputs on
+                a writer thread, so worker processes only decode and
+                encode. Overlaps I/O with compute on slow disks and
+                network shares.
+            prefetch: In pipeline mode, how many sources may be read ahead
+                and how many encoded jobs may wait for the writer
+                (defaults to the worker count)
+            journal: Optional JobJournal; jobs it lists as done are skipped
+                and every finished job is appended to it, so an
+                interrupted batch can be resumed
+            collisions: What to do when several sources map to the same
+                output path ("suffix", "skip" or "overwrite"; see
+                core.dedupe), or None when the jobs' renames were already
+                settled for a larger batch (a distributed chunk)
+            dedupe: "link" or "copy" to convert sources with identical
+                bytes and settings once and hard-link or copy the output
+                to the other names; None converts every source
+            schedule: Order jobs are started in: "fifo" (as given),
+                "largest" (estimated cost, biggest first; shortest total
+                time) or "smallest" (quickest first results). Pinned jobs
+                (higher priority) always start first. Results keep their
+                original index whatever the order (see core.schedule).
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.incremental = incremental
+        self.hash_sources = hash_sources
+        if memory_budget is None:
+            memory_budget = default_memory_budget()
+        self.memory_budget = memory_budget or None
+        self.metrics = metrics
+        self.pipeline = pipeline
+        self.prefetch = max(prefetch or self.max_workers, 1)
+        self.journal = journal
+        self.collisions = collisions
+        self.dedupe = dedupe
+        self.schedule = schedule
+        self._manifests = {}
+        self._quality_caches = {}
+
+    def _manifest(self, output_dir):
+        """Manifest for an output folder, loaded once per batch"""
+        if output_dir not in self._manifests:
+            self._manifests[output_dir] = OutputManifest(output_dir, self.hash_sources)
+        return self._manifests[output_dir]
+
+    def _quality_cache(self, output_dir):
+        """Quality cache for an output folder, loaded once per batch"""
+        if output_dir not in self._quality_caches:
+            self._quality_caches[output_dir] = QualityCache(output_dir)
+        return self._quality_caches[output_dir]
+
+    def run(self, jobs, control=None):
+        """
+        Convert jobs in parallel, streaming results as they finish
+
+        Args:
+            jobs: Iterable of BatchJob
+            control: Optional BatchControl to pause or cancel the batch
+
+        Yields:
+            BatchResult: One per job, in completion order. Failures are
+            reported through BatchResult.error and never stop the batch.
+            Jobs finished by an earlier run (per the journal) and, in
+            incremental mode, up-to-date outputs are yielded first with
+            BatchResult.cached set. Jobs dropped by a cancel yield nothing.
+        """
+        jobs = list(jobs)
+        self._manifests = {}
+        self._quality_caches = {}
+        keys = {}
+        for job in jobs:
+            self._check_info(job)
+        # Settled for the whole batch up front, so names never depend on
+        # which jobs are cached or finish first
+        collisions = {}
+        if self.collisions is not None:
+            collisions = resolve_collisions(jobs, self.collisions)
+        try:
+            pending = {}
+            for index, job in enumerate(jobs):
+                if control is not None and control.cancelled:
+                    break
+                if index in collisions:
+                    save_path, owner = collisions[index]
+                    error = OutputCollisionError(
+                        job.filepath, f"{save_path} is written by {owner}", "plan"
+                    )
+                    yield BatchResult(index, job, error=str(error),
+                                      error_category=error.category)
+                    continue
+                if self.journal is not None:
+                    keys[index] = job_key(job)
+                    outputs = self.journal.is_done(job, keys[index])
+                    if outputs:
+                        yield BatchResult(index, job, outputs, cached=True)
+                        continue
+                fingerprints = []
+                if self.incremental:
+                    manifest = self._manifest(job.output_dir)
+                    options = job.encode_options()
+                    fingerprints = [
+                        (save_path, manifest.fingerprint(job.filepath, fmt, options))
+                        for save_path, fmt in job.outputs()
+                    ]
+                    if fingerprints and all(
+                        manifest.is_current(save_path, fingerprint)
+                        for save_path, fingerprint in fingerprints
+                    ):
+                        yield BatchResult(
+                            index, job, [path for path, _ in fingerprints], cached=True
+                        )
+                        continue
+                pending[index] = fingerprints
+
+                # Reuse the quality an earlier search settled on
+                if job.quality_target() is not None:
+                    job.quality_hint = self._quality_cache(job.output_dir).lookup(job)
+
+            groups = {}
+            if self.dedupe:
+                groups = duplicate_groups(jobs, list(pending))
+            duplicates = {index for members in groups.values() for index in members}
+            leaders = schedule(
+                jobs, [index for index in pending if index not in duplicates], self.schedule
+            )
+
+            for result in self._convert(jobs, leaders, control):
+                yield self._finish(result, pending, keys)
+                for index in groups.get(result.index, ()):
+                    duplicate = self._link_duplicate(result, index, jobs[index])
+                    yield self._finish(duplicate, pending, keys)
+        finally:
+            for manifest in self._manifests.values():
+                manifest.save()
+            for cache in self._quality_caches.values():
+                cache.save()
+            if self.journal is not None:
+                self.journal.close()
+
+    def _finish(self, result, pending, keys):
+        """Record a finished job in the journal, manifest and quality cache"""
+        job = result.job
+        if self.journal is not None:
+            self.journal.record(job, result, keys[result.index])
+        if self.incremental and result.ok:
+            manifest = self._manifest(job.output_dir)
+            for save_path, fingerprint in pending[result.index]:
+                if save_path in result.save_paths:
+                    manifest.record(save_path, fingerprint)
+        if result.quality is not None and job.quality_hint is None:
+            self._quality_cache(job.output_dir).store(job, result.quality)
+        return result
+
+    def _link_duplicate(self, result, index, job):
+        """Give a duplicate source the outputs of its group's converted job"""
+        source = result.job.filepath
+        if not result.ok:
+            return BatchResult(
+                index, job,
+                error=f"Error converting {job.filepath}: same content as {source}, which failed",
+                error_category=result.error_category, duplicate_of=source
+            )
+        # Same settings and source size, so outputs pair up in order
+        targets = [path for path, _ in job.outputs()]
+        try:
+            for src, dst in zip(result.save_paths, targets):
+                link_output(src, dst, self.dedupe)
+        except Exception as e:
+            error = classify_error(job.filepath, "write", e)
+            return BatchResult(index, job, error=str(error),
+                               error_category=error.category, duplicate_of=source)
+        return BatchResult(index, job, targets, quality=result.quality,
+                           duplicate_of=source)
+
+    def _convert(self, jobs, indices, control=None):
+        """Run the given job indices through the process pool
+
+        Jobs are submitted in the order of indices, but only while the estimated decoded
+        size of everything in flight stays within the memory budget and
+        the control (if any) is not paused or cancelled.
+
+        A worker process that dies takes every job in flight down with it.
+        Those jobs are retried one at a time on a fresh pool, so only the
+        job that really crashes its worker is reported as failed.
+        """
+        if not indices:
+            return
+        if self.pipeline:
+            yield from self._convert_pipelined(jobs, indices, control)
+            return
+
+        workers = min(self.max_workers, len(indices))
+        budget = MemoryBudget(self.memory_budget)
+        queue = deque(indices)
+        costs = {}
+        in_flight = {}
+        # Jobs that were in flight when a worker died
+        suspects = set()
+
+        with _WorkerPool(workers) as pool:
+            while queue or in_flight:
+                if control is not None and control.cancelled:
+                    queue.clear()
+                    self._cancel_queued(in_flight, budget, costs)
+
+                # Admit jobs while workers have room and memory allows
+                while (queue and len(in_flight) < workers * 2
+                       and (control is None or control.admitting())):
+                    index = queue[0]
+                    if not self._may_start(index, in_flight, suspects):
+                        break
+                    if index not in costs:
+                        costs[index] = self._estimate(jobs[index])
+                    if not budget.can_admit(costs[index]):
+                        break
+                    queue.popleft()
+                    budget.acquire(costs[index])
+                    future = pool.submit(_run_job, jobs[index], self.metrics is not None)
+                    in_flight[future] = index
+
+                if not in_flight:
+                    # Paused with nothing running
+                    if control is not None:
+                        control.wait()
+                    continue
+                timeout = None if control is None else control.POLL_INTERVAL
+                done, _ = wait(in_flight, timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    budget.release(costs[index])
+                    if self._retry_crashed(pool, future, index, queue, suspects):
+                        continue
+                    yield self._result(index, jobs[index], self._outcome(future, jobs[index]))
+
+    def _convert_pipelined(self, jobs, indices, control=None):
+        """Run jobs as read -> decode/encode -> write stages
+
+        A reader thread prefetches source bytes a few jobs ahead, worker
+        processes decode and encode them into memory, and a writer thread
+        writes the results atomically. Read-ahead and encoded-but-unwritten
+        jobs are each capped at self.prefetch, so a slow stage holds back
+        the ones before it instead of piling data up in memory. Jobs lost
+        to a dead worker are retried as in _convert().
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = min(self.max_workers, len(indices))
+        with _WorkerPool(workers) as pool, \
+                ThreadPoolExecutor(1, "prism-reader") as reader, \
+                ThreadPoolExecutor(1, "prism-writer") as writer:
+            stages = _Pipeline(self, jobs, indices, pool, reader, writer)
+            while stages.busy:
+                if control is not None and control.cancelled:
+                    stages.cancel()
+                stages.read_ahead()
+                stages.admit(control)
+
+                waiting = stages.waiting()
+                if not waiting:
+                    # Paused with nothing running
+                    if control is not None:
+                        control.wait()
+                    continue
+                timeout = None if control is None else control.POLL_INTERVAL
+                done, _ = wait(waiting, timeout, return_when=FIRST_COMPLETED)
+                yield from stages.collect(done)
+
+    @staticmethod
+    def _may_start(index, in_flight, suspects):
+        """Whether a job may be submitted now; suspects run on their own"""
+        if index in suspects:
+            return not in_flight
+        return not any(other in suspects for other in in_flight.values())
+
+    @staticmethod
+    def _retry_crashed(pool, future, index, queue, suspects):
+        """
+        Requeue a job that was in flight when a worker process died
+
+        Any job in flight may have been the one that killed the worker, so
+        each is run again on its own; a job that fails alone is the culprit.
+
+        Returns:
+            bool: True if the job was requeued, False if its outcome stands
+        """
+        if not pool.crashed(future) or index in suspects:
+            return False
+        suspects.add(index)
+        queue.appendleft(index)
+        return True
+
+    @staticmethod
+    def _cancel_queued(in_flight, budget, costs):
+        """Cancel submitted jobs that no worker has started yet"""
+        for future in [f for f in in_flight if f.cancel()]:
+            budget.release(costs[in_flight.pop(future)])
+
+    @staticmethod
+    def _outcome(future, job):
+        """Outcome dict of a finished _run_job future"""
+        try:
+            return future.result()
+        except Exception as e:
+            # Worker process died (e.g. decoder crash)
+            return {
+                "save_paths": [], "category": "crash", "metrics": None,
+                "quality": None,
+                "error": f"Error converting {job.filepath}: {e}",
+            }
+
+    def _result(self, index, job, outcome):
+        """BatchResult for an outcome, recording its metrics"""
+        if self.metrics is not None:
+            self.metrics.add(outcome["metrics"])
+        return BatchResult(
+            index, job, outcome["save_paths"], outcome["error"],
+            error_category=outcome["category"],
+            metrics=outcome["metrics"],
+            quality=outcome["quality"]
+        )
+
+    @staticmethod
+    def _check_info(job):
+        """Drop a job's probed info if the file changed since the probe"""
+        if job.info is None:
+            return
+        try:
+            st = os.stat(job.filepath)
+        except OSError:
+            job.info = None
+            return
+        if not job.info.matches(st):
+            job.info = None
+
+    def _estimate(self, job):
+        """Estimated peak memory for a job (skipped when unlimited)"""
+        if self.memory_budget is None:
+            return 0
+        return estimate_footprint(job.filepath, job.target_formats, job.info)
@@ -0,0 +1,569 @@
+"""Headless command line interface
+
+Runs batch conversions without touching Tk, reporting progress as
+JSON lines on stdout so other tools can follow along.
+"""
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import sys
+import time
+
+from .batch import BatchConverter, BatchJob, FanoutJob
+from .converter import OUTPUT_FORMATS, check_name_template
+from .dedupe import COLLISION_POLICIES, DEDUPE_MODES, DEFAULT_COLLISION_POLICY
+from .errors import ConversionError
+from .ingest import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE, FolderWatcher, collect_paths
+from .journal import JobJournal
+from .metrics import ConversionMetrics
+from .palette import DEFAULT_QUANTIZER, QUANTIZERS, Quantizer, available, shared_palette
+from .schedule import DEFAULT_SCHEDULE, SCHEDULES
+
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Expand files, glob patterns and directories into image paths
+
+    Args:
+        inputs: Iterable of paths, glob patterns or directories
+        recursive: Whether to include images in subdirectories
+
+    Returns:
+        list: Unique absolute file paths, in the order given
+    """
+    paths = []
+    seen = set()
+
+    def add(path):
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            paths.append(path)
+
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(collect_paths([item], recursive, seen))
+        elif glob.has_magic(item):
+            for match in sorted(glob.glob(item, recursive=recursive)):
+                if os.path.isfile(match):
+                    add(match)
+        else:
+            add(item)
+
+    return paths
+
+
+def format_list(value):
+    """argparse type for a comma-separated list of target formats"""
+    formats = [fmt.strip().lower() for fmt in value.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(
+            "choose from %s" % ", ".join(OUTPUT_FORMATS)
+        )
+    return formats
+
+
+def width_list(value):
+    """argparse type for a comma-separated list of pixel widths"""
+    try:
+        widths = [int(w) for w in value.split(",") if w.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected widths like 320,640,1280")
+    if not widths or min(widths) <= 0:
+        raise argparse.ArgumentTypeError("widths must be positive")
+    return widths
+
+
+def name_template(value):
+    """argparse type for a fan-out output name pattern"""
+    try:
+        check_name_template(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def color(value):
+    """argparse type for a color name or #rrggbb, as an RGB tuple"""
+    from PIL import ImageColor
+
+    try:
+        return ImageColor.getrgb(value)[:3]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a color like white or #f0f0f0")
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="prism",
+        description="Convert images between formats without the GUI."
+    )
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="Files, glob patterns or directories to convert"
+    )
+    parser.add_argument(
+        "-r", "--recursive", action="store_true",
+        help="Include images in subdirectories of directory inputs"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep running and convert images as they arrive in the input directories"
+    )
+    parser.add_argument(
+        "--settle", type=float, default=DEFAULT_SETTLE, metavar="SECONDS",
+        help="With --watch, how long a new file must stay unchanged before "
+             "it is converted (default %(default)s)"
+    )
+    parser.add_argument(
+        "--poll", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDS",
+        help="With --watch, seconds between folder scans (default %(default)s)"
+    )
+    parser.add_argument(
+        "-f", "--format", type=format_list, metavar="FORMAT[,FORMAT...]",
+        help="Target format(s) (%s); several formats decode each source once"
+        % ", ".join(OUTPUT_FORMATS)
+    )
+    parser.add_argument(
+        "--combine", metavar="FILE.pdf",
+        help="Instead of converting each file, write every page of every "
+             "input into one PDF, in order (replaces -f)"
+    )
+    parser.add_argument(
+        "--page-size", type=int, metavar="PX",
+        help="With --combine, downscale pages whose longest side exceeds PX"
+    )
+    parser.add_argument(
+        "--page-quality", type=int, metavar="Q",
+        help="With --combine, JPEG quality (1-95) of the page images"
+    )
+    parser.add_argument(
+        "--sizes", type=width_list, metavar="W[,W...]",
+        help="Also emit resized copies at these widths (responsive image set)"
+    )
+    parser.add_argument(
+        "--name-template", type=name_template, metavar="TEMPLATE",
+        help="Output name for multi-format/size runs, e.g. '{stem}-{width}w.{ext}'"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="Output directory (defaults to each file's own folder)"
+    )
+    parser.add_argument(
+        "--no-metadata", dest="preserve_metadata", action="store_false",
+        help="Drop EXIF metadata (kept by default, like the GUI)"
+    )
+    parser.add_argument(
+        "--max-compression", action="store_true",
+        help="Use maximum compression"
+    )
+    parser.add_argument(
+        "--background", type=color, metavar="COLOR",
+        help="Color transparent areas become in JPG and PDF output (default white)"
+    )
+    parser.add_argument(
+        "--quantizer", choices=QUANTIZERS, default=DEFAULT_QUANTIZER,
+        help="How GIF palettes are built: mediancut (best colors), octree "
+             "(fastest) or libimagequant (if Pillow has it); default %(default)s"
+    )
+    parser.add_argument(
+        "--dither", action="store_true",
+        help="Floyd-Steinberg dithering for GIF output (smoother gradients, larger files)"
+    )
+    parser.add_argument(
+        "--shared-palette", action="store_true",
+        help="Give every GIF in the batch one palette, computed from a sample of all sources"
+    )
+    parser.add_argument(
+        "--target-size", type=int, metavar="KB",
+        help="Pick the highest JPG/WEBP/HEIC quality whose output fits in KB"
+    )
+    parser.add_argument(
+        "--min-psnr", type=float, metavar="DB",
+        help="Pick the lowest JPG/WEBP/HEIC quality keeping at least DB PSNR"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Skip files whose output is already up to date"
+    )
+    parser.add_argument(
+        "--hash", dest="hash_sources", action="store_true",
+        help="With --incremental, compare file contents when timestamps differ"
+    )
+    parser.add_argument(
+        "--on-collision", choices=COLLISION_POLICIES, default=DEFAULT_COLLISION_POLICY,
+        help="When sources share an output name: number later ones (suffix), "
+             "keep the first (skip) or keep the last (overwrite); default %(default)s"
+    )
+    parser.add_argument(
+        "--dedupe", choices=DEDUPE_MODES,
+        help="Convert identical sources once and hard-link or copy the result "
+             "to the other output names"
+    )
+    parser.add_argument(
+        "--schedule", choices=SCHEDULES, default=DEFAULT_SCHEDULE,
+        help="Order files are started in: as given (fifo), largest estimated "
+             "cost first (shortest total time) or smallest first (quickest "
+             "first results); default %(default)s"
+    )
+    parser.add_argument(
+        "--pin", action="append", default=[], metavar="PATTERN",
+        help="Start files whose path or name matches this glob pattern before "
+             "all others; repeat to pin more (earlier patterns go first)"
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=None, metavar="MB",
+        help="Max decoded image data in flight (default: half of RAM, 0 = unlimited)"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Read and write on background threads while workers encode "
+             "(faster on network shares)"
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=None, metavar="N",
+        help="With --pipeline, sources read ahead and outputs queued for writing "
+             "(defaults to the worker count)"
+    )
+    parser.add_argument(
+        "--journal", metavar="FILE",
+        help="Append each finished file to FILE; re-running with the same "
+             "journal resumes an interrupted batch, skipping finished files"
+    )
+    parser.add_argument(
+        "--create-jobdir", metavar="DIR",
+        help="Write the batch to DIR on shared storage instead of converting; "
+             "run 'prism worker DIR' on any number of machines to convert it"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=None, metavar="N",
+        help="With --create-jobdir, sources each worker claims at a time (default 16)"
+    )
+    parser.add_argument(
+        "--lease", type=float, default=None, metavar="SECONDS",
+        help="With --create-jobdir, how long a silent worker keeps its chunk "
+             "before others reclaim it (default 120)"
+    )
+    parser.add_argument(
+        "--metrics", metavar="FILE",
+        help="Write per-stage timings as JSON lines and print a summary to stderr"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="Number of worker processes (defaults to CPU count)"
+    )
+    return parser
+
+
+def build_quantizer(args, paths):
+    """
+    Quantizer for a batch's GIF outputs
+
+    Returns:
+        Quantizer: None when no GIFs are made or the defaults apply
+    """
+    if "gif" not in args.format:
+        return None
+    if args.quantizer == DEFAULT_QUANTIZER and not args.dither and not args.shared_palette:
+        return None
+    quantizer = Quantizer(args.quantizer, args.dither)
+    if args.shared_palette:
+        quantizer.palette = shared_palette(paths, quantizer)
+    return quantizer
+
+
+def pin_priority(patterns, path):
+    """
+    Priority of a source under --pin patterns
+
+    Returns:
+        int: len(patterns) for a match of the first pattern, down to 1 for
+        the last; 0 when nothing matches
+    """
+    name = os.path.basename(path)
+    for rank, pattern in enumerate(patterns):
+        if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern):
+            return len(patterns) - rank
+    return 0
+
+
+def build_jobs(args, paths):
+    """Create the batch jobs for some sources"""
+    quantizer = build_quantizer(args, paths)
+    return [build_job(args, path, quantizer) for path in paths]
+
+
+def build_job(args, path, quantizer=None):
+    """Create the batch job for one source"""
+    priority = pin_priority(args.pin, path)
+    output_dir = args.output or os.path.dirname(path)
+    if len(args.format) > 1 or args.sizes or args.name_template:
+        return FanoutJob(
+            path, args.format, output_dir,
+            sizes=args.sizes, name_template=args.name_template,
+            preserve_metadata=args.preserve_metadata,
+            max_compression=args.max_compression,
+            quantizer=quantizer,
+            background=args.background,
+            priority=priority
+        )
+    return BatchJob(
+        path, args.format[0], output_dir,
+        preserve_metadata=args.preserve_metadata,
+        max_compression=args.max_compression,
+        target_size=None if args.target_size is None else args.target_size * 1024,
+        min_psnr=args.min_psnr,
+        quantizer=quantizer,
+        background=args.background,
+        priority=priority
+    )
+
+
+def emit(event, **fields):
+    """Write one JSON progress line to stdout"""
+    line = {"event": event}
+    line.update(fields)
+    sys.stdout.write(json.dumps(line) + "\n")
+    sys.stdout.flush()
+
+
+def create_jobdir(args, paths):
+    """
+    Write a batch to a job directory for distributed workers
+
+    Output names are settled and the claim order scheduled here, once for
+    the whole batch. Emits a jobdir event.
+
+    Returns:
+        int: Process exit code
+    """
+    from .dedupe import resolve_collisions
+    from .schedule import schedule
+    from .workqueue import DEFAULT_CHUNK_SIZE, DEFAULT_LEASE_SECONDS, JobDirectory
+
+    jobs = build_jobs(args, paths)
+    skipped = resolve_collisions(jobs, args.on_collision)
+    for index in sorted(skipped):
+        save_path, owner = skipped[index]
+        emit("skipped", source=jobs[index].filepath, output=save_path, owner=owner)
+    indices = [index for index in range(len(jobs)) if index not in skipped]
+    jobs = [jobs[index] for index in schedule(jobs, indices, args.schedule)]
+
+    try:
+        jobdir = JobDirectory.create(
+            args.create_jobdir, jobs,
+            chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE,
+            lease_seconds=args.lease or DEFAULT_LEASE_SECONDS
+        )
+    except (OSError, ValueError) as e:
+        emit("error", error=str(e))
+        return 1
+    emit("jobdir", path=os.path.abspath(jobdir.path), files=len(jobs),
+         chunks=jobdir.chunks, skipped=len(skipped))
+    return 0
+
+
+def run_batch(converter, jobs):
+    """
+    Convert jobs, emitting start, file and complete events
+
+    Returns:
+        list: BatchResult for every job
+    """
+    total = len(jobs)
+    failed = 0
+    cached = 0
+    results = []
+    started = time.monotonic()
+    emit("start", total=total)
+
+    for done, result in enumerate(converter.run(jobs), start=1):
+        results.append(result)
+        if not result.ok:
+            failed += 1
+        elif result.cached:
+            cached += 1
+        emit(
+            "file",
+            index=result.index,
+            source=result.job.filepath,
+            output=result.save_path,
+            outputs=result.save_paths,
+            status=result.status.lower(),
+            error=result.error,
+            error_category=result.error_category,
+            quality=result.quality,
+            duplicate_of=result.duplicate_of,
+            done=done,
+            total=total
+        )
+
+    emit(
+        "complete",
+        total=total,
+        converted=total - failed - cached,
+        cached=cached,
+        failed=failed,
+        elapsed=round(time.monotonic() - started, 3)
+    )
+    return results
+
+
+def combine(args, paths):
+    """
+    Write every page of the inputs into one PDF
+
+    Emits a start event, a page event per page written, a file event for
+    each source left out, and a complete event.
+
+    Returns:
+        int: Process exit code
+    """
+    # Needs Pillow at import time, and only this mode uses it
+    from .combine import combine_pdf
+
+    save_path = os.path.abspath(args.combine)
+    started = time.monotonic()
+    emit("start", total=len(paths), output=save_path)
+
+    def page(index, path):
+        emit("page", page=index + 1, source=path)
+
+    try:
+        count, failures = combine_pdf(
+            paths, save_path,
+            max_size=args.page_size,
+            quality=args.page_quality,
+            background=args.background,
+            progress=page
+        )
+    except ConversionError as e:
+        emit("error", source=e.filepath, error=str(e), error_category=e.category)
+        return 1
+
+    for path, error in failures:
+        emit(
+            "file",
+            source=path,
+            status="failed",
+            error=str(error),
+            error_category=error.category
+        )
+    emit(
+        "complete",
+        total=len(paths),
+        output=save_path if count else None,
+        pages=count,
+        failed=len(failures),
+        elapsed=round(time.monotonic() - started, 3)
+    )
+    return 1 if failures or not count else 0
+
+
+def watch(args, converter):
+    """
+    Convert images as they settle in the input folders, until interrupted
+
+    Each group of new files runs as its own batch with the usual events.
+    Outputs written into a watched folder are never picked up as sources.
+    """
+    folders = [os.path.abspath(item) for item in args.inputs]
+    missing = [folder for folder in folders if not os.path.isdir(folder)]
+    if missing:
+        sys.stderr.write("--watch needs directories: %s\n" % ", ".join(missing))
+        return 2
+
+    watcher = FolderWatcher(folders, recursive=args.recursive, settle=args.settle)
+    emit("watch", folders=folders)
+    failed = 0
+    try:
+        for paths in watcher.watch(args.poll):
+            results = run_batch(converter, build_jobs(args, paths))
+            for result in results:
+                watcher.ignore(result.save_paths)
+            failed += sum(1 for result in results if not result.ok)
+    except KeyboardInterrupt:
+        pass
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """CLI entry point, returns the process exit code"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not available(args.quantizer):
+        parser.error("this Pillow build has no %s support" % args.quantizer)
+    if args.combine:
+        if args.watch:
+            parser.error("--combine cannot be used with --watch")
+        if args.page_size is not None and args.page_size <= 0:
+            parser.error("--page-size must be positive")
+        if args.page_quality is not None and not 1 <= args.page_quality <= 95:
+            parser.error("--page-quality must be between 1 and 95")
+        folder = os.path.dirname(os.path.abspath(args.combine))
+        os.makedirs(folder, exist_ok=True)
+        return combine(args, expand_inputs(args.inputs, args.recursive))
+    if not args.format:
+        parser.error("the following arguments are required: -f/--format")
+    fanout = len(args.format) > 1 or args.sizes or args.name_template
+    if args.name_template:
+        try:
+            check_name_template(args.name_template, len(args.format), len(args.sizes or ()))
+        except ValueError as e:
+            parser.error(str(e))
+    if fanout and (args.target_size is not None or args.min_psnr is not None):
+        # Fan-out encodes every output at the fixed settings
+        parser.error("--target-size and --min-psnr need a single format "
+                     "without --sizes or --name-template")
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    if args.create_jobdir:
+        for flag, value in (("--watch", args.watch), ("--dedupe", args.dedupe),
+                            ("--journal", args.journal), ("--incremental", args.incremental),
+                            ("--metrics", args.metrics)):
+            if value:
+                parser.error(f"{flag} cannot be used with --create-jobdir")
+        if args.chunk_size is not None and args.chunk_size <= 0:
+            parser.error("--chunk-size must be positive")
+        if args.lease is not None and args.lease <= 0:
+            parser.error("--lease must be positive")
+        return create_jobdir(args, expand_inputs(args.inputs, args.recursive))
+
+    metrics = ConversionMetrics() if args.metrics else None
+    converter = BatchConverter(
+        args.workers,
+        incremental=args.incremental,
+        hash_sources=args.hash_sources,
+        memory_budget=None if args.memory_budget is None else args.memory_budget * 1024 * 1024,
+        metrics=metrics,
+        pipeline=args.pipeline,
+        prefetch=args.prefetch,
+        journal=JobJournal(args.journal) if args.journal else None,
+        collisions=args.on_collision,
+        dedupe=args.dedupe,
+        schedule=args.schedule
+    )
+
+    if args.watch:
+        code = watch(args, converter)
+    else:
+        paths = expand_inputs(args.inputs, args.recursive)
+        try:
+            results = run_batch(converter, build_jobs(args, paths))
+        except KeyboardInterrupt:
+            # Finished files are already in the journal, if there is one
+            emit("interrupted")
+            code = 130
+        else:
+            code = 1 if any(not result.ok for result in results) else 0
+
+    if metrics is not None:
+        metrics.write_jsonl(args.metrics)
+        sys.stderr.write(metrics.format_summary() + "\n")
+    return code
@@ -0,0 +1,190 @@
+"""Combining many sources into one multi-page PDF
+
+Imported lazily by the CLI, since it needs Pillow at import time.
+
+Pillow's PDF writer counts the pages of the image it is given, then
+seeks through them and writes each page to the file as it goes. It is
+handed a PageStream: an Image whose seek(n) opens, decodes, downscales and
+flattens page n and drops the previous one. Only one page is ever
+decoded, so memory stays flat however many pages the document has.
+"""
+
+import os
+
+from PIL import Image
+
+from .converter import classify_error, open_image, release, temp_path
+from .flatten import flatten, has_transparency
+from .frames import adopt_frame, frame_count
+
+# Page resolution in dots per inch, as for single-image PDFs
+PDF_RESOLUTION = 100.0
+
+# Modes the PDF writer stores directly (JPEG for L/RGB/CMYK, CCITT for 1);
+# other pages are flattened to RGB
+PAGE_MODES = ("1", "L", "RGB", "CMYK")
+
+
+def list_pages(paths):
+    """
+    Read each source's header to count its pages
+
+    Args:
+        paths: Source paths in document order
+
+    Returns:
+        tuple: ([(path, frame index), ...] for every page,
+        [(path, ConversionError), ...] for sources that cannot be opened)
+    """
+    pages = []
+    failures = []
+    for path in paths:
+        try:
+            with open_image(path) as img:
+                count = frame_count(img)
+        except Exception as e:
+            failures.append((path, classify_error(path, "open", e)))
+            continue
+        pages.extend((path, index) for index in range(count))
+    return pages, failures
+
+
+def render_page(path, frame=0, max_size=None, background=None):
+    """
+    Decode one page, ready for the PDF writer
+
+    Args:
+        path: Source path
+        frame: Page or frame of the source
+        max_size: Optional longest side in pixels; larger pages are
+            downscaled (JPEG sources decode at reduced size directly)
+        background: RGB color transparency is flattened onto
+
+    Returns:
+        PIL.Image.Image: Page image; the caller closes it
+    """
+    img = open_image(path)
+    try:
+        if frame:
+            img.seek(frame)
+        if max_size:
+            # Uses draft() first, so JPEG scans decode at 1/2..1/8 size
+            img.thumbnail((max_size, max_size))
+        img.load()
+        if img.mode in PAGE_MODES and not has_transparency(img):
+            return img
+        return release(img, flatten(img, background))
+    except BaseException:
+        img.close()
+        raise
+
+
+class PageStream(Image.Image):
+    """Pages of many sources, decoded one at a time as they are sought
+
+    Like FrameStream, but each page comes from its own source file, which
+    is opened on seek() and closed again once the next page is shown.
+    """
+
+    def __init__(self, pages, render, progress=None):
+        """
+        Args:
+            pages: [(path, frame index), ...] in document order
+            render: Callable(path, frame index) -> page image
+            progress: Optional callable(page index, path) run as each
+                page is decoded
+        """
+        super().__init__()
+        self.pages = pages
+        self.render = render
+        self.progress = progress
+        self.n_frames = len(pages)
+        self.is_animated = self.n_frames > 1
+        self._page = None
+        self._frame = None
+        self.seek(0)
+
+    def seek(self, frame):
+        if frame == self._frame:
+            return
+        if not 0 <= frame < self.n_frames:
+            raise EOFError("no more pages")
+        path, index = self.pages[frame]
+        try:
+            page = self.render(path, index)
+        except Exception as e:
+            raise classify_error(path, "decode", e) from e
+        adopt_frame(self, page)
+        self.release_page()
+        self._page = page
+        self._frame = frame
+        if self.progress is not None:
+            self.progress(frame, path)
+
+    def tell(self):
+        return self._frame
+
+    def release_page(self):
+        """Close the source of the page currently shown"""
+        if self._page is not None:
+            self._page.close()
+            self._page = None
+
+
+def combine_pdf(paths, save_path, max_size=None, quality=None, background=None,
+                progress=None):
+    """
+    Write every page of some sources into one PDF, in order
+
+    The document is written to a hidden temporary file and renamed into
+    place once complete. Sources whose header cannot be read are left
+    out; a page that fails to decode fails the whole document.
+
+    Args:
+        paths: Source paths in page order
+        save_path: Output PDF path
+        max_size: Optional longest side of each page in pixels
+        quality: Optional JPEG quality for the page images
+        background: Optional RGB color transparency is flattened onto
+        progress: Optional callable(page index, path) per page
+
+    Returns:
+        tuple: (pages written, [(path, ConversionError), ...] for sources
+        that were left out)
+
+    Raises:
+        ConversionError: If a page could not be decoded or the PDF
+            could not be written
+    """
+    pages, failures = list_pages(paths)
+    if not pages:
+        return 0, failures
+
+    stream = PageStream(
+        pages, lambda path, frame: render_page(path, frame, max_size, background),
+        progress
+    )
+    options = {
+        "save_all": True,
+        "resolution": PDF_RESOLUTION,
+        "title": os.path.splitext(os.path.basename(save_path))[0],
+    }
+    if quality is not None:
+        options["quality"] = quality
+
+    tmp_path = temp_path(save_path)
+    try:
+        with open(tmp_path, "wb") as f:
+            stream.save(f, format="PDF", **options)
+        os.replace(tmp_path, save_path)
+    except BaseException as e:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        if isinstance(e, Exception):
+            raise classify_error(save_path, "write", e) from e
+        raise
+    finally:
+        stream.release_page()
+    return len(pages), failures
@@ -1,19 +1,452 @@
-"""Image conversion logic"""
+"""Image conversion logic
 
+Pillow and the HEIF plugin are imported on first use, so importing this
+module stays cheap for the CLI and the GUI.
+"""
+
+import io
 import os
-from PIL import Image
-from pillow_heif import register_heif_opener
+import string
+
+from .errors import (
+    ConversionError, DecodeError, EncodeError, ModeConversionError,
+    SourceNotFoundError, UnsupportedFormatError, WriteError
+)
+from .metrics import NULL_RECORDER
+from .quality import LOSSY_FORMATS
+
+# Extensions accepted as conversion sources
+INPUT_EXTENSIONS = ("png", "jpg", "jpeg", "webp", "heic", "tiff", "bmp", "psd", "gif", "ico")
+
+# Formats offered as conversion targets
+OUTPUT_FORMATS = ("png", "jpg", "jpeg", "webp", "gif", "bmp", "tiff", "ico", "pdf", "heic")
+
+# Targets that keep every frame of animations and multi-page sources
+MULTIFRAME_FORMATS = ("gif", "webp", "tiff", "pdf")
+
+# Pixel mode each target needs; other targets store the source mode as-is
+TARGET_MODES = {"jpg": "RGB", "jpeg": "RGB", "pdf": "RGB", "gif": "P"}
+
+# Output naming for fan-out conversions ({stem}, {ext}, {width}, {height})
+DEFAULT_NAME_TEMPLATE = "{stem}.{ext}"
+DEFAULT_SIZED_NAME_TEMPLATE = "{stem}-{width}w.{ext}"
+NAME_FIELDS = ("stem", "ext", "width", "height")
+
+# Formats that need the pillow_heif plugin
+HEIF_FORMATS = ("heic", "heif")
+
+_heif_registered = False
+
+
+def ensure_heif_support():
+    """Register the HEIC opener the first time a HEIF file is involved"""
+    global _heif_registered
+    if not _heif_registered:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+        _heif_registered = True
+
+
+def open_image(filepath, target_format=None, fp=None):
+    """
+    Open an image, loading codec plugins only when the format needs them
+
+    Args:
+        filepath: Path to source image
+        target_format: Target format, if the image is about to be converted
+        fp: Optional file object holding the source's bytes; filepath is
+            then only used to guess the format
+
+    Returns:
+        PIL.Image.Image: Lazily decoded image
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    ext = os.path.splitext(filepath)[1][1:].lower()
+    if ext in HEIF_FORMATS or target_format in HEIF_FORMATS:
+        ensure_heif_support()
+
+    source = filepath if fp is None else fp
+    try:
+        return Image.open(source)
+    except UnidentifiedImageError:
+        if _heif_registered:
+            raise
+        # Possibly a HEIC file with a misleading extension
+        ensure_heif_support()
+        if fp is not None:
+            fp.seek(0)
+        return Image.open(source)
+
+
+def _read_size(filepath, fp=None):
+    """Size in bytes of a source file, or of the stream standing in for it"""
+    if fp is None:
+        return os.path.getsize(filepath)
+    if hasattr(fp, "getbuffer"):
+        return len(fp.getbuffer())
+    position = fp.tell()
+    fp.seek(0, os.SEEK_END)
+    size = fp.tell()
+    fp.seek(position)
+    return size
+
+
+class _MemoryReader(io.RawIOBase):
+    """Seekable read-only file over a bytes-like object
+
+    Unlike io.BytesIO, which copies anything but bytes, this reads
+    straight from the caller's memory: bytearrays, memoryviews and
+    shared-memory blocks are never duplicated.
+    """
+
+    def __init__(self, data):
+        super().__init__()
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos += len(chunk)
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getbuffer(self):
+        return self._view
+
+
+def memory_stream(source):
+    """
+    File object to decode an in-memory source from, without copying it
+
+    Args:
+        source: bytes, bytearray, memoryview, mmap.mmap or any other
+            bytes-like object, or a binary file object (returned as-is)
+
+    Returns:
+        File object open for reading
+    """
+    if hasattr(source, "read") and not isinstance(source, (bytes, bytearray, memoryview)):
+        # Files, io.BytesIO, and mmap.mmap, which reads like a file
+        return source
+    return _MemoryReader(source)
+
+
+def rewind(out):
+    """Start a reused io.BytesIO over from the beginning"""
+    if isinstance(out, io.BytesIO):
+        out.seek(0)
+    return out
+
+
+def _finish(buffer):
+    """Drop what a reused io.BytesIO held beyond the new output"""
+    if isinstance(buffer, io.BytesIO):
+        buffer.truncate()
+    return buffer
+
+
+def _position(stream, recorder):
+    """
+    Where encoded bytes start, for counting them
+
+    Returns:
+        int: Stream position, or None when metrics are off or the stream
+        cannot tell (pipes, sockets)
+    """
+    if not recorder.enabled:
+        return None
+    seekable = getattr(stream, "seekable", None)
+    if seekable is None or not seekable():
+        return None
+    return stream.tell()
+
+
+def check_name_template(template, formats=1, sizes=1):
+    """
+    Make sure a fan-out name template gives every output its own name
+
+    Args:
+        template: Output name pattern
+        formats: Number of target formats it names
+        sizes: Number of output widths it names
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    try:
+        fields = {name for _, name, _, _ in string.Formatter().parse(template)
+                  if name is not None}
+    except ValueError as e:
+        raise ValueError(f"malformed name template: {e}")
+    unknown = sorted(fields - set(NAME_FIELDS))
+    if unknown:
+        raise ValueError(
+            "unknown name template field {%s}; use %s"
+            % (unknown[0], ", ".join("{%s}" % name for name in NAME_FIELDS))
+        )
+    if formats > 1 and "ext" not in fields:
+        raise ValueError("name template needs {ext} for several formats")
+    if sizes > 1 and not fields & {"width", "height"}:
+        raise ValueError("name template needs {width} or {height} for several sizes")
+
+
+def temp_path(save_path):
+    """Hidden, unique temporary path next to save_path for atomic writes"""
+    folder, name = os.path.split(save_path)
+    return os.path.join(folder, f".{name}.{os.urandom(4).hex()}.tmp")
 
-# Register HEIC support
-register_heif_opener()
+
+def release(old, new):
+    """Close an image replaced by a converted copy and return the copy"""
+    if new is not old:
+        old.close()
+    return new
+
+
+def pil_format(target_format):
+    """Pillow format name for a target extension, or None if unknown"""
+    from PIL import Image
+
+    return Image.registered_extensions().get("." + target_format)
+
+
+def classify_error(filepath, stage, exc):
+    """Wrap an exception raised during a stage in a typed ConversionError"""
+    from PIL import UnidentifiedImageError
+
+    if isinstance(exc, ConversionError):
+        return exc
+    if isinstance(exc, UnidentifiedImageError):
+        error_class = UnsupportedFormatError
+    elif stage == "open" and isinstance(exc, (FileNotFoundError, PermissionError, IsADirectoryError)):
+        error_class = SourceNotFoundError
+    elif stage == "encode" and isinstance(exc, KeyError):
+        error_class = UnsupportedFormatError
+    else:
+        error_class = STAGE_ERRORS.get(stage, ConversionError)
+    if isinstance(exc, UnidentifiedImageError):
+        # Pillow names the file object, which is a buffer in pipeline mode
+        reason = "cannot identify image file %r" % filepath
+    elif isinstance(exc, KeyError) and exc.args:
+        # str(KeyError) wraps the message in quotes
+        reason = exc.args[0]
+    else:
+        reason = str(exc)
+    return error_class(filepath, reason, stage)
+
+
+# Error type for failures in each stage
+STAGE_ERRORS = {
+    "open": DecodeError,
+    "decode": DecodeError,
+    "resize": ModeConversionError,
+    "convert": ModeConversionError,
+    "encode": EncodeError,
+    "write": WriteError,
+}
 
 
 class ImageConverter:
     """Handles image format conversion"""
     
+    @staticmethod
+    def output_path(filepath, target_format, output_dir):
+        """Return the path convert_image() writes for a source"""
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(output_dir, f"{base_name}.{target_format}")
+    
+    @staticmethod
+    def convert_mode(img, target_format, recorder=NULL_RECORDER, quantizer=None,
+                     background=None):
+        """
+        Convert pixels to a mode the target format can store
+        
+        Args:
+            img: Decoded image
+            target_format: Target format (lowercase)
+            recorder: Optional StageRecorder
+            quantizer: Optional Quantizer for palette targets (GIF)
+            background: RGB color transparency is flattened onto for
+                RGB-only targets (JPG, PDF); defaults to white
+        
+        Returns:
+            PIL.Image.Image: A converted copy, or img itself if the
+            target can store it as-is
+        """
+        mode = TARGET_MODES.get(target_format)
+        if mode is None:
+            return img
+        
+        if mode == 'P':
+            from .palette import Quantizer
+            
+            with recorder.stage("quantize"):
+                return (quantizer or Quantizer()).quantize(img)
+        
+        from .flatten import flatten
+        
+        with recorder.stage("convert"):
+            return flatten(img, background)
+    
+    @staticmethod
+    def prepare(img, target_format, recorder=NULL_RECORDER, quantizer=None, background=None):
+        """
+        Convert pixels for the target, closing the source if it was replaced
+        
+        Returns:
+            PIL.Image.Image: Image ready for encoding
+        """
+        return release(img, ImageConverter.convert_mode(
+            img, target_format, recorder, quantizer, background
+        ))
+    
+    @staticmethod
+    def save_options(img, target_format, preserve_metadata=False, max_compression=False):
+        """
+        Encoder arguments for a target format
+        
+        Returns:
+            dict: Keyword arguments for Image.save()
+        """
+        save_kwargs = {}
+        
+        if target_format in ['jpg', 'jpeg']:
+            save_kwargs['quality'] = 85 if max_compression else 100
+            
+        elif target_format == 'png':
+            save_kwargs['optimize'] = max_compression
+            
+        elif target_format == 'webp':
+            save_kwargs['quality'] = 85 if max_compression else 100
+            save_kwargs['method'] = 6
+            
+        elif target_format == 'ico':
+            return {'sizes': [(256, 256)]}
+            
+        elif target_format == 'pdf':
+            return {'resolution': 100.0}
+        
+        # Preserve metadata if enabled
+        if preserve_metadata and hasattr(img, 'info'):
+            exif_data = img.info.get('exif', b'')
+            if exif_data:
+                save_kwargs['exif'] = exif_data
+        
+        return save_kwargs
+    
+    @staticmethod
+    def encode(img, target_format, save_kwargs, recorder=NULL_RECORDER, out=None):
+        """
+        Encode an image into an in-memory buffer
+        
+        Args:
+            out: Optional writable binary stream to encode into instead
+                of a new buffer
+        
+        Returns:
+            io.BytesIO: Encoded bytes (out, if given)
+        """
+        fmt = pil_format(target_format)
+        if fmt is None:
+            raise KeyError(f"unknown target format '{target_format}'")
+        
+        buffer = io.BytesIO() if out is None else out
+        start = _position(buffer, recorder)
+        with recorder.stage("encode"):
+            img.save(buffer, format=fmt, **save_kwargs)
+        if start is not None:
+            recorder.add_bytes("encoded", buffer.tell() - start)
+        return buffer
+    
+    @staticmethod
+    def encode_frames(img, target_format, save_kwargs, recorder=NULL_RECORDER,
+                      quantizer=None, background=None, out=None):
+        """
+        Encode every frame of an animation or multi-page image
+        
+        Frames are converted and encoded one at a time, keeping each
+        frame's duration, the loop count and GIF disposal, so memory does
+        not grow with the number of frames.
+        
+        Returns:
+            io.BytesIO: Encoded bytes (out, if given)
+        """
+        from .frames import save_frames
+        
+        buffer = io.BytesIO() if out is None else out
+        start = _position(buffer, recorder)
+        with recorder.stage("encode"):
+            save_frames(
+                img, buffer, target_format,
+                lambda frame: ImageConverter.convert_mode(
+                    frame, target_format, background=background
+                ),
+                save_kwargs, quantizer
+            )
+        if start is not None:
+            recorder.add_bytes("encoded", buffer.tell() - start)
+        return buffer
+    
+    @staticmethod
+    def write(buffer, save_path, recorder=NULL_RECORDER):
+        """
+        Atomically write encoded data to save_path
+        
+        The data goes to a hidden temporary file in the same folder that
+        is renamed over save_path once complete, so an interrupted write
+        never leaves a truncated output behind.
+        
+        Args:
+            buffer: io.BytesIO or bytes-like encoded output
+            save_path: Final output path
+            recorder: Optional StageRecorder timing the write
+        """
+        data = buffer.getbuffer() if hasattr(buffer, "getbuffer") else buffer
+        tmp_path = temp_path(save_path)
+        with recorder.stage("write"):
+            # os.open honours the umask, unlike tempfile.mkstemp's 0600
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                         | getattr(os, "O_BINARY", 0), 0o666)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, save_path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+    
     @staticmethod
     def convert_image(filepath, target_format, output_dir, 
-                     preserve_metadata=False, max_compression=False):
+                     preserve_metadata=False, max_compression=False,
+                     recorder=None, quality_target=None, quantizer=None,
+                     background=None):
         """
         Convert a single image to target format
         
@@ -23,54 +456,322 @@ class ImageConverter:
             output_dir: Output directory
             preserve_metadata: Whether to preserve EXIF metadata
             max_compression: Whether to use maximum compression
+            recorder: Optional StageRecorder timing each stage
+            quality_target: Optional QualityTarget replacing the fixed
+                JPEG/WEBP/HEIC quality with a size or PSNR goal
+            quantizer: Optional Quantizer choosing how GIF palettes are
+                built (method, dithering, shared palette)
+            background: RGB color transparent areas are flattened onto
+                for JPG and PDF (defaults to white)
+            
+        Returns:
+            str: Path to saved file
+            
+        Raises:
+            ConversionError: Subclass describing which stage failed
+        """
+        rec = recorder or NULL_RECORDER
+        save_path = ImageConverter.output_path(filepath, target_format, output_dir)
+        buffer = ImageConverter.convert_to_buffer(
+            filepath, target_format, preserve_metadata, max_compression,
+            rec, quality_target, quantizer=quantizer, background=background
+        )
+        try:
+            ImageConverter.write(buffer, save_path, rec)
+        except Exception as e:
+            raise classify_error(filepath, "write", e) from e
+        return save_path
+    
+    @staticmethod
+    def convert_to_buffer(filepath, target_format, preserve_metadata=False,
+                          max_compression=False, recorder=None,
+                          quality_target=None, fp=None, quantizer=None,
+                          background=None):
+        """
+        Decode and encode a single image file into memory
+        
+        Args:
+            filepath: Path to source image
+            target_format, preserve_metadata, max_compression, recorder,
+                quality_target, quantizer, background: As for
+                convert_image()
+            fp: Optional file object with the source's bytes, already
+                read by the caller
+            
+        Returns:
+            io.BytesIO: Encoded output
+            
+        Raises:
+            ConversionError: Subclass describing which stage failed
+        """
+        return ImageConverter.convert_buffer(
+            filepath if fp is None else fp, target_format,
+            name=filepath,
+            preserve_metadata=preserve_metadata,
+            max_compression=max_compression,
+            recorder=recorder,
+            quality_target=quality_target,
+            quantizer=quantizer,
+            background=background
+        )
+    
+    @staticmethod
+    def convert_bytes(data, target_format, **options):
+        """
+        Convert an encoded image held in memory
+        
+        Args:
+            data: Source bytes (or any bytes-like object)
+            target_format: Target format (lowercase)
+            **options: As for convert_buffer(), except out (use
+                convert_buffer() to encode into a stream)
+            
+        Returns:
+            bytes: Encoded output
+            
+        Raises:
+            ConversionError: Subclass describing which stage failed
+        """
+        if "out" in options:
+            raise TypeError("convert_bytes() returns new bytes and takes no 'out' stream")
+        return ImageConverter.convert_buffer(data, target_format, **options).getvalue()
+    
+    @staticmethod
+    def convert_buffer(source, target_format, out=None, name=None,
+                       preserve_metadata=False, max_compression=False,
+                       recorder=None, quality_target=None, quantizer=None,
+                       background=None):
+        """
+        Decode and encode a single image from memory, a stream or a file
+        
+        Every conversion runs through here; convert_image() and
+        convert_to_buffer() only supply a path.
+        
+        Args:
+            source: Path, bytes-like object (bytes, bytearray,
+                memoryview, mmap.mmap) or binary file object holding the
+                encoded source; bytes-like sources are read in place,
+                never copied
+            target_format: Target format (lowercase)
+            out: Optional writable binary stream for the output. An
+                io.BytesIO is overwritten from the start and truncated,
+                so one buffer can be reused for many conversions without
+                reallocating (release views from getbuffer() first);
+                other streams (including pipes and other non-seekable
+                ones) are written from their current position
+            name: Source file name, used in error messages and to spot
+                HEIC sources by extension (defaults to source if it is a
+                path)
+            preserve_metadata, max_compression, recorder, quality_target,
+                quantizer, background: As for convert_image()
             
         Returns:
-            str: Path to saved file or None if error
+            io.BytesIO: Encoded output (out, if given)
+            
+        Raises:
+            ConversionError: Subclass describing which stage failed
         """
+        rec = recorder or NULL_RECORDER
+        if isinstance(source, (str, os.PathLike)):
+            filepath, fp = os.fspath(source), None
+        else:
+            filepath, fp = name or "<memory>", memory_stream(source)
+        out = rewind(out)
+        
+        img = None
+        stage = "open"
         try:
-            # Open image
-            img = Image.open(filepath)
+            # Open image (reads only the header)
+            with rec.stage("open"):
+                img = open_image(filepath, target_format, fp)
+            if rec.enabled:
+                rec.add_bytes("read", _read_size(filepath, fp))
             
-            # Generate output path
-            base_name = os.path.splitext(os.path.basename(filepath))[0]
-            save_path = os.path.join(output_dir, f"{base_name}.{target_format}")
+            if target_format in MULTIFRAME_FORMATS and getattr(img, "n_frames", 1) > 1:
+                # Animations are decoded, converted and encoded frame by frame
+                stage = "encode"
+                save_kwargs = ImageConverter.save_options(
+                    img, target_format, preserve_metadata, max_compression
+                )
+                return _finish(ImageConverter.encode_frames(
+                    img, target_format, save_kwargs, rec, quantizer, background, out
+                ))
             
-            # Prepare save arguments
-            save_kwargs = {}
+            stage = "decode"
+            with rec.stage("decode"):
+                img.load()
+            if rec.enabled:
+                rec.add_bytes("decoded", img.size[0] * img.size[1] * len(img.getbands()))
             
             # Format-specific conversions
-            if target_format in ['jpg', 'jpeg']:
-                img = img.convert("RGB")
-                save_kwargs['quality'] = 85 if max_compression else 100
-                
-            elif target_format == 'png':
-                save_kwargs['optimize'] = max_compression
-                
-            elif target_format == 'webp':
-                save_kwargs['quality'] = 85 if max_compression else 100
-                save_kwargs['method'] = 6
-                
-            elif target_format == 'gif':
-                img = img.convert('P', palette=Image.ADAPTIVE)
-                
-            elif target_format == 'ico':
-                img.save(save_path, format='ICO', sizes=[(256, 256)])
-                return save_path
-                
-            elif target_format == 'pdf':
-                img_rgb = img.convert('RGB')
-                img_rgb.save(save_path, 'PDF', resolution=100.0)
-                return save_path
+            stage = "convert"
+            img = ImageConverter.prepare(img, target_format, rec, quantizer, background)
+            
+            stage = "encode"
+            save_kwargs = ImageConverter.save_options(
+                img, target_format, preserve_metadata, max_compression
+            )
+            if (quality_target is not None and quality_target.active
+                    and target_format in LOSSY_FORMATS):
+                # Trial encodes stay in memory; only the winner is written
+                with rec.stage("encode"):
+                    buffer = quality_target.encode(
+                        img, target_format, save_kwargs,
+                        lambda im, kwargs: ImageConverter.encode(im, target_format, kwargs)
+                    )
+                rec.add_bytes("encoded", buffer.tell())
+                if out is not None:
+                    out.write(buffer.getbuffer())
+                    buffer = out
+            else:
+                buffer = ImageConverter.encode(img, target_format, save_kwargs, rec, out)
+            return _finish(buffer)
+            
+        except Exception as e:
+            raise classify_error(filepath, stage, e) from e
+        finally:
+            # Free decoded pixels as soon as the output is encoded
+            if img is not None:
+                img.close()
+    
+    @staticmethod
+    def fanout_plan(filepath, source_size, target_formats, output_dir,
+                    sizes=None, name_template=None):
+        """
+        Work out every output of a fan-out conversion
+        
+        Args:
+            filepath: Path to source image
+            source_size: (width, height) of the source
+            target_formats, output_dir, sizes, name_template: As for
+                convert_fanout()
             
-            # Preserve metadata if enabled
-            if preserve_metadata and hasattr(img, 'info'):
-                exif_data = img.info.get('exif', b'')
-                if exif_data:
-                    save_kwargs['exif'] = exif_data
+        Returns:
+            list: ((width, height), [(target_format, save_path), ...]) per
+            output size, smallest first
+        """
+        if name_template is None:
+            name_template = DEFAULT_SIZED_NAME_TEMPLATE if sizes else DEFAULT_NAME_TEMPLATE
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        width, height = source_size
+        
+        # Never upscale; widths at or above the source collapse into one
+        widths = sorted({min(w, width) for w in sizes}) if sizes else [width]
+        
+        plan = []
+        for out_width in widths:
+            out_height = height if out_width == width else max(round(height * out_width / width), 1)
+            outputs = []
+            for target_format in target_formats:
+                name = name_template.format(
+                    stem=stem, ext=target_format, width=out_width, height=out_height
+                )
+                outputs.append((target_format, os.path.join(output_dir, name)))
+            plan.append(((out_width, out_height), outputs))
+        return plan
+    
+    @staticmethod
+    def convert_fanout(filepath, target_formats, output_dir, sizes=None,
+                       name_template=None, preserve_metadata=False,
+                       max_compression=False, recorder=None, fp=None, sink=None,
+                       quantizer=None, background=None):
+        """
+        Decode a source once and encode it to several formats and sizes
+        
+        Mode conversions are shared between targets that need the same
+        mode, and each resized copy is shared by every target format.
+        
+        Args:
+            filepath: Path to source image
+            target_formats: Target formats (lowercase)
+            output_dir: Output directory
+            sizes: Optional list of widths for a responsive image set;
+                sources are never upscaled
+            name_template: Output file name, formatted with {stem},
+                {ext}, {width} and {height}
+            preserve_metadata: Whether to preserve EXIF metadata
+            max_compression: Whether to use maximum compression
+            recorder: Optional StageRecorder timing each stage
+            fp: Optional file object with the source's bytes
+            sink: Optional callable(save_path, buffer) receiving each
+                encoded output instead of it being written
+            quantizer: Optional Quantizer for GIF outputs
+            background: RGB color for flattening JPG/PDF outputs
+            
+        Returns:
+            list: Paths of every saved file
+            
+        Raises:
+            ConversionError: Subclass describing which stage failed
+        """
+        from PIL import Image
+        
+        rec = recorder or NULL_RECORDER
+        if sink is None:
+            def sink(save_path, buffer):
+                ImageConverter.write(buffer, save_path, rec)
+        if any(fmt in HEIF_FORMATS for fmt in target_formats):
+            ensure_heif_support()
+        
+        saved = []
+        source = None
+        stage = "open"
+        try:
+            with rec.stage("open"):
+                source = open_image(filepath, fp=fp)
+            if rec.enabled:
+                rec.add_bytes("read", _read_size(filepath, fp))
+            
+            stage = "decode"
+            with rec.stage("decode"):
+                source.load()
+            if rec.enabled:
+                rec.add_bytes("decoded", source.size[0] * source.size[1] * len(source.getbands()))
+            
+            width, height = source.size
+            plan = ImageConverter.fanout_plan(
+                filepath, (width, height), target_formats, output_dir, sizes, name_template
+            )
+            
+            for (out_width, out_height), outputs in plan:
+                stage = "resize"
+                scaled = source
+                if out_width != width:
+                    with rec.stage("resize"):
+                        scaled = source.resize((out_width, out_height), Image.LANCZOS)
+                
+                converted = {}
+                try:
+                    for target_format, save_path in outputs:
+                        stage = "convert"
+                        mode = TARGET_MODES.get(target_format)
+                        if mode not in converted:
+                            converted[mode] = ImageConverter.convert_mode(
+                                scaled, target_format, rec, quantizer, background
+                            )
+                        img = converted[mode]
+                        
+                        stage = "encode"
+                        save_kwargs = ImageConverter.save_options(
+                            img, target_format, preserve_metadata, max_compression
+                        )
+                        buffer = ImageConverter.encode(img, target_format, save_kwargs, rec)
+                        
+                        stage = "write"
+                        sink(save_path, buffer)
+                        saved.append(save_path)
+                finally:
+                    # Release this size's copies before making the next one
+                    for img in converted.values():
+                        if img is not scaled:
+                            img.close()
+                    if scaled is not source:
+                        scaled.close()
             
-            # Save image
-            img.save(save_path, **save_kwargs)
-            return save_path
+            return saved
             
         except Exception as e:
-            raise Exception(f"Error converting {filepath}: {str(e)}")
+            raise classify_error(filepath, stage, e) from e
+        finally:
+            if source is not None:
+                source.close()
@@ -0,0 +1,202 @@
+"""Output name collisions and duplicate-source detection
+
+Both run once per batch, before any conversion starts, so their
+decisions depend only on the order of the jobs and never on which
+worker happens to finish first.
+"""
+
+import json
+import os
+import shutil
+import sys
+
+from .converter import temp_path
+from .manifest import hash_file
+
+# What to do when several sources in a batch map to the same output path:
+#   suffix    - the first source keeps the name, later ones get "-2", "-3"...
+#   skip      - the first source keeps the name, later ones are not converted
+#   overwrite - the last source keeps the name, earlier ones are not converted
+COLLISION_POLICIES = ("suffix", "skip", "overwrite")
+DEFAULT_COLLISION_POLICY = "suffix"
+
+# How a duplicate source gets its outputs: a hard link to the first copy's
+# output (falling back to a copy where links are unsupported) or a copy
+DEDUPE_MODES = ("link", "copy")
+
+
+def path_key(path):
+    """Comparison key for output paths, folding case where the OS does"""
+    key = os.path.normcase(os.path.abspath(path))
+    # macOS volumes are case-insensitive by default
+    return key.lower() if sys.platform == "darwin" else key
+
+
+def suffixed_path(path, number):
+    """'out/photo.jpg' -> 'out/photo-2.jpg'"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}-{number}{ext}"
+
+
+def output_key(path, occurrence=1):
+    """
+    Key of one output in a job's renames map
+
+    The first output a job names path is keyed by the path itself; later
+    outputs of the same job with the same name get "path#2", "path#3"...
+    """
+    return path if occurrence == 1 else f"{path}#{occurrence}"
+
+
+def resolve_collisions(jobs, policy=DEFAULT_COLLISION_POLICY):
+    """
+    Settle which job writes each output path
+
+    Renamed outputs are stored on each job's renames map (see
+    output_key()). Suffixes never take a name that another job in the
+    batch writes naturally. When one job names the same path twice, the
+    policy applies to its own outputs too: the repeat is numbered, or
+    the output that loses is mapped to None and not written.
+
+    Args:
+        jobs: List of BatchJob, in batch order
+        policy: One of COLLISION_POLICIES
+
+    Returns:
+        dict: index -> (save_path, filepath of the job that keeps it) for
+        every job that must not run
+    """
+    if policy not in COLLISION_POLICIES:
+        raise ValueError(f"unknown collision policy '{policy}'")
+
+    natural = []
+    for job in jobs:
+        job.renames = {}
+        seen = {}
+        outputs = []
+        for path, _ in job.outputs():
+            seen[path] = seen.get(path, 0) + 1
+            outputs.append((path, output_key(path, seen[path])))
+        natural.append(outputs)
+    # path key -> index of the job writing it; every output claims its own
+    owners = {}
+    skipped = {}
+
+    if policy == "suffix":
+        claimed = {path_key(path) for outputs in natural for path, _ in outputs}
+        for index, outputs in enumerate(natural):
+            for path, rename_key in outputs:
+                key = path_key(path)
+                if key not in owners:
+                    owners[key] = index
+                    continue
+                number = 2
+                while path_key(suffixed_path(path, number)) in claimed:
+                    number += 1
+                renamed = suffixed_path(path, number)
+                claimed.add(path_key(renamed))
+                owners[path_key(renamed)] = index
+                jobs[index].renames[rename_key] = renamed
+        return skipped
+
+    order = range(len(jobs))
+    if policy == "overwrite":
+        order = reversed(order)
+    for index in order:
+        outputs = natural[index]
+        taken = [path for path, _ in outputs if path_key(path) in owners]
+        if taken:
+            owner = jobs[owners[path_key(taken[0])]]
+            skipped[index] = (taken[0], owner.filepath)
+            continue
+        # Within the job the first (skip) or last (overwrite) output wins
+        for path, rename_key in (reversed(outputs) if policy == "overwrite" else outputs):
+            key = path_key(path)
+            if key in owners:
+                jobs[index].renames[rename_key] = None
+            else:
+                owners[key] = index
+    return skipped
+
+
+def _settings_key(job):
+    """Everything besides the source bytes that decides a job's output bytes"""
+    return json.dumps([
+        job.target_formats, job.encode_options(), getattr(job, "sizes", None)
+    ], sort_keys=True)
+
+
+def duplicate_groups(jobs, indices):
+    """
+    Find jobs whose source bytes and settings are identical
+
+    Only files that share a size with another file are hashed, so batches
+    of unique images cost one stat per file.
+
+    Args:
+        jobs: List of BatchJob
+        indices: Job indices to consider, in batch order
+
+    Returns:
+        dict: index of the first job in each group -> list of the
+        indices of its duplicates
+    """
+    by_size = {}
+    for index in indices:
+        job = jobs[index]
+        size = job.info.size if job.info is not None else None
+        if size is None:
+            try:
+                size = os.path.getsize(job.filepath)
+            except OSError:
+                continue
+        by_size.setdefault(size, []).append(index)
+
+    groups = {}
+    for candidates in by_size.values():
+        if len(candidates) < 2:
+            continue
+        leaders = {}
+        for index in candidates:
+            try:
+                digest = hash_file(jobs[index].filepath)
+            except OSError:
+                continue
+            key = (digest, _settings_key(jobs[index]))
+            leader = leaders.setdefault(key, index)
+            if leader != index:
+                groups.setdefault(leader, []).append(index)
+    return groups
+
+
+def link_output(src, dst, mode="link"):
+    """
+    Atomically place a copy of an existing output at another path
+
+    Args:
+        src: Output already written
+        dst: Path to create or replace
+        mode: "link" for a hard link (copying when the file system
+            refuses one), or "copy"
+    """
+    if path_key(src) == path_key(dst):
+        return
+    tmp_path = temp_path(dst)
+    try:
+        linked = False
+        if mode == "link":
+            try:
+                os.link(src, tmp_path)
+                linked = True
+            except OSError:
+                # Other volume, or a file system without hard links
+                pass
+        if not linked:
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
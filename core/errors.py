@@ -0,0 +1,53 @@
+"""Typed conversion errors"""
+
+
+class ConversionError(Exception):
+    """Base class for a failed conversion
+
+    Every subclass carries a short machine-readable category so batch
+    results and metrics can be grouped by failure kind. The message keeps
+    the historical "Error converting <path>: <reason>" form.
+    """
+
+    category = "conversion"
+
+    def __init__(self, filepath, reason, stage=None):
+        super().__init__(f"Error converting {filepath}: {reason}")
+        self.filepath = filepath
+        self.reason = reason
+        self.stage = stage
+
+
+class SourceNotFoundError(ConversionError):
+    """The source file does not exist or cannot be read"""
+    category = "source"
+
+
+class UnsupportedFormatError(ConversionError):
+    """The source or target format is not supported"""
+    category = "unsupported"
+
+
+class DecodeError(ConversionError):
+    """The source could not be decoded"""
+    category = "decode"
+
+
+class ModeConversionError(ConversionError):
+    """Converting pixels to the mode the target needs failed"""
+    category = "mode"
+
+
+class EncodeError(ConversionError):
+    """Encoding to the target format failed"""
+    category = "encode"
+
+
+class WriteError(ConversionError):
+    """The encoded output could not be written"""
+    category = "write"
+
+
+class OutputCollisionError(ConversionError):
+    """Another source in the batch writes the same output path"""
+    category = "collision"
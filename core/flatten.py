@@ -0,0 +1,127 @@
+"""Flattening images to 8-bit RGB for targets without transparency
+
+JPG and PDF store plain RGB. A bare convert("RGB") drops the alpha
+channel, so transparent areas show whatever color happened to be stored
+under them (usually black), and it clips 16-bit samples instead of
+scaling them. Here transparent pixels are composited onto a background
+color and 16-bit samples are scaled down, a horizontal strip at a time,
+so the only full-size allocation is the RGB result itself.
+
+Both steps run in Pillow's C code (paste with a mask, and the linear
+point() transform for deep samples); the same arithmetic in NumPy was
+several times slower, so NumPy is not used.
+"""
+
+import sys
+
+# Pixels processed per strip
+STRIP_PIXELS = 1024 * 1024
+
+# Color transparent pixels are composited onto
+DEFAULT_BACKGROUND = (255, 255, 255)
+
+# Modes holding more than 8 bits per sample
+DEEP_MODES = ("I", "F", "I;16", "I;16L", "I;16B", "I;16N")
+
+# Deep modes point() works on directly; other 16-bit layouts go through "I"
+POINT_MODES = ("I", "F", "I;16")
+
+# info keys that describe the pixels' transparency, not the image, and so
+# are not carried over to the flattened copy
+TRANSPARENCY_INFO = ("transparency",)
+
+
+def strips(size, max_pixels=STRIP_PIXELS):
+    """Yield (left, top, right, bottom) boxes of full-width row strips"""
+    width, height = size
+    rows = max(max_pixels // max(width, 1), 1)
+    for top in range(0, height, rows):
+        yield (0, top, width, min(top + rows, height))
+
+
+def has_transparency(img):
+    """Whether an image carries alpha or a transparent palette color"""
+    return img.mode in ("RGBA", "RGBa", "LA", "La", "PA") or (
+        img.mode in ("P", "L", "RGB") and "transparency" in img.info
+    )
+
+
+def flatten(img, background=DEFAULT_BACKGROUND):
+    """
+    Convert any image to 8-bit RGB for a target without transparency
+
+    Args:
+        img: Decoded image
+        background: RGB tuple that transparent areas are composited onto
+
+    Returns:
+        PIL.Image.Image: RGB image, or img itself if it already is one
+    """
+    if img.mode == "RGB" and "transparency" not in img.info:
+        return img
+    if has_transparency(img):
+        return _keep_info(img, _composite(img, background or DEFAULT_BACKGROUND))
+    if img.mode in DEEP_MODES:
+        return _keep_info(img, _scale_deep(img))
+    # CMYK, YCbCr, L, 1, opaque P, ...: a single conversion
+    return img.convert("RGB")
+
+
+def _keep_info(img, out):
+    """Carry EXIF, ICC profile and the rest of img.info over to out"""
+    out.info.update(
+        (key, value) for key, value in img.info.items() if key not in TRANSPARENCY_INFO
+    )
+    return out
+
+
+def _composite(img, background):
+    """Alpha-composite onto a solid background, one strip at a time"""
+    from PIL import Image
+
+    out = Image.new("RGB", img.size, tuple(background))
+    # Premultiplied and palette/keyed transparency need a real alpha band
+    direct = img.mode in ("RGBA", "LA")
+    for box in strips(img.size):
+        strip = img.crop(box)
+        if not direct:
+            strip = strip.convert("RGBA")
+        # An RGBA/LA source doubles as its own mask (its alpha band)
+        out.paste(strip, box[:2], strip)
+        strip.close()
+    return out
+
+
+def _scale_deep(img):
+    """Scale 16-bit / 32-bit samples down to 8-bit RGB, one strip at a time"""
+    from PIL import Image
+
+    out = Image.new("RGB", img.size)
+    for box in strips(img.size):
+        strip = _pointable(img.crop(box))
+        # point() keeps the deep mode, but every value now fits in 8 bits
+        scaled = strip.point(lambda v: v / 256)
+        rgb = scaled.convert("RGB")
+        out.paste(rgb, box[:2])
+        for part in (strip, scaled, rgb):
+            part.close()
+    return out
+
+
+def _pointable(strip):
+    """A deep strip in a mode point() supports (closing the original)"""
+    from PIL import Image
+
+    if strip.mode in POINT_MODES:
+        return strip
+    source = strip
+    if strip.mode == "I;16N":
+        # Pillow converts I;16N as if it held 8-bit samples; read the same
+        # bytes with their byte order spelled out instead
+        native = "I;16L" if sys.byteorder == "little" else "I;16B"
+        source = Image.frombytes(native, strip.size, strip.tobytes())
+    converted = source.convert("I")
+    if source is not strip:
+        source.close()
+    strip.close()
+    return converted
@@ -0,0 +1,176 @@
+"""Frame-by-frame conversion of animations and multi-page images
+
+Imported lazily by the converter, since it needs Pillow at import time.
+
+Only a couple of frames are ever decoded at once. Pillow's WEBP, TIFF and
+PDF writers walk a multi-frame image by seek()ing it, but copy
+append_images into a list first, so they are handed a FrameStream that
+converts each frame only when it is sought. Pillow's GIF writer keeps
+every frame in memory to compute deltas, so GIF output is written here
+frame by frame with the public getheader()/getdata() helpers instead.
+"""
+
+from PIL import GifImagePlugin, Image
+
+from .palette import Quantizer
+
+# GIF disposal methods
+DISPOSE_NONE = 1
+DISPOSE_BACKGROUND = 2
+
+
+def frame_count(img):
+    """Number of frames or pages in an opened image"""
+    return getattr(img, "n_frames", 1)
+
+
+def adopt_frame(stream, frame):
+    """Make a lazily seeked Image show another image's pixels"""
+    frame.load()
+    stream.im = frame.im
+    stream._size = frame.size
+    stream._mode = frame.mode
+    if not isinstance(getattr(type(stream), "mode", None), property):
+        # Pillow < 10.1 keeps mode as a plain attribute
+        stream.mode = frame.mode
+    stream.palette = frame.palette
+    stream.info = dict(frame.info)
+
+
+class FrameStream(Image.Image):
+    """Multi-frame image whose frames are converted when sought
+
+    Exposes the source's frame count; seek(n) seeks the source and runs
+    the transform on that one frame, so one source frame and one
+    converted frame are alive at a time however long the animation is.
+    Per-frame info (duration, disposal) is recorded as frames are
+    visited.
+    """
+
+    def __init__(self, source, transform):
+        """
+        Args:
+            source: Opened multi-frame image
+            transform: Callable(frame) -> image in the target's mode
+        """
+        super().__init__()
+        self.source = source
+        self.transform = transform
+        self.n_frames = frame_count(source)
+        self.is_animated = self.n_frames > 1
+        self.durations = []
+        self._frame = None
+        self.seek(0)
+
+    def seek(self, frame):
+        if frame == self._frame:
+            return
+        if not 0 <= frame < self.n_frames:
+            raise EOFError("no more frames")
+        self.source.seek(frame)
+        adopt_frame(self, self.transform(self.source))
+        self._frame = frame
+        if frame == len(self.durations):
+            self.durations.append(self.source.info.get("duration", 0))
+
+    def tell(self):
+        return self._frame
+
+
+class _FrameDurations(list):
+    """Duration list filled in as a FrameStream is walked
+
+    The WEBP writer reads duration[i] right after adding frame i, so
+    durations can be taken from each frame as it is decoded instead of
+    from an extra pass over the whole animation.
+    """
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def __getitem__(self, index):
+        return self.stream.durations[index]
+
+    def __len__(self):
+        return self.stream.n_frames
+
+
+def source_loop(source):
+    """Loop count to write: GIFs without a loop extension play once"""
+    loop = source.info.get("loop")
+    if loop is None and source.format == "GIF":
+        return None
+    return loop or 0
+
+
+def save_frames(source, buffer, target_format, transform, save_kwargs, quantizer=None):
+    """
+    Encode every frame of a multi-frame image into a buffer
+
+    Args:
+        source: Opened multi-frame image
+        buffer: Writable binary file object
+        target_format: "gif", "webp", "tiff" or "pdf"
+        transform: Callable(frame) -> frame in the target's mode
+        save_kwargs: Encoder arguments from ImageConverter.save_options()
+        quantizer: Optional Quantizer for GIF frames; with a shared
+            palette every frame uses the same colors
+
+    Returns:
+        int: Number of frames written
+    """
+    if target_format == "gif":
+        return _save_gif_frames(source, buffer, save_kwargs, quantizer or Quantizer())
+
+    stream = FrameStream(source, transform)
+    kwargs = dict(save_kwargs, save_all=True)
+    if target_format == "webp":
+        loop = source_loop(source)
+        kwargs["loop"] = 1 if loop is None else loop
+        kwargs["duration"] = _FrameDurations(stream)
+        # GIF backgrounds are palette indices; start from transparent
+        kwargs.setdefault("background", (0, 0, 0, 0))
+    stream.save(buffer, format=target_format.upper(), **kwargs)
+    return stream.n_frames
+
+
+def _save_gif_frames(source, buffer, save_kwargs, quantizer):
+    """Write an animated GIF one composited frame at a time"""
+    header_info = {}
+    loop = source_loop(source)
+    if loop is not None:
+        header_info["loop"] = loop
+    if "comment" in save_kwargs:
+        header_info["comment"] = save_kwargs["comment"]
+
+    count = frame_count(source)
+    for index in range(count):
+        source.seek(index)
+        frame = quantizer.quantize(source)
+        transparency = frame.info.get("transparency")
+
+        # Pillow hands out fully composited frames, so the source's own
+        # disposal is still right; other sources clear frames that have
+        # transparency so earlier frames never show through
+        disposal = getattr(source, "disposal_method", None)
+        if disposal is None:
+            disposal = DISPOSE_BACKGROUND if transparency is not None else DISPOSE_NONE
+        params = {
+            "duration": source.info.get("duration", 0),
+            "disposal": disposal,
+            "include_color_table": True,
+        }
+        if transparency is not None:
+            params["transparency"] = transparency
+
+        if index == 0:
+            header, _ = GifImagePlugin.getheader(frame, None, header_info)
+            buffer.write(b"".join(header))
+        for chunk in GifImagePlugin.getdata(frame, (0, 0), **params):
+            buffer.write(chunk)
+        if frame is not source:
+            frame.close()
+
+    buffer.write(b";")
+    return count
@@ -0,0 +1,183 @@
+"""Folder scanning and hot-folder watching
+
+Both only look at directory entries and stat results, so they import
+nothing heavy and are safe to run on a background thread.
+"""
+
+import os
+import time
+
+from .converter import INPUT_EXTENSIONS
+
+# Seconds a new file's size and mtime must stay unchanged before it is
+# treated as completely written
+DEFAULT_SETTLE = 2.0
+
+# Seconds between folder scans in watch mode
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def is_image_name(name, extensions=INPUT_EXTENSIONS):
+    """Whether a file name has an accepted extension and is not hidden
+
+    Hidden files are skipped so in-progress outputs (".name.xxxx.tmp")
+    and Prism's own manifests never count as sources.
+    """
+    if name.startswith("."):
+        return False
+    return os.path.splitext(name)[1][1:].lower() in extensions
+
+
+def scan_folder(folder, recursive=True, extensions=INPUT_EXTENSIONS):
+    """
+    Yield image files under a folder using os.scandir
+
+    Entries within each directory are yielded in name order, files before
+    subdirectories. Unreadable directories are skipped.
+
+    Args:
+        folder: Directory to scan
+        recursive: Whether to descend into subdirectories
+        extensions: Accepted lowercase extensions
+
+    Yields:
+        os.DirEntry: One per matching file
+    """
+    pending = [folder]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and not entry.name.startswith("."):
+                        subdirs.append(entry.path)
+                elif is_image_name(entry.name, extensions) and entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+        # Popped from the end, so reverse to visit subfolders in name order
+        pending.extend(reversed(subdirs))
+
+
+def collect_paths(folders, recursive=True, seen=None):
+    """
+    Absolute paths of every image under some folders, without duplicates
+
+    Args:
+        folders: Iterable of directories
+        recursive: Whether to descend into subdirectories
+        seen: Optional set of paths to skip; it is updated in place
+
+    Returns:
+        list: New paths in scan order
+    """
+    seen = set() if seen is None else seen
+    paths = []
+    for folder in folders:
+        for entry in scan_folder(os.path.abspath(folder), recursive):
+            if entry.path not in seen:
+                seen.add(entry.path)
+                paths.append(entry.path)
+    return paths
+
+
+class FolderWatcher:
+    """Polls folders for new or changed images and reports settled ones
+
+    A file is reported once its size and mtime have stayed the same for
+    `settle` seconds, so copies and camera uploads still being written are
+    not picked up half-finished. Files that change again afterwards are
+    reported again.
+    """
+
+    def __init__(self, folders, recursive=True, settle=DEFAULT_SETTLE,
+                 include_existing=False, clock=time.monotonic):
+        """
+        Args:
+            folders: Directories to watch
+            recursive: Whether to watch subdirectories too
+            settle: Seconds a file must stay unchanged before it is ready
+            include_existing: Also report files present at startup
+            clock: Monotonic time source
+        """
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.recursive = recursive
+        self.settle = settle
+        self.clock = clock
+        self.ignored = set()
+        # path -> (size, mtime_ns) last reported
+        self.reported = {}
+        # path -> ((size, mtime_ns), time that signature was first seen)
+        self.candidates = {}
+        if not include_existing:
+            self.reported = dict(self._scan())
+
+    def _scan(self):
+        """(path, (size, mtime_ns)) for every image currently present"""
+        for folder in self.folders:
+            for entry in scan_folder(folder, self.recursive):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, (st.st_size, st.st_mtime_ns)
+
+    def ignore(self, paths):
+        """Never report these paths (e.g. outputs written into a watched folder)"""
+        self.ignored.update(os.path.abspath(p) for p in paths)
+
+    def poll(self):
+        """
+        Scan once
+
+        Returns:
+            list: Paths that became ready since the last poll
+        """
+        now = self.clock()
+        present = set()
+        ready = []
+        for path, signature in self._scan():
+            present.add(path)
+            if path in self.ignored or self.reported.get(path) == signature:
+                continue
+            if signature[0] == 0:
+                # Created but nothing written yet
+                continue
+            seen = self.candidates.get(path)
+            if seen is None or seen[0] != signature:
+                # New or still growing: restart its settle timer
+                self.candidates[path] = (signature, now)
+            elif now - seen[1] >= self.settle:
+                del self.candidates[path]
+                self.reported[path] = signature
+                ready.append(path)
+
+        # Forget files that were deleted
+        for table in (self.candidates, self.reported):
+            for path in [p for p in table if p not in present]:
+                del table[path]
+        return ready
+
+    def watch(self, interval=DEFAULT_POLL_INTERVAL, stop=None):
+        """
+        Poll forever, yielding each non-empty batch of ready paths
+
+        Args:
+            interval: Seconds between scans
+            stop: Optional threading.Event ending the loop when set
+        """
+        while stop is None or not stop.is_set():
+            ready = self.poll()
+            if ready:
+                yield ready
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
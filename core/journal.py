@@ -0,0 +1,130 @@
+"""Append-only job journal for resumable batches
+
+Each finished job appends one JSON line recording its outcome. A batch
+started again with the same journal skips every job the journal lists as
+done, as long as the source is unchanged and its outputs still exist, so
+an interrupted or crashed run picks up where it stopped.
+"""
+
+import hashlib
+import json
+import os
+
+JOURNAL_NAME = ".prism-journal.jsonl"
+JOURNAL_VERSION = 1
+
+
+def job_key(job):
+    """
+    Identify a job by its source's current state and its settings
+
+    Returns:
+        str: Key, or None if the source cannot be stat-ed
+    """
+    try:
+        st = os.stat(job.filepath)
+    except OSError:
+        return None
+    fields = [
+        os.path.abspath(job.filepath), st.st_size, st.st_mtime_ns,
+        job.target_formats, os.path.abspath(job.output_dir),
+        job.encode_options(),
+        # Everything else that decides the output paths
+        getattr(job, "sizes", None), getattr(job, "name_template", None),
+        job.renames,
+    ]
+    text = json.dumps(fields, sort_keys=True)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class JobJournal:
+    """Per-job outcomes appended to a JSON-lines file
+
+    Records are written with a single write() each and flushed straight
+    away, so a crash loses at most a torn last line, which loading skips.
+    Nothing is ever rewritten in place; a later record for the same job
+    supersedes earlier ones.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Journal file; created on the first record
+        """
+        self.path = path
+        self.done = {}  # job key -> output paths
+        self._file = None
+        self.load()
+
+    def load(self):
+        """Read existing records, skipping unreadable lines"""
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict) or record.get("v") != JOURNAL_VERSION:
+                    continue
+                key = record.get("key")
+                if record.get("state") == "done":
+                    self.done[key] = record.get("outputs", [])
+                else:
+                    self.done.pop(key, None)
+
+    def is_done(self, job, key=None):
+        """
+        Whether a previous run finished this job and its outputs still exist
+
+        Returns:
+            list: The job's output paths, or None if it must run
+        """
+        key = key or job_key(job)
+        outputs = self.done.get(key) if key else None
+        if not outputs or not all(os.path.exists(path) for path in outputs):
+            return None
+        return outputs
+
+    def record(self, job, result, key=None):
+        """Append the outcome of a finished job"""
+        key = key or job_key(job)
+        if key is None:
+            return
+        record = {"v": JOURNAL_VERSION, "key": key, "source": job.filepath}
+        if result.ok:
+            record["state"] = "done"
+            record["outputs"] = result.save_paths
+            self.done[key] = result.save_paths
+        else:
+            record["state"] = "failed"
+            record["error"] = result.error
+            self.done.pop(key, None)
+
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Close the file, making sure records reach the disk"""
+        if self._file is None:
+            return
+        try:
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+    def discard(self):
+        """Close and delete the journal (once a batch has fully completed)"""
+        self.close()
+        self.done = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,122 @@
+"""On-disk manifest of outputs for incremental conversion"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".prism-manifest.json"
+MANIFEST_VERSION = 1
+
+# Read size for streaming content hashes
+HASH_CHUNK = 1024 * 1024
+
+
+def hash_file(filepath):
+    """Return a streaming BLAKE2b hex digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OutputManifest:
+    """Records which source and settings produced each file in a folder
+
+    Entries are keyed by output file name and store the source path, its
+    size and mtime (plus an optional content hash), the target format and
+    the encode options. An output is up to date when all of those still
+    match and the output file exists.
+    """
+
+    def __init__(self, output_dir, use_hash=False):
+        """
+        Args:
+            output_dir: Folder holding the outputs and the manifest
+            use_hash: Also compare content hashes, so sources whose mtime
+                changed but whose bytes did not are still skipped
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.use_hash = use_hash
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Read the manifest, starting empty if it is missing or unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.entries = data.get("outputs", {})
+
+    def save(self):
+        """Atomically write the manifest if anything changed"""
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "outputs": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def fingerprint(self, filepath, target_format, options):
+        """
+        Describe a source and its encode settings
+
+        Returns:
+            dict: Fingerprint, or None if the source cannot be read
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return {
+            "source": os.path.abspath(filepath),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "target": target_format,
+            "options": options,
+        }
+
+    def is_current(self, save_path, fingerprint):
+        """Whether save_path was produced from this exact fingerprint"""
+        if fingerprint is None:
+            return False
+        entry = self.entries.get(os.path.basename(save_path))
+        if entry is None or not os.path.exists(save_path):
+            return False
+
+        for field in ("source", "size", "target", "options"):
+            if entry.get(field) != fingerprint[field]:
+                return False
+        if entry.get("mtime_ns") == fingerprint["mtime_ns"]:
+            return True
+
+        # Same size but touched: fall back to comparing contents
+        if self.use_hash and entry.get("hash"):
+            try:
+                current = hash_file(fingerprint["source"])
+            except OSError:
+                return False
+            if current == entry["hash"]:
+                entry["mtime_ns"] = fingerprint["mtime_ns"]
+                self.dirty = True
+                return True
+        return False
+
+    def record(self, save_path, fingerprint):
+        """Remember that save_path was produced from fingerprint"""
+        if fingerprint is None:
+            return
+        entry = dict(fingerprint)
+        if self.use_hash:
+            try:
+                entry["hash"] = hash_file(fingerprint["source"])
+            except OSError:
+                pass
+        self.entries[os.path.basename(save_path)] = entry
+        self.dirty = True
@@ -0,0 +1,87 @@
+"""Decoded-size estimates and memory-budgeted job admission"""
+
+import os
+
+from .converter import TARGET_MODES, open_image
+
+# Bytes per pixel Pillow uses to hold decoded data for each mode
+BYTES_PER_PIXEL = {
+    "1": 1, "L": 1, "P": 1,
+    "I;16": 2, "I;16L": 2, "I;16B": 2, "I;16N": 2,
+    "LA": 4, "La": 4, "PA": 4, "RGB": 4, "RGBA": 4, "RGBa": 4, "RGBX": 4,
+    "CMYK": 4, "YCbCr": 4, "LAB": 4, "HSV": 4, "I": 4, "F": 4,
+}
+
+# Extra decoded copy made when converting to a target's mode, in bytes
+# per pixel (quantizing to "P" also goes through an RGB buffer)
+CONVERSION_COPY = {"RGB": 4, "P": 5}
+
+# Headroom for encoder buffers on top of the pixel data
+ENCODER_OVERHEAD = 1.25
+
+
+def estimate_footprint(filepath, target_format, info=None):
+    """
+    Estimate peak memory needed to convert a file, reading only its header
+
+    Args:
+        filepath: Path to source image
+        target_format: Target format (lowercase), or a list of formats
+            for a fan-out conversion
+        info: Optional probed ImageInfo; its dimensions and mode are used
+            instead of reading the header again
+
+    Returns:
+        int: Estimated bytes, or 0 if the header cannot be read
+    """
+    formats = [target_format] if isinstance(target_format, str) else list(target_format)
+    if info is not None and info.has_header:
+        width, height, mode = info.width, info.height, info.mode
+    else:
+        try:
+            with open_image(filepath, formats[0]) as img:
+                width, height = img.size
+                mode = img.mode
+        except Exception:
+            return 0
+
+    # Fan-out keeps one converted copy per distinct target mode alive
+    modes = {TARGET_MODES.get(fmt) for fmt in formats}
+    copies = sum(CONVERSION_COPY.get(m, 0) for m in modes)
+
+    pixels = width * height
+    peak = pixels * (BYTES_PER_PIXEL.get(mode, 4) + copies)
+    return int(peak * ENCODER_OVERHEAD)
+
+
+def default_memory_budget():
+    """Half of physical RAM, or None when it cannot be determined"""
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+    return total // 2 if total > 0 else None
+
+
+class MemoryBudget:
+    """Tracks estimated memory held by in-flight conversions"""
+
+    def __init__(self, limit=None):
+        """
+        Args:
+            limit: Budget in bytes, or None for no limit
+        """
+        self.limit = limit
+        self.in_use = 0
+
+    def can_admit(self, cost):
+        """Whether a job of this cost fits; a lone job is always admitted"""
+        if self.limit is None or self.in_use == 0:
+            return True
+        return self.in_use + cost <= self.limit
+
+    def acquire(self, cost):
+        self.in_use += cost
+
+    def release(self, cost):
+        self.in_use = max(self.in_use - cost, 0)
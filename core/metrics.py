@@ -0,0 +1,153 @@
+"""Per-stage conversion timings and structured metrics"""
+
+import json
+import time
+
+# Stages in the order convert_image() runs them
+STAGES = ("open", "decode", "resize", "convert", "quantize", "encode", "write")
+
+
+class _NullStage:
+    """Reusable no-op context manager"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullRecorder:
+    """Recorder used when metrics are disabled; every call is a no-op"""
+
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def add_bytes(self, name, count):
+        pass
+
+
+NULL_RECORDER = NullRecorder()
+
+
+class _Stage:
+    """Times one stage into a StageRecorder"""
+
+    __slots__ = ("recorder", "name", "started")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stages = self.recorder.stages
+        stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+class StageRecorder:
+    """Collects stage timings and byte counts for one conversion"""
+
+    enabled = True
+
+    def __init__(self, filepath, target_format):
+        self.filepath = filepath
+        self.target_format = target_format
+        self.stages = {}
+        self.bytes = {}
+
+    def stage(self, name):
+        """Context manager timing a stage"""
+        return _Stage(self, name)
+
+    def add_bytes(self, name, count):
+        """Add to a byte counter ("read", "decoded", "encoded", ...)"""
+        self.bytes[name] = self.bytes.get(name, 0) + count
+
+    def to_record(self, error=None):
+        """
+        Plain, picklable summary of this conversion
+
+        Args:
+            error: ConversionError (or other exception) if it failed
+        """
+        return {
+            "source": self.filepath,
+            "target": self.target_format,
+            "ok": error is None,
+            "error_category": getattr(error, "category", None if error is None else "conversion"),
+            "total": sum(self.stages.values()),
+            "stages": self.stages,
+            "bytes": self.bytes,
+        }
+
+
+class ConversionMetrics:
+    """Aggregates conversion records for a batch"""
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        if record is not None:
+            self.records.append(record)
+
+    def write_jsonl(self, path):
+        """Write one JSON record per line"""
+        with open(path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        """
+        Per-stage totals for the batch
+
+        Returns:
+            list: (stage, count, total seconds, mean ms, p95 ms, share)
+        """
+        per_stage = {}
+        for record in self.records:
+            for name, seconds in record["stages"].items():
+                per_stage.setdefault(name, []).append(seconds)
+
+        grand_total = sum(sum(v) for v in per_stage.values()) or 1.0
+        order = [s for s in STAGES if s in per_stage] + sorted(set(per_stage) - set(STAGES))
+        rows = []
+        for name in order:
+            values = sorted(per_stage[name])
+            total = sum(values)
+            p95 = values[min(int(len(values) * 0.95), len(values) - 1)]
+            rows.append((name, len(values), total, total / len(values) * 1000,
+                         p95 * 1000, total / grand_total))
+        return rows
+
+    def error_counts(self):
+        """Number of failures per error category"""
+        counts = {}
+        for record in self.records:
+            if not record["ok"]:
+                category = record["error_category"]
+                counts[category] = counts.get(category, 0) + 1
+        return counts
+
+    def format_summary(self):
+        """Summary as a printable table"""
+        lines = [f"{'stage':<10} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'share':>7}"]
+        for name, count, total, mean_ms, p95_ms, share in self.summary():
+            lines.append(f"{name:<10} {count:>7} {total:>9.3f} {mean_ms:>9.2f} {p95_ms:>9.2f} {share:>6.1%}")
+
+        read = sum(r["bytes"].get("read", 0) for r in self.records)
+        encoded = sum(r["bytes"].get("encoded", 0) for r in self.records)
+        lines.append(f"{len(self.records)} conversions, "
+                     f"{read / 1e6:.1f} MB read, {encoded / 1e6:.1f} MB written")
+        for category, count in sorted(self.error_counts().items()):
+            lines.append(f"{category} errors: {count}")
+        return "\n".join(lines)
@@ -0,0 +1,210 @@
+"""Palette quantization for GIF output
+
+Palettes are built from a reduced copy of the image (median cut on a
+full-resolution photo is by far the slowest step of a GIF conversion),
+then every pixel is mapped to its nearest palette entry in one pass
+inside Pillow. A batch can instead share one palette computed from a
+sample of all its sources, so a series of images or frames uses exactly
+the same colors.
+"""
+
+import hashlib
+import math
+
+from .converter import open_image
+
+QUANTIZERS = ("mediancut", "octree", "libimagequant")
+DEFAULT_QUANTIZER = "mediancut"
+
+# Palettes are computed from at most this many pixels (about 256x256;
+# larger samples barely change the colors but cost much more)
+PALETTE_SAMPLE_PIXELS = 64 * 1024
+
+# Palette index reserved for transparent pixels
+TRANSPARENT_INDEX = 255
+
+# Shared palettes sample this many sources (and up to FRAMES_PER_SOURCE
+# frames of each), each shrunk to SHARED_SAMPLE_SIZE pixels square
+SHARED_SAMPLE_FILES = 64
+SHARED_SAMPLE_SIZE = 128
+FRAMES_PER_SOURCE = 4
+
+
+def available(method):
+    """Whether this Pillow build supports a quantizer"""
+    if method != "libimagequant":
+        return method in QUANTIZERS
+    from PIL import features
+
+    return bool(features.check_feature("libimagequant"))
+
+
+def has_alpha(img):
+    """Whether an image has transparency worth keeping in a GIF"""
+    return img.mode in ("RGBA", "LA", "PA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+
+
+class Quantizer:
+    """How images are reduced to a palette
+
+    Plain data, so it travels to worker processes with the job.
+    """
+
+    def __init__(self, method=DEFAULT_QUANTIZER, dither=False, palette=None):
+        """
+        Args:
+            method: One of QUANTIZERS; libimagequant falls back to median
+                cut where Pillow was built without it
+            dither: Floyd-Steinberg dithering when mapping to the palette
+            palette: Optional shared RGB palette (bytes, up to 255 colors)
+                used instead of a palette per image
+        """
+        if method not in QUANTIZERS:
+            raise ValueError(f"unknown quantizer '{method}'")
+        self.method = method
+        self.dither = dither
+        self.palette = palette
+
+    def key(self):
+        """Stable description, used in manifests and journals"""
+        key = f"{self.method};dither={int(bool(self.dither))}"
+        if self.palette:
+            key += ";palette=" + hashlib.blake2b(self.palette, digest_size=8).hexdigest()
+        return key
+
+    def build_palette(self, img, colors=256):
+        """
+        Compute a palette for an RGB image
+
+        Images that already use few enough colors get exactly those;
+        others are quantized from a reduced copy.
+
+        Returns:
+            PIL.Image.Image: P-mode image carrying the palette
+        """
+        from PIL import Image
+
+        # Stops counting as soon as there are too many, so photos cost nothing
+        exact = img.getcolors(colors)
+        if exact:
+            palette = Image.new("P", (1, 1))
+            palette.putpalette([c for _, rgb in exact for c in rgb])
+            return palette
+
+        factor = math.ceil(math.sqrt(img.width * img.height / PALETTE_SAMPLE_PIXELS))
+        sample = img.reduce(factor) if factor > 1 else img
+        method = self.method if available(self.method) else DEFAULT_QUANTIZER
+        return sample.quantize(colors, {
+            "mediancut": Image.Quantize.MEDIANCUT,
+            "octree": Image.Quantize.FASTOCTREE,
+            "libimagequant": Image.Quantize.LIBIMAGEQUANT,
+        }[method])
+
+    def palette_image(self):
+        """P-mode image carrying the shared palette, or None"""
+        if not self.palette:
+            return None
+        from PIL import Image
+
+        img = Image.new("P", (1, 1))
+        img.putpalette(self.palette)
+        return img
+
+    def quantize(self, img):
+        """
+        Reduce an image to a palette for GIF output
+
+        Pixels less than half opaque become TRANSPARENT_INDEX, which is
+        then set as the image's transparency.
+
+        Returns:
+            PIL.Image.Image: P-mode image
+        """
+        from PIL import Image
+
+        if (img.mode == "P" and not self.palette
+                and not isinstance(img.info.get("transparency"), bytes)):
+            # Already a palette image with at most one transparent index
+            return img
+
+        alpha = has_alpha(img)
+        rgb = img.convert("RGB")
+        palette = self.palette_image()
+        if palette is None:
+            palette = self.build_palette(rgb, TRANSPARENT_INDEX if alpha else 256)
+        dither = Image.Dither.FLOYDSTEINBERG if self.dither else Image.Dither.NONE
+        paletted = rgb.quantize(palette=palette, dither=dither)
+        if rgb is not img:
+            rgb.close()
+
+        if alpha:
+            # Mostly-transparent pixels become the reserved transparent index
+            clear = img.convert("RGBA").getchannel("A").point(lambda a: 255 if a < 128 else 0)
+            paletted.paste(TRANSPARENT_INDEX, mask=clear)
+            paletted.info["transparency"] = TRANSPARENT_INDEX
+        return paletted
+
+
+def _sample_frames(img, size):
+    """A few evenly spaced frames of a source, shrunk to size x size"""
+    count = getattr(img, "n_frames", 1)
+    picks = sorted({i * count // FRAMES_PER_SOURCE for i in range(min(count, FRAMES_PER_SOURCE))})
+    tiles = []
+    for index in picks:
+        img.seek(index)
+        if count == 1:
+            img.draft("RGB", (size, size))
+        tile = img.convert("RGB")
+        # Only the color distribution matters, so the aspect ratio can go
+        tiles.append(tile.resize((size, size)))
+        tile.close()
+    return tiles
+
+
+def shared_palette(paths, quantizer, sample_files=SHARED_SAMPLE_FILES,
+                   sample_size=SHARED_SAMPLE_SIZE):
+    """
+    Compute one palette for a whole batch from a sample of its sources
+
+    Evenly spaced sources (and a few frames of each animation) are shrunk
+    and tiled into one image, which is then quantized.
+
+    Args:
+        paths: Source paths in batch order
+        quantizer: Quantizer whose method builds the palette
+        sample_files: Most sources to sample
+        sample_size: Side of each sampled tile, in pixels
+
+    Returns:
+        bytes: RGB palette with up to 255 colors (one index stays free
+        for transparency), or None if no source could be read
+    """
+    from PIL import Image
+
+    paths = list(paths)
+    step = max(len(paths) / sample_files, 1)
+    picks = [paths[int(i * step)] for i in range(min(len(paths), sample_files))]
+
+    tiles = []
+    for path in picks:
+        try:
+            with open_image(path) as img:
+                tiles.extend(_sample_frames(img, sample_size))
+        except Exception:
+            continue
+    if not tiles:
+        return None
+
+    columns = math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    mosaic = Image.new("RGB", (columns * sample_size, rows * sample_size))
+    for index, tile in enumerate(tiles):
+        mosaic.paste(tile, ((index % columns) * sample_size, (index // columns) * sample_size))
+    # Empty cells repeat the first tile rather than adding black
+    for index in range(len(tiles), columns * rows):
+        mosaic.paste(tiles[0], ((index % columns) * sample_size, (index // columns) * sample_size))
+
+    palette = quantizer.build_palette(mosaic, TRANSPARENT_INDEX)
+    return bytes(palette.getpalette("RGB"))
@@ -0,0 +1,236 @@
+"""Header-only image metadata probing
+
+Probing stats a file and reads just enough of it for Pillow to identify
+the real format, dimensions, mode and frame count, without decoding any
+pixels. ProbeService does this on a background thread for the GUI, and
+BatchConverter reuses the results to estimate job costs.
+"""
+
+import os
+import queue
+import threading
+
+from .converter import open_image
+
+# EXIF IFD pointer tag in TIFF headers
+EXIF_IFD_TAG = 0x8769
+
+
+class ImageInfo:
+    """What a probe learned about one file
+
+    size and mtime_ns come from stat; the other fields from the image
+    header and stay None if it could not be read (error says why).
+    """
+
+    __slots__ = ("path", "size", "mtime_ns", "format", "width", "height",
+                 "mode", "frames", "has_exif", "error")
+
+    def __init__(self, path, size=None, mtime_ns=None):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.format = None
+        self.width = None
+        self.height = None
+        self.mode = None
+        self.frames = None
+        self.has_exif = None
+        self.error = None
+
+    @property
+    def pixels(self):
+        """Width times height, or None if the header was not read"""
+        if self.width is None:
+            return None
+        return self.width * self.height
+
+    @property
+    def has_header(self):
+        return self.format is not None
+
+    def copy(self):
+        """Independent ImageInfo with the same fields"""
+        info = ImageInfo(self.path)
+        for name in self.__slots__:
+            setattr(info, name, getattr(self, name))
+        return info
+
+    def matches(self, st):
+        """Whether this info is still valid for an os.stat() result"""
+        return self.size == st.st_size and self.mtime_ns == st.st_mtime_ns
+
+
+def stat_file(path):
+    """ImageInfo holding only stat fields (error set if stat failed)"""
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        info = ImageInfo(path)
+        info.error = e.strerror or str(e)
+        return info
+    return ImageInfo(path, st.st_size, st.st_mtime_ns)
+
+
+def read_header(info):
+    """
+    Fill in format, dimensions, mode, frames and EXIF presence
+
+    Args:
+        info: ImageInfo from stat_file(); updated in place
+
+    Returns:
+        ImageInfo: The same object
+    """
+    if info.error is not None:
+        return info
+    try:
+        with open_image(info.path) as img:
+            info.format = img.format
+            info.width, info.height = img.size
+            info.mode = img.mode
+            info.frames = getattr(img, "n_frames", 1)
+            info.has_exif = _has_exif(img)
+    except Exception as e:
+        info.error = str(e) or type(e).__name__
+    return info
+
+
+def probe_file(path):
+    """Stat a file and read its header"""
+    return read_header(stat_file(path))
+
+
+def _has_exif(img):
+    """EXIF presence from what the header parse already loaded"""
+    if img.info.get("exif"):
+        return True
+    # TIFF keeps EXIF behind a tag rather than in info; other formats
+    # (PNG's eXIf chunk after the pixels) would need a full read
+    tags = getattr(img, "tag_v2", None)
+    return bool(tags is not None and EXIF_IFD_TAG in tags)
+
+
+class ProbeCache:
+    """Thread-safe path -> ImageInfo map, validated against stat on lookup"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, st=None):
+        """
+        Cached info for a path if the file is unchanged
+
+        Args:
+            path: File path
+            st: os.stat() result to validate against (stat-ed if omitted)
+        """
+        with self._lock:
+            info = self._entries.get(path)
+        if info is None:
+            return None
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+        return info if info.matches(st) else None
+
+    def put(self, info):
+        if info.size is not None:
+            with self._lock:
+                self._entries[info.path] = info
+
+
+class ProbeService:
+    """Probes files on a background thread and reports results in batches
+
+    Paths are taken off the queue in groups: every file in a group is
+    stat-ed first and reported with kind "stat", so sizes show up quickly
+    even on slow network drives; then headers are read and the completed
+    infos reported with kind "info" as new objects, leaving the "stat"
+    ones untouched. Unchanged files are answered from the cache.
+    """
+
+    def __init__(self, callback, cache=None, batch_size=64):
+        """
+        Args:
+            callback: Callable(kind, infos) run on the probe thread with
+                kind "stat" or "info" and a list of ImageInfo
+            cache: Optional ProbeCache shared with other users
+            batch_size: Files stat-ed and reported together
+        """
+        self.callback = callback
+        self.cache = cache or ProbeCache()
+        self.batch_size = batch_size
+        self._queue = queue.SimpleQueue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    @property
+    def busy(self):
+        """Whether any submitted paths are still being probed"""
+        return self._pending > 0
+
+    def submit(self, paths):
+        """Queue paths for probing (call from any thread)"""
+        paths = list(paths)
+        if not paths or self._stopped:
+            return
+        with self._lock:
+            self._pending += len(paths)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="prism-probe", daemon=True
+                )
+                self._thread.start()
+        for path in paths:
+            self._queue.put(path)
+
+    def stop(self):
+        """Stop after the current batch; queued paths are dropped"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def _take_batch(self):
+        """Block for one path, then take up to batch_size without waiting"""
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped:
+            batch = [path for path in self._take_batch() if path is not None]
+            if self._stopped:
+                return
+
+            infos = []
+            for path in batch:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    infos.append(stat_file(path))
+                    continue
+                cached = self.cache.get(path, st)
+                infos.append(cached or ImageInfo(path, st.st_size, st.st_mtime_ns))
+            self.callback("stat", infos)
+
+            # The "stat" infos now belong to the callback's receiver, so
+            # headers are read into copies
+            results = []
+            for info in infos:
+                if not info.has_header and info.error is None:
+                    info = read_header(info.copy())
+                    self.cache.put(info)
+                results.append(info)
+            self.callback("info", results)
+
+            with self._lock:
+                self._pending -= len(batch)
@@ -0,0 +1,197 @@
+"""Target-size / target-quality encoding
+
+Instead of a fixed quality, lossy encodes can search for the quality that
+meets a goal: the largest file that fits a byte budget, or the smallest
+one whose PSNR against the source stays above a threshold. Trial encodes
+go into memory buffers; only the winning buffer is written.
+"""
+
+import io
+import json
+import math
+import os
+
+# Formats with a quality knob worth searching
+LOSSY_FORMATS = ("jpg", "jpeg", "webp", "heic")
+
+# Search range for the encoder quality setting
+QUALITY_MIN = 10
+QUALITY_MAX = 100
+
+QUALITY_CACHE_NAME = ".prism-quality.json"
+
+
+def psnr(reference, candidate):
+    """Peak signal-to-noise ratio in dB between two same-sized images"""
+    from PIL import ImageChops, ImageStat
+
+    if candidate.mode != reference.mode:
+        candidate = candidate.convert(reference.mode)
+    rms = ImageStat.Stat(ImageChops.difference(reference, candidate)).rms
+    mse = sum(r * r for r in rms) / len(rms)
+    if mse == 0:
+        return float("inf")
+    return 10 * math.log10(255 * 255 / mse)
+
+
+class QualityTarget:
+    """Goal used to pick an encoder quality for one conversion
+
+    After encode() runs, chosen holds the winning quality so callers can
+    cache it and skip the search next time via quality_hint.
+    """
+
+    def __init__(self, target_size=None, min_psnr=None, quality_hint=None):
+        """
+        Args:
+            target_size: Largest acceptable output, in bytes
+            min_psnr: Lowest acceptable PSNR against the source, in dB
+            quality_hint: Quality found by an earlier search; used as-is
+        """
+        self.target_size = target_size
+        self.min_psnr = min_psnr
+        self.quality_hint = quality_hint
+        self.chosen = None
+        self.trials = 0
+
+    @property
+    def active(self):
+        return self.target_size is not None or self.min_psnr is not None
+
+    def encode(self, img, target_format, save_kwargs, encode):
+        """
+        Encode at the best quality for this goal
+
+        Args:
+            img: Prepared image
+            target_format: Target format (lowercase)
+            save_kwargs: Encoder arguments; 'quality' is overridden
+            encode: Callable(img, kwargs) -> io.BytesIO doing one encode
+
+        Returns:
+            io.BytesIO: The winning encode
+        """
+        def trial(quality):
+            self.trials += 1
+            kwargs = dict(save_kwargs, quality=quality)
+            return encode(img, kwargs)
+
+        if self.quality_hint is not None:
+            self.chosen = self.quality_hint
+            return trial(self.quality_hint)
+
+        reference = None
+        if self.min_psnr is not None:
+            mode = "RGBA" if "A" in img.getbands() else "RGB"
+            reference = img if img.mode == mode else img.convert(mode)
+
+        buffers = {}
+
+        def encoded(quality):
+            if quality not in buffers:
+                buffers[quality] = trial(quality)
+            return buffers[quality]
+
+        def similar_enough(quality):
+            from PIL import Image
+
+            buffer = encoded(quality)
+            buffer.seek(0)
+            with Image.open(buffer) as decoded:
+                score = psnr(reference, decoded)
+            buffer.seek(0, io.SEEK_END)
+            return score >= self.min_psnr
+
+        candidates = []
+        if self.target_size is not None:
+            # Highest quality that still fits the byte budget
+            fits = _bisect_last(lambda q: encoded(q).tell() <= self.target_size)
+            candidates.append(QUALITY_MIN if fits is None else fits)
+        if self.min_psnr is not None:
+            # Lowest quality that still looks close enough to the source
+            good = _bisect_first(similar_enough)
+            candidates.append(QUALITY_MAX if good is None else good)
+
+        # The size budget is a hard cap; within it, prefer the smaller file
+        self.chosen = min(candidates)
+        return encoded(self.chosen)
+
+
+def _bisect_last(predicate):
+    """Largest quality for which a monotonically falling predicate holds"""
+    lo, hi, best = QUALITY_MIN, QUALITY_MAX, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if predicate(mid):
+            best, lo = mid, mid + 1
+        else:
+            hi = mid - 1
+    return best
+
+
+def _bisect_first(predicate):
+    """Smallest quality for which a monotonically rising predicate holds"""
+    lo, hi, best = QUALITY_MIN, QUALITY_MAX, None
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if predicate(mid):
+            best, hi = mid, mid - 1
+        else:
+            lo = mid + 1
+    return best
+
+
+class QualityCache:
+    """Remembers the quality chosen for each source, per output folder"""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, QUALITY_CACHE_NAME)
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(job):
+        # Every encode option changes the output size (EXIF, flattening,
+        # palettes), so a quality found under other options may not fit
+        options = json.dumps(job.encode_options(), sort_keys=True)
+        return f"{os.path.abspath(job.filepath)}|{job.target_format}|{options}"
+
+    @staticmethod
+    def _stat(filepath):
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    def lookup(self, job):
+        """Cached quality for a job with an unchanged source, or None"""
+        entry = self.entries.get(self._key(job))
+        if entry and entry["stat"] == self._stat(job.filepath):
+            return entry["quality"]
+        return None
+
+    def store(self, job, quality):
+        """Remember the quality picked for a job"""
+        stat = self._stat(job.filepath)
+        if quality is None or stat is None:
+            return
+        self.entries[self._key(job)] = {
+            "stat": stat, "quality": quality
+        }
+        self.dirty = True
+
+    def save(self):
+        """Atomically write the cache if anything changed"""
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,89 @@
+"""Submission order for batch jobs
+
+The worker pool starts jobs in the order they are submitted, while
+results keep their original index, so reordering never changes what a
+caller shows. Largest-first keeps every core busy until the end of a
+batch (a huge file submitted last would otherwise run alone), and
+smallest-first returns the first results soonest. Pinned jobs (a higher
+job.priority) go ahead of the rest under every policy.
+"""
+
+from .probe import probe_file
+
+SCHEDULES = ("fifo", "largest", "smallest")
+DEFAULT_SCHEDULE = "fifo"
+
+# Decoding cost tracks the compressed size: about 0.05 s per MB of source
+DECODE_COST_PER_BYTE = 0.05 / (1024 * 1024)
+
+# Encoding cost per decoded megapixel, in seconds, measured on the photo
+# corpus with the encoder settings save_options() uses
+ENCODE_COST_PER_MEGAPIXEL = {
+    "jpg": 0.006, "jpeg": 0.006, "png": 0.37, "webp": 0.55, "gif": 0.15,
+    "bmp": 0.003, "tiff": 0.004, "ico": 0.03, "pdf": 0.007, "heic": 1.6,
+}
+
+# How max_compression changes those costs (zlib level 9 for PNG, a
+# lower quality for WEBP/HEIC)
+MAX_COMPRESSION_FACTOR = {"png": 12.0, "webp": 0.4, "heic": 0.85}
+
+# Pixels assumed per source byte when the header cannot be read
+PIXELS_PER_BYTE = 4
+
+
+def job_cost(job):
+    """
+    Estimated seconds to convert a job, from its size, pixels and targets
+
+    Uses the job's probed info, probing (and storing) it if missing.
+
+    Returns:
+        float: Estimated cost; 0 for files that cannot be stat-ed
+    """
+    if job.info is None:
+        job.info = probe_file(job.filepath)
+    info = job.info
+    if info.size is None:
+        return 0.0
+
+    if info.has_header:
+        pixels = info.pixels * (info.frames or 1)
+        # Fan-out sizes are encoded from downscaled copies
+        sizes = getattr(job, "sizes", None)
+        if sizes:
+            widths = {min(w, info.width) for w in sizes}
+            pixels *= sum((w / info.width) ** 2 for w in widths)
+    else:
+        pixels = info.size * PIXELS_PER_BYTE
+
+    encode = 0.0
+    for fmt in job.target_formats:
+        cost = ENCODE_COST_PER_MEGAPIXEL.get(fmt, 0.1)
+        if job.max_compression:
+            cost *= MAX_COMPRESSION_FACTOR.get(fmt, 1.0)
+        encode += cost
+    return info.size * DECODE_COST_PER_BYTE + pixels / 1e6 * encode
+
+
+def schedule(jobs, indices, policy=DEFAULT_SCHEDULE):
+    """
+    Order job indices for submission to the worker pool
+
+    Args:
+        jobs: List of BatchJob
+        indices: Job indices to run
+        policy: One of SCHEDULES; "fifo" keeps the given order
+
+    Returns:
+        list: The same indices, highest job.priority first and, within a
+        priority, ordered by the policy (ties keep their original order)
+    """
+    if policy not in SCHEDULES:
+        raise ValueError(f"unknown schedule '{policy}'")
+    indices = list(indices)
+    if policy == "fifo":
+        return sorted(indices, key=lambda index: -jobs[index].priority)
+
+    costs = {index: job_cost(jobs[index]) for index in indices}
+    sign = -1 if policy == "largest" else 1
+    return sorted(indices, key=lambda index: (-jobs[index].priority, sign * costs[index]))
@@ -0,0 +1,575 @@
+"""Local conversion service
+
+A small asyncio HTTP/1.1 server, on a localhost TCP port or a Unix
+socket, that lets other programs on the host convert images without
+starting the GUI:
+
+    POST /convert?format=webp   body: source image -> converted image
+    GET  /health                liveness and current load
+    GET  /metrics               counters, latencies and per-stage timings
+
+Conversions run on a process pool. At most workers + queue conversions
+are admitted at once; a request arriving beyond that gets 429 Too Many
+Requests with a Retry-After header as soon as its headers are read,
+before any of its body is. Request bodies are read as they arrive
+(Content-Length or chunked) and responses are written in chunks, each
+waiting for the client to take the last, so slow clients hold back only
+their own connection. Only the standard library is used.
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+from .converter import OUTPUT_FORMATS
+from .metrics import STAGES
+from .palette import QUANTIZERS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Conversions admitted beyond those running, per worker
+DEFAULT_QUEUE_PER_WORKER = 2
+
+# Largest accepted source, in bytes
+DEFAULT_MAX_BODY = 256 * 1024 * 1024
+
+# Bytes read or written per step of a request or response body
+CHUNK_SIZE = 64 * 1024
+
+# Recent request latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 1024
+
+# Retry-After sent with 429 responses, in seconds
+RETRY_AFTER = 1
+
+# Longest wait for a client to finish sending a body that is refused
+LINGER_TIMEOUT = 2.0
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    415: "Unsupported Media Type",
+    422: "Unprocessable Entity",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HttpError(Exception):
+    """A request that is answered with an error status"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def convert_request(data, target_format, options):
+    """
+    Convert one request body (runs in a worker process)
+
+    Returns:
+        dict: Picklable outcome with the output bytes or the error
+    """
+    from .converter import ImageConverter
+    from .metrics import StageRecorder
+    from .quality import QualityTarget
+
+    options = dict(options)
+    goal = options.pop("quality", None)
+    if goal:
+        options["quality_target"] = QualityTarget(**goal)
+    recorder = StageRecorder(options.get("name") or "<memory>", target_format)
+    try:
+        output = ImageConverter.convert_bytes(data, target_format, recorder=recorder, **options)
+    except Exception as e:
+        # ConversionError does not survive pickling, so send plain data
+        return {
+            "ok": False,
+            "error": str(e),
+            "category": getattr(e, "category", "conversion"),
+            "metrics": recorder.to_record(e),
+        }
+    return {"ok": True, "data": output, "metrics": recorder.to_record()}
+
+
+def parse_options(query):
+    """
+    Conversion arguments from a /convert query string
+
+    Returns:
+        tuple: (target format, keyword arguments for convert_request())
+
+    Raises:
+        HttpError: 400 for missing or invalid parameters
+    """
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+
+    def flag(name, default):
+        value = params.get(name)
+        if value is None:
+            return default
+        return value.lower() in ("1", "true", "yes", "on")
+
+    def number(name, kind):
+        value = params.get(name)
+        if value is None:
+            return None
+        try:
+            return kind(value)
+        except ValueError:
+            raise HttpError(400, f"'{name}' must be a number")
+
+    target_format = params.get("format", "").lower()
+    if target_format not in OUTPUT_FORMATS:
+        raise HttpError(400, "'format' must be one of " + ", ".join(OUTPUT_FORMATS))
+
+    options = {
+        "name": params.get("name"),
+        "preserve_metadata": flag("metadata", True),
+        "max_compression": flag("max_compression", False),
+    }
+    if "background" in params:
+        from PIL import ImageColor
+
+        try:
+            options["background"] = ImageColor.getrgb(params["background"])[:3]
+        except ValueError:
+            raise HttpError(400, "'background' must be a color like white or #f0f0f0")
+    if "quantizer" in params or "dither" in params:
+        from .palette import DEFAULT_QUANTIZER, Quantizer
+
+        method = params.get("quantizer", DEFAULT_QUANTIZER)
+        if method not in QUANTIZERS:
+            raise HttpError(400, "'quantizer' must be one of " + ", ".join(QUANTIZERS))
+        options["quantizer"] = Quantizer(method, flag("dither", False))
+
+    target_size = number("target_size", int)
+    min_psnr = number("min_psnr", float)
+    if target_size is not None or min_psnr is not None:
+        options["quality"] = {
+            "target_size": None if target_size is None else target_size * 1024,
+            "min_psnr": min_psnr,
+        }
+    return target_format, options
+
+
+def content_type(target_format):
+    """MIME type of a target format's output"""
+    guessed, _ = mimetypes.guess_type("output." + target_format)
+    if guessed is None and target_format in ("heic", "heif"):
+        guessed = "image/heic"
+    return guessed or "application/octet-stream"
+
+
+class ServiceStats:
+    """Counters and recent latencies reported by /metrics
+
+    Stage timings are totals since start-up rather than per-request
+    records, so memory stays constant however long the service runs.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = {
+            "requests": 0, "converted": 0, "failed": 0,
+            "rejected": 0, "bad_requests": 0, "server_errors": 0,
+        }
+        self.bytes = {"in": 0, "out": 0}
+        self.stages = {}
+        self.errors = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def count(self, name):
+        self.counts[name] += 1
+
+    def add(self, outcome, size_in, latency):
+        """Record a finished conversion"""
+        self.bytes["in"] += size_in
+        if outcome["ok"]:
+            self.counts["converted"] += 1
+            self.bytes["out"] += len(outcome["data"])
+        else:
+            self.counts["failed"] += 1
+            category = outcome["category"]
+            self.errors[category] = self.errors.get(category, 0) + 1
+        for name, seconds in outcome["metrics"]["stages"].items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        """Plain dict for /metrics"""
+        latencies = sorted(self.latencies)
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            rank = min(int(len(latencies) * pct / 100), len(latencies) - 1)
+            return round(latencies[rank] * 1000, 2)
+
+        order = [s for s in STAGES if s in self.stages] + sorted(set(self.stages) - set(STAGES))
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "counts": dict(self.counts),
+            "bytes": dict(self.bytes),
+            "errors": dict(self.errors),
+            "latency_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "window": len(latencies),
+            },
+            "stages": {name: round(self.stages[name], 6) for name in order},
+        }
+
+
+class ConversionServer:
+    """Serves conversions over HTTP from a process pool"""
+
+    def __init__(self, workers=None, queue_size=None, max_body=DEFAULT_MAX_BODY):
+        """
+        Args:
+            workers: Number of worker processes (defaults to CPU count)
+            queue_size: Conversions admitted beyond those running before
+                requests get 429 (defaults to two per worker)
+            max_body: Largest accepted source, in bytes
+        """
+        self.workers = workers or os.cpu_count() or 1
+        if queue_size is None:
+            queue_size = self.workers * DEFAULT_QUEUE_PER_WORKER
+        self.capacity = self.workers + max(queue_size, 0)
+        self.max_body = max_body
+        self.active = 0
+        self.stats = ServiceStats()
+        self.pool = None
+        self.server = None
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """
+        Start the worker pool and listen
+
+        Returns:
+            str or tuple: Socket path, or the (host, port) bound
+        """
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            return unix_path
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop listening, then let running conversions finish"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.pool.shutdown)
+
+    async def handle(self, reader, writer):
+        """Serve every request on one connection"""
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await read_head(reader)
+                    if request is None:
+                        break
+                    method, target, headers = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    keep_alive = await self.route(method, target, headers, reader, writer, keep_alive)
+                except HttpError as e:
+                    if e.status == 429:
+                        self.stats.count("rejected")
+                    elif e.status >= 500:
+                        self.stats.count("server_errors")
+                    else:
+                        self.stats.count("bad_requests")
+                    # The body may not have been read, so the connection ends
+                    keep_alive = False
+                    await send_json(writer, e.status, {"error": e.message}, False, e.headers)
+                    await linger(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, target, headers, reader, writer, keep_alive):
+        """
+        Answer one request
+
+        Returns:
+            bool: Whether the connection can take another request
+        """
+        url = urlsplit(target)
+        self.stats.count("requests")
+        if url.path == "/health":
+            status = 200 if self.pool is not None else 503
+            await send_json(writer, status, {
+                "status": "ok" if status == 200 else "unavailable",
+                "workers": self.workers,
+                "active": self.active,
+                "capacity": self.capacity,
+            }, keep_alive)
+            return keep_alive
+        if url.path == "/metrics":
+            snapshot = self.stats.snapshot()
+            snapshot.update(workers=self.workers, active=self.active, capacity=self.capacity)
+            await send_json(writer, 200, snapshot, keep_alive)
+            return keep_alive
+        if url.path != "/convert":
+            raise HttpError(404, f"no such endpoint '{url.path}'")
+        if method != "POST":
+            raise HttpError(405, "use POST with the source image as the body")
+
+        target_format, options = parse_options(url.query)
+        if self.active >= self.capacity:
+            raise HttpError(429, "conversion queue is full",
+                            {"Retry-After": str(RETRY_AFTER)})
+
+        # Admitted from here on: the body counts against the queue too
+        self.active += 1
+        try:
+            started = time.perf_counter()
+            body = await read_body(reader, headers, self.max_body)
+            outcome = await self.convert(body, target_format, options)
+            self.stats.add(outcome, len(body), time.perf_counter() - started)
+            del body
+        finally:
+            self.active -= 1
+
+        if not outcome["ok"]:
+            status = 415 if outcome["category"] == "unsupported" else 422
+            await send_json(writer, status, {
+                "error": outcome["error"], "category": outcome["category"]
+            }, keep_alive)
+            return keep_alive
+        await send(writer, 200, outcome["data"], content_type(target_format), keep_alive)
+        return keep_alive
+
+    async def convert(self, body, target_format, options):
+        """Run a conversion on the pool, replacing the pool if it broke"""
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return await loop.run_in_executor(
+                pool, convert_request, body, target_format, options
+            )
+        except BrokenProcessPool:
+            # A worker died (out of memory, a crashing codec): start afresh,
+            # once, however many requests the broken pool failed
+            if self.pool is pool:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                pool.shutdown(wait=False)
+            raise HttpError(503, "a worker process died; retry the request",
+                            {"Retry-After": str(RETRY_AFTER)})
+
+
+async def linger(reader, writer, timeout=LINGER_TIMEOUT):
+    """
+    Half-close a connection and discard what the client still sends
+
+    Closing a socket with unread input resets it, which can destroy the
+    response before the client reads it.
+    """
+    async def discard():
+        while await reader.read(CHUNK_SIZE):
+            pass
+
+    try:
+        if writer.can_write_eof():
+            writer.write_eof()
+        await asyncio.wait_for(discard(), timeout)
+    except (asyncio.TimeoutError, OSError):
+        pass
+
+
+async def read_head(reader):
+    """
+    Read a request line and headers
+
+    Returns:
+        tuple: (method, target, {lowercase name: value}), or None once
+        the client has closed the connection
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, headers
+
+
+async def read_body(reader, headers, limit):
+    """
+    Read a request body as it arrives
+
+    Returns:
+        bytearray: The body
+
+    Raises:
+        HttpError: 400 for a negative or malformed size, 411 without a
+        length, 413 past limit
+    """
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = bytearray()
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise HttpError(400, "malformed chunked body")
+            if size < 0:
+                raise HttpError(400, "negative chunk size")
+            if size == 0:
+                # Skip any trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return body
+            if len(body) + size > limit:
+                raise HttpError(413, f"source larger than {limit} bytes")
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+
+    try:
+        length = int(headers["content-length"])
+    except (KeyError, ValueError):
+        raise HttpError(411, "send Content-Length or a chunked body")
+    if length < 0:
+        raise HttpError(400, "negative Content-Length")
+    if length > limit:
+        raise HttpError(413, f"source larger than {limit} bytes")
+    # Filled in place, so the body is never held twice
+    body = bytearray(length)
+    view = memoryview(body)
+    received = 0
+    while received < length:
+        chunk = await reader.read(min(CHUNK_SIZE, length - received))
+        if not chunk:
+            raise asyncio.IncompleteReadError(bytes(view[:received]), length)
+        view[received:received + len(chunk)] = chunk
+        received += len(chunk)
+    view.release()
+    return body
+
+
+async def send(writer, status, body, mime, keep_alive=True, headers=None):
+    """Write a response, one chunk at a time as the client takes them"""
+    lines = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        f"Content-Type: {mime}",
+        f"Content-Length: {len(body)}",
+        "Connection: " + ("keep-alive" if keep_alive else "close"),
+    ]
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    view = memoryview(body)
+    for start in range(0, len(view), CHUNK_SIZE):
+        writer.write(view[start:start + CHUNK_SIZE])
+        await writer.drain()
+    await writer.drain()
+
+
+async def send_json(writer, status, payload, keep_alive=True, headers=None):
+    """Write a JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    await send(writer, status, body, "application/json", keep_alive, headers)
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="prism serve",
+        description="Serve image conversions over HTTP on this machine."
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST,
+        help="Address to listen on (default %(default)s)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help="TCP port (default %(default)s, 0 picks a free one)"
+    )
+    parser.add_argument(
+        "--unix", metavar="PATH",
+        help="Listen on a Unix socket instead of TCP"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="Number of worker processes (defaults to CPU count)"
+    )
+    parser.add_argument(
+        "--queue", type=int, default=None, metavar="N",
+        help="Conversions admitted beyond those running before requests "
+             "get 429 (default: two per worker)"
+    )
+    parser.add_argument(
+        "--max-body", type=int, default=DEFAULT_MAX_BODY // (1024 * 1024), metavar="MB",
+        help="Largest accepted source (default %(default)s MB)"
+    )
+    return parser
+
+
+def main(argv=None):
+    """Service entry point, returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    server = ConversionServer(args.workers, args.queue, args.max_body * 1024 * 1024)
+
+    async def run():
+        address = await server.start(args.host, args.port, args.unix)
+        if args.unix:
+            fields = {"socket": address}
+        else:
+            fields = {"host": address[0], "port": address[1]}
+        fields.update(workers=server.workers, capacity=server.capacity)
+        sys.stdout.write(json.dumps(dict({"event": "listening"}, **fields)) + "\n")
+        sys.stdout.flush()
+        try:
+            # Stop cleanly on SIGTERM too (not available on Windows)
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, asyncio.current_task().cancel
+            )
+        except (NotImplementedError, AttributeError):
+            pass
+        try:
+            await server.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await server.close()
+            if args.unix:
+                try:
+                    os.remove(args.unix)
+                except OSError:
+                    pass
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,179 @@
+"""Thumbnail rendering and a persistent LRU thumbnail cache
+
+Thumbnails are decoded at reduced resolution where the format allows it
+(JPEG DCT scaling, HEIC embedded thumbnails) and stored as small PNGs in
+a per-user cache folder, keyed by source path, size and mtime.
+"""
+
+import hashlib
+import io
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from .converter import open_image
+
+# Longest side of a stored thumbnail, in pixels (2x the on-screen size so
+# they stay sharp on HiDPI displays)
+THUMBNAIL_SIZE = 64
+
+# Default cap on the cache folder's total size
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def default_cache_dir():
+    """Per-user cache folder for thumbnails"""
+    if sys.platform.startswith("win"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "prism", "thumbnails")
+
+
+def render_thumbnail(filepath, size=THUMBNAIL_SIZE):
+    """
+    Render a thumbnail, decoding as little of the source as possible
+
+    Args:
+        filepath: Path to source image
+        size: Longest side of the thumbnail
+
+    Returns:
+        bytes: PNG-encoded thumbnail
+    """
+    with open_image(filepath) as img:
+        # JPEG decodes at 1/2..1/8 scale; HEIC switches to an embedded
+        # thumbnail at least this big. Other formats ignore the hint.
+        img.draft(None, (size, size))
+        if img.mode in ("I", "F") or img.mode.startswith("I;16"):
+            # Resampling needs 8-bit samples; scale 16-bit values down
+            img = img.convert("I").point(lambda v: v / 256).convert("L")
+        img.thumbnail((size, size))
+        if img.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in img.getbands() or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+class ThumbnailCache:
+    """On-disk thumbnail store with a total-size cap and LRU eviction
+
+    Each thumbnail is one PNG named by a hash of the source's absolute
+    path, size, mtime and the thumbnail size, so edited files get fresh
+    thumbnails and stale ones simply age out. A file's mtime doubles as
+    its last-use time. Safe to use from several threads.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_CACHE_BYTES, size=THUMBNAIL_SIZE):
+        """
+        Args:
+            directory: Cache folder (defaults to default_cache_dir())
+            max_bytes: Total size the folder is trimmed back to
+            size: Longest side of the thumbnails
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = None  # file name -> bytes, least recently used first
+        self._total = 0
+
+    def _load(self):
+        """Index the cache folder, oldest first (called with the lock held)"""
+        self._entries = OrderedDict()
+        self._total = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with os.scandir(self.directory) as it:
+                files = []
+                for entry in it:
+                    if entry.name.endswith(".png") and entry.is_file():
+                        st = entry.stat()
+                        files.append((st.st_mtime, entry.name, st.st_size))
+        except OSError:
+            return
+        for _, name, nbytes in sorted(files):
+            self._entries[name] = nbytes
+            self._total += nbytes
+
+    def _name(self, filepath):
+        """Cache file name for the source's current state, or None"""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(filepath)}|{st.st_size}|{st.st_mtime_ns}|{self.size}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest() + ".png"
+
+    def get(self, filepath):
+        """Cached PNG bytes for a source, or None"""
+        name = self._name(filepath)
+        if name is None:
+            return None
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return None
+        return data
+
+    def put(self, filepath, data):
+        """Store PNG bytes for a source, evicting the least recently used"""
+        name = self._name(filepath)
+        if name is None:
+            return
+        with self._lock:
+            if self._entries is None:
+                # Also creates the cache folder
+                self._load()
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        evicted = []
+        with self._lock:
+            self._total += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, nbytes = self._entries.popitem(last=False)
+                self._total -= nbytes
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except OSError:
+                pass
+
+    def thumbnail(self, filepath):
+        """
+        PNG thumbnail for a source, rendering and caching it on a miss
+
+        Raises:
+            Exception: Whatever opening or decoding the source raised
+        """
+        data = self.get(filepath)
+        if data is None:
+            data = render_thumbnail(filepath, self.size)
+            self.put(filepath, data)
+        return data
@@ -0,0 +1,551 @@
+"""Distributed batches through a job directory on shared storage
+
+A batch is written once as a directory that every worker can reach (an
+NFS or SMB share, or a local folder for several processes):
+
+    batch.json              what the batch is; written last
+    chunks/000000.json      the jobs of each chunk of sources
+    leases/000000.lease     the worker currently converting a chunk
+    journal/000000.jsonl    JobJournal of a chunk, so a reclaimed chunk
+                            skips the files its last owner finished
+    done/000000.json        per-file results of a finished chunk
+
+Workers claim a chunk by creating its lease with O_CREAT | O_EXCL, which
+only one of them can do, and keep it alive by touching it. A lease whose
+modification time is older than the lease period belongs to a crashed
+or stalled worker and is reclaimed. Reclaiming first creates a marker
+named after the expired lease's timestamp, again with O_EXCL, so only one
+worker takes each expired lease. Ages are measured against a file the
+workers touch, so everything uses the file server's clock and machines
+whose clocks disagree still agree on expiry.
+
+No broker or lock server is involved, and there is no exactly-once
+guarantee: a stalled worker that wakes up after losing its lease
+notices at its next heartbeat and stops, but may finish the file in
+hand. Outputs are written atomically, so at worst a file is converted
+twice.
+"""
+
+import argparse
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+from .batch import BatchControl, BatchConverter, BatchJob, FanoutJob
+from .journal import JobJournal
+
+JOBDIR_VERSION = 1
+
+# Sources per chunk: small enough to spread a batch over many workers,
+# large enough that claiming does not dominate
+DEFAULT_CHUNK_SIZE = 16
+
+# Seconds a lease lasts without a heartbeat; heartbeats come three times
+# per period
+DEFAULT_LEASE_SECONDS = 120.0
+
+# Longest pause between claim attempts while other workers hold every
+# remaining chunk
+MAX_IDLE_WAIT = 5.0
+
+
+def job_record(job):
+    """Plain, JSON-ready description of a BatchJob or FanoutJob"""
+    record = {
+        "filepath": job.filepath,
+        "formats": job.target_formats,
+        "output_dir": job.output_dir,
+        "preserve_metadata": bool(job.preserve_metadata),
+        "max_compression": bool(job.max_compression),
+        "target_size": job.target_size,
+        "min_psnr": job.min_psnr,
+        "background": None if job.background is None else list(job.background),
+        "priority": job.priority,
+        "renames": job.renames,
+    }
+    if isinstance(job, FanoutJob):
+        record["sizes"] = job.sizes
+        record["name_template"] = job.name_template
+    quantizer = job.quantizer
+    if quantizer is not None:
+        record["quantizer"] = {
+            "method": quantizer.method,
+            "dither": quantizer.dither,
+            "palette": None if quantizer.palette is None else quantizer.palette.hex(),
+        }
+    return record
+
+
+def job_from_record(record):
+    """Rebuild the job described by job_record()"""
+    quantizer = None
+    if record.get("quantizer"):
+        from .palette import Quantizer
+
+        spec = record["quantizer"]
+        palette = spec.get("palette")
+        quantizer = Quantizer(spec["method"], spec["dither"],
+                              None if palette is None else bytes.fromhex(palette))
+    background = record.get("background")
+    options = {
+        "preserve_metadata": record["preserve_metadata"],
+        "max_compression": record["max_compression"],
+        "quantizer": quantizer,
+        "background": None if background is None else tuple(background),
+        "priority": record.get("priority", 0),
+    }
+    if "sizes" in record:
+        job = FanoutJob(record["filepath"], record["formats"], record["output_dir"],
+                        sizes=record["sizes"], name_template=record["name_template"],
+                        **options)
+    else:
+        job = BatchJob(record["filepath"], record["formats"][0], record["output_dir"],
+                       target_size=record.get("target_size"),
+                       min_psnr=record.get("min_psnr"), **options)
+    job.renames = dict(record.get("renames") or {})
+    return job
+
+
+def _write_json(path, data):
+    """Write JSON atomically (temp file, then rename over path)"""
+    from .converter import temp_path
+
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json(path):
+    """Parsed JSON file, or None if missing or unreadable"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _create_exclusive(path, data=b""):
+    """
+    Create a file that must not exist yet
+
+    Returns:
+        bool: False if another worker created it first
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL
+                     | getattr(os, "O_BINARY", 0), 0o666)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def worker_id():
+    """Name identifying this worker process across machines"""
+    return f"{socket.gethostname()}:{os.getpid()}:{os.urandom(3).hex()}"
+
+
+class Lease:
+    """A worker's hold on one chunk"""
+
+    def __init__(self, jobdir, chunk, token):
+        self.jobdir = jobdir
+        self.chunk = chunk
+        self.token = token
+        self.path = jobdir.lease_path(chunk)
+
+    def held(self):
+        """Whether the lease file still names this holder"""
+        record = _read_json(self.path)
+        return record is not None and record.get("token") == self.token
+
+    def renew(self):
+        """
+        Heartbeat: push the lease's expiry back
+
+        Returns:
+            bool: False once another worker has taken the chunk over
+        """
+        try:
+            # No explicit times, so the file server stamps its own clock
+            os.utime(self.path, None)
+        except OSError:
+            return False
+        return self.held()
+
+    def release(self):
+        """Give the chunk up, if this worker still holds it"""
+        if self.held():
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class JobDirectory:
+    """A batch split into leasable chunks on shared storage"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Job directory, as created by create()
+        """
+        self.path = path
+        self.meta = _read_json(os.path.join(path, "batch.json"))
+        if self.meta is None or self.meta.get("v") != JOBDIR_VERSION:
+            raise ValueError(f"{path} is not a Prism job directory")
+        self.chunks = self.meta["chunks"]
+        self.lease_seconds = self.meta["lease_seconds"]
+
+    @classmethod
+    def create(cls, path, jobs, chunk_size=DEFAULT_CHUNK_SIZE,
+               lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Write a new job directory
+
+        Output names must already be settled (resolve_collisions()) and
+        the jobs in the order they should be claimed. Paths are stored as
+        given, so every worker must see sources and outputs at the same
+        paths.
+
+        Args:
+            path: Directory to create; must not hold a batch already
+            jobs: BatchJob list
+            chunk_size: Sources per chunk
+            lease_seconds: How long a lease survives without a heartbeat
+
+        Returns:
+            JobDirectory: The new batch
+        """
+        if os.path.exists(os.path.join(path, "batch.json")):
+            raise FileExistsError(f"{path} already holds a batch")
+        for name in ("chunks", "leases", "journal", "done"):
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+
+        chunk_size = max(chunk_size, 1)
+        count = 0
+        for start in range(0, len(jobs), chunk_size):
+            records = [job_record(job) for job in jobs[start:start + chunk_size]]
+            _write_json(os.path.join(path, "chunks", _chunk_name(count) + ".json"),
+                        {"jobs": records})
+            count += 1
+        # Written last: workers ignore a directory until it is complete
+        _write_json(os.path.join(path, "batch.json"), {
+            "v": JOBDIR_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "jobs": len(jobs),
+            "chunks": count,
+            "chunk_size": chunk_size,
+            "lease_seconds": lease_seconds,
+        })
+        return cls(path)
+
+    def chunk_path(self, chunk):
+        return os.path.join(self.path, "chunks", _chunk_name(chunk) + ".json")
+
+    def lease_path(self, chunk):
+        return os.path.join(self.path, "leases", _chunk_name(chunk) + ".lease")
+
+    def journal_path(self, chunk):
+        return os.path.join(self.path, "journal", _chunk_name(chunk) + ".jsonl")
+
+    def done_path(self, chunk):
+        return os.path.join(self.path, "done", _chunk_name(chunk) + ".json")
+
+    def is_done(self, chunk):
+        return os.path.exists(self.done_path(chunk))
+
+    def jobs(self, chunk):
+        """The jobs of a chunk"""
+        data = _read_json(self.chunk_path(chunk))
+        if data is None:
+            raise ValueError(f"chunk {chunk} of {self.path} is unreadable")
+        return [job_from_record(record) for record in data["jobs"]]
+
+    def now(self):
+        """Current time by the file server's clock"""
+        clock = os.path.join(self.path, "leases", "clock")
+        with open(clock, "a"):
+            pass
+        os.utime(clock, None)
+        return os.stat(clock).st_mtime
+
+    def claim(self, worker):
+        """
+        Lease the first chunk that is neither done nor held by a live lease
+
+        Args:
+            worker: worker_id() of the claiming worker
+
+        Returns:
+            Lease: The claimed chunk, or None if there is nothing to take
+        """
+        now = None
+        for chunk in range(self.chunks):
+            if self.is_done(chunk):
+                continue
+            path = self.lease_path(chunk)
+            token = f"{worker}/{os.urandom(4).hex()}"
+            record = json.dumps({"worker": worker, "token": token}).encode("utf-8")
+            if _create_exclusive(path, record):
+                return Lease(self, chunk, token)
+
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # Released in the meantime; claimable on the next pass
+                continue
+            if now is None:
+                now = self.now()
+            if now - st.st_mtime <= self.lease_seconds:
+                continue
+
+            # Expired: one marker per expired lease decides who takes it
+            marker = f"{path}.reclaim-{st.st_mtime_ns}"
+            if not _create_exclusive(marker, worker.encode("utf-8")):
+                continue
+            try:
+                if os.stat(path).st_mtime_ns != st.st_mtime_ns:
+                    # Its owner was only slow and has just renewed it
+                    continue
+            except FileNotFoundError:
+                pass
+            previous = _read_json(path) or {}
+            _write_json(path, {"worker": worker, "token": token,
+                               "reclaimed_from": previous.get("worker")})
+            return Lease(self, chunk, token)
+        return None
+
+    def complete(self, lease, results):
+        """
+        Record a finished chunk and drop its lease
+
+        Args:
+            lease: Lease the chunk was converted under
+            results: BatchResult list for the chunk's jobs
+        """
+        _write_json(self.done_path(lease.chunk), {
+            "worker": lease.token.rsplit("/", 1)[0],
+            "results": [{
+                "source": result.job.filepath,
+                "status": result.status.lower(),
+                "outputs": result.save_paths,
+                "error": result.error,
+                "error_category": result.error_category,
+            } for result in results],
+        })
+        for path in glob.glob(glob.escape(lease.path) + ".reclaim-*"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        lease.release()
+
+    def status(self):
+        """
+        Progress of the batch
+
+        Returns:
+            dict: Chunk counts (done, leased, expired, pending) and totals
+            of converted, cached and failed files in finished chunks
+        """
+        counts = {"chunks": self.chunks, "done": 0, "leased": 0, "expired": 0, "pending": 0,
+                  "converted": 0, "cached": 0, "failed": 0}
+        now = self.now()
+        for chunk in range(self.chunks):
+            done = _read_json(self.done_path(chunk))
+            if done is not None:
+                counts["done"] += 1
+                for result in done["results"]:
+                    status = {"done": "converted", "error": "failed"}.get(result["status"])
+                    counts[status or "cached"] += 1
+                continue
+            try:
+                st = os.stat(self.lease_path(chunk))
+            except FileNotFoundError:
+                counts["pending"] += 1
+                continue
+            counts["leased" if now - st.st_mtime <= self.lease_seconds else "expired"] += 1
+        return counts
+
+    def finished(self):
+        """Whether every chunk is done"""
+        return all(self.is_done(chunk) for chunk in range(self.chunks))
+
+
+def _chunk_name(chunk):
+    return f"{chunk:06d}"
+
+
+class _Heartbeat(threading.Thread):
+    """Renews a lease in the background; cancels the chunk if it is lost"""
+
+    def __init__(self, lease, control, interval):
+        super().__init__(name="prism-heartbeat", daemon=True)
+        self.lease = lease
+        self.control = control
+        self.interval = interval
+        self.lost = False
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            if not self.lease.renew():
+                self.lost = True
+                self.control.cancel()
+                return
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def work(jobdir, converter_options=None, worker=None, emit=None, max_chunks=None):
+    """
+    Claim and convert chunks until the batch is finished
+
+    Args:
+        jobdir: JobDirectory
+        converter_options: Keyword arguments for each chunk's
+            BatchConverter (max_workers, memory_budget, pipeline, ...)
+        worker: Worker name (defaults to worker_id())
+        emit: Optional callable(event, **fields) reporting progress
+        max_chunks: Stop after this many chunks (None for no limit)
+
+    Returns:
+        int: Files that failed in the chunks this worker finished
+    """
+    worker = worker or worker_id()
+    emit = emit or (lambda event, **fields: None)
+    options = dict(converter_options or {})
+    failed = 0
+    finished = 0
+    idle = 0.5
+
+    while max_chunks is None or finished < max_chunks:
+        lease = jobdir.claim(worker)
+        if lease is None:
+            if jobdir.finished():
+                break
+            # Everything left is leased; wait for it to finish or expire
+            time.sleep(idle)
+            idle = min(idle * 2, MAX_IDLE_WAIT, jobdir.lease_seconds / 3)
+            continue
+        idle = 0.5
+
+        jobs = jobdir.jobs(lease.chunk)
+        emit("claim", chunk=lease.chunk, files=len(jobs), worker=worker)
+        control = BatchControl()
+        heartbeat = _Heartbeat(lease, control, jobdir.lease_seconds / 3)
+        heartbeat.start()
+        results = []
+        try:
+            # Names were settled for the whole batch when it was created
+            converter = BatchConverter(
+                journal=JobJournal(jobdir.journal_path(lease.chunk)),
+                collisions=None, **options
+            )
+            for result in converter.run(jobs, control):
+                results.append(result)
+                emit("file", chunk=lease.chunk, source=result.job.filepath,
+                     outputs=result.save_paths, status=result.status.lower(),
+                     error=result.error, error_category=result.error_category)
+        finally:
+            heartbeat.stop()
+
+        if heartbeat.lost or not lease.held():
+            emit("lost", chunk=lease.chunk, worker=worker)
+            continue
+        jobdir.complete(lease, results)
+        finished += 1
+        chunk_failed = sum(1 for result in results if not result.ok)
+        failed += chunk_failed
+        emit("chunk", chunk=lease.chunk, files=len(results), failed=chunk_failed)
+    return failed
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="prism worker",
+        description="Convert chunks of a batch job directory on shared storage."
+    )
+    parser.add_argument(
+        "jobdir",
+        help="Job directory created with prism --create-jobdir"
+    )
+    parser.add_argument(
+        "--status", action="store_true",
+        help="Print the batch's progress and exit"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="Worker processes on this machine (defaults to CPU count)"
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=None, metavar="MB",
+        help="Max decoded image data in flight (default: half of RAM, 0 = unlimited)"
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true",
+        help="Read and write on background threads while workers encode "
+             "(faster on network shares)"
+    )
+    parser.add_argument(
+        "--max-chunks", type=int, default=None, metavar="N",
+        help="Stop after finishing N chunks"
+    )
+    return parser
+
+
+def main(argv=None):
+    """Worker entry point, returns the process exit code"""
+    from .cli import emit
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        jobdir = JobDirectory(args.jobdir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.status:
+        emit("status", **jobdir.status())
+        return 0
+
+    options = {"max_workers": args.workers, "pipeline": args.pipeline}
+    if args.memory_budget is not None:
+        options["memory_budget"] = args.memory_budget * 1024 * 1024
+    worker = worker_id()
+    started = time.monotonic()
+    emit("worker", worker=worker, jobdir=os.path.abspath(args.jobdir))
+    try:
+        failed = work(jobdir, options, worker, emit, args.max_chunks)
+    except KeyboardInterrupt:
+        # Leases of unfinished chunks expire and are reclaimed elsewhere
+        emit("interrupted")
+        return 130
+    emit("complete", failed=failed, elapsed=round(time.monotonic() - started, 3),
+         batch=jobdir.status())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""
+PRISM - Headless batch converter
+Run with `python -m prism` on machines without a display,
+`python -m prism serve` for the local conversion service, or
+`python -m prism worker DIR` to convert chunks of a shared job directory
+"""
+
+import sys
+
+
+def run():
+    """Dispatch to the conversion service, a queue worker or the batch CLI"""
+    if sys.argv[1:2] == ["serve"]:
+        from core.server import main
+        return main(sys.argv[2:])
+    if sys.argv[1:2] == ["worker"]:
+        from core.workqueue import main
+        return main(sys.argv[2:])
+    from core.cli import main
+    return main()
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,18 @@
+import os
+import sys
+
+from PIL import Image
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def make_png(tmp_path):
+    """Write a small PNG into tmp_path and return its path"""
+    def make(name="source.png", size=(64, 48), mode="RGB"):
+        path = str(tmp_path / name)
+        Image.new(mode, size, (200, 80, 40)).save(path)
+        return path
+    return make
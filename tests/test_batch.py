@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from core.batch import BatchConverter, BatchJob
+
+
+class CrashingJob(BatchJob):
+    """A job whose worker process dies mid-conversion"""
+
+    def execute(self, recorder=None, quality_target=None, data=None):
+        os._exit(3)
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_crashing_worker_fails_only_its_job(tmp_path, make_png, pipeline):
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    jobs = [BatchJob(make_png(f"ok{i}.png"), "jpg", out) for i in range(5)]
+    jobs.insert(2, CrashingJob(make_png("crash.png"), "jpg", out))
+
+    results = list(BatchConverter(max_workers=2, pipeline=pipeline).run(jobs))
+
+    assert sorted(result.index for result in results) == list(range(6))
+    by_index = {result.index: result for result in results}
+    assert by_index[2].error_category == "crash"
+    for index in (0, 1, 3, 4, 5):
+        assert by_index[index].ok, by_index[index].error
+        assert os.path.exists(by_index[index].save_path)
+
+
+def test_pipeline_reports_read_and_write_failures(tmp_path, make_png):
+    from core.metrics import ConversionMetrics
+
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    # A directory where the output file should go makes the write fail
+    os.makedirs(os.path.join(out, "blocked.jpg"))
+    jobs = [
+        BatchJob(make_png("ok.png"), "jpg", out),
+        BatchJob(str(tmp_path / "missing.png"), "jpg", out),
+        BatchJob(make_png("blocked.png"), "jpg", out),
+    ]
+    metrics = ConversionMetrics()
+
+    results = list(BatchConverter(1, metrics=metrics, pipeline=True).run(jobs))
+
+    by_index = {result.index: result for result in results}
+    assert by_index[0].ok and os.path.exists(by_index[0].save_path)
+    assert not by_index[1].ok and not by_index[2].ok
+    assert by_index[2].save_paths == []
+    written = [record for record in metrics.records if record["ok"]]
+    assert len(written) == 1 and "write" in written[0]["stages"]
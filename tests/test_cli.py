@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from core.cli import main
+
+
+@pytest.mark.parametrize("options", [
+    ["-f", "png,webp", "--target-size", "50"],
+    ["-f", "webp", "--sizes", "320,640", "--min-psnr", "35"],
+    ["-f", "jpg", "--name-template", "{stem}-small.{ext}", "--target-size", "50"],
+])
+def test_quality_goals_rejected_with_fanout(make_png, options):
+    with pytest.raises(SystemExit) as exit_info:
+        main([make_png()] + options)
+    assert exit_info.value.code == 2
+
+
+@pytest.mark.parametrize("options", [
+    ["-f", "png,webp", "--name-template", "{stem}.out"],
+    ["-f", "png", "--sizes", "10,20", "--name-template", "{stem}.{ext}"],
+    ["-f", "png", "--name-template", "{name}.{ext}"],
+    ["-f", "png", "--name-template", "{stem"],
+])
+def test_name_templates_that_repeat_or_fail_are_rejected(make_png, options):
+    with pytest.raises(SystemExit) as exit_info:
+        main([make_png()] + options)
+    assert exit_info.value.code == 2
+
+
+def test_name_template_with_every_field_runs(make_png, tmp_path, capsys):
+    out = str(tmp_path / "out")
+    code = main([make_png("x.png"), "-o", out, "-f", "png,webp", "--sizes", "16,32",
+                 "--name-template", "{stem}-{width}x{height}.{ext}", "-j", "1"])
+    assert code == 0
+    assert sorted(os.listdir(out)) == [
+        "x-16x12.png", "x-16x12.webp", "x-32x24.png", "x-32x24.webp",
+    ]
@@ -0,0 +1,76 @@
+import io
+import os
+import re
+
+from PIL import Image
+
+from core.combine import combine_pdf
+
+
+def pdf_pages(path):
+    """Decode the page images of a PDF written by Pillow, in page order."""
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data.count(b"/Type /Page\n") == len(re.findall(rb"/Subtype /Image", data))
+    pages = []
+    for match in re.finditer(rb"/Length (\d+)\n>>stream\n", data):
+        body = data[match.end():match.end() + int(match.group(1))]
+        if body.startswith(b"\xff\xd8"):
+            with Image.open(io.BytesIO(body)) as img:
+                pages.append(img.convert("RGB"))
+    return pages
+
+
+def pdf_page_colors(path):
+    return [page.getpixel((page.width // 2, page.height // 2)) for page in pdf_pages(path)]
+
+
+def close_to(a, b):
+    return max(abs(x - y) for x, y in zip(a, b)) < 12
+
+
+def test_pages_follow_source_order_and_frames(tmp_path):
+    red, green, blue, white = (220, 20, 20), (20, 200, 20), (20, 20, 220), (255, 255, 255)
+    first = str(tmp_path / "b.png")
+    Image.new("RGB", (40, 30), red).save(first)
+    pages = str(tmp_path / "a.tif")
+    frames = [Image.new("RGB", (30, 40), color) for color in (green, blue)]
+    frames[0].save(pages, save_all=True, append_images=frames[1:])
+    last = str(tmp_path / "c.png")
+    Image.new("RGBA", (20, 20), (0, 0, 0, 0)).save(last)
+    seen = []
+
+    count, failures = combine_pdf(
+        [first, pages, last], str(tmp_path / "out.pdf"),
+        progress=lambda index, path: seen.append((index, os.path.basename(path)))
+    )
+
+    assert count == 4 and failures == []
+    assert seen == [(0, "b.png"), (1, "a.tif"), (2, "a.tif"), (3, "c.png")]
+    colors = pdf_page_colors(str(tmp_path / "out.pdf"))
+    assert len(colors) == 4
+    assert all(close_to(got, want) for got, want in zip(colors, [red, green, blue, white]))
+
+
+def test_unreadable_sources_are_left_out(tmp_path):
+    good = str(tmp_path / "good.png")
+    Image.new("RGB", (10, 10), (0, 0, 255)).save(good)
+    bad = str(tmp_path / "bad.png")
+    with open(bad, "wb") as f:
+        f.write(b"not an image")
+
+    count, failures = combine_pdf([bad, good], str(tmp_path / "out.pdf"))
+
+    assert count == 1
+    assert [path for path, _ in failures] == [bad]
+    assert len(pdf_page_colors(str(tmp_path / "out.pdf"))) == 1
+
+
+def test_page_size_limits_the_longest_side(tmp_path):
+    big = str(tmp_path / "big.png")
+    Image.new("RGB", (400, 200), (0, 0, 0)).save(big)
+
+    combine_pdf([big], str(tmp_path / "out.pdf"), max_size=100)
+
+    pages = pdf_pages(str(tmp_path / "out.pdf"))
+    assert [page.size for page in pages] == [(100, 50)]
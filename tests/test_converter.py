@@ -0,0 +1,53 @@
+import io
+import os
+import threading
+
+from PIL import Image
+import pytest
+
+from core.converter import ImageConverter
+from core.metrics import StageRecorder
+
+
+class Sink(io.RawIOBase):
+    """Write-only, non-seekable stream, like a pipe or socket"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (10, 120, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("recorder", [None, StageRecorder("<memory>", "png")])
+def test_convert_buffer_writes_to_non_seekable_stream(recorder):
+    sink = Sink()
+    out = ImageConverter.convert_buffer(png_bytes(), "jpg", out=sink, recorder=recorder)
+    assert out is sink
+    assert bytes(sink.data[:3]) == b"\xff\xd8\xff"
+
+
+def test_convert_buffer_writes_to_pipe():
+    read_fd, write_fd = os.pipe()
+    received = []
+    reader = threading.Thread(target=lambda: received.append(os.fdopen(read_fd, "rb").read()))
+    reader.start()
+    with os.fdopen(write_fd, "wb") as pipe:
+        ImageConverter.convert_buffer(png_bytes(), "png", out=pipe)
+    reader.join()
+    assert received[0].startswith(b"\x89PNG")
+
+
+def test_convert_bytes_rejects_out():
+    with pytest.raises(TypeError):
+        ImageConverter.convert_bytes(png_bytes(), "png", out=io.BytesIO())
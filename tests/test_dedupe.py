@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from core.batch import BatchConverter, BatchJob, FanoutJob
+from core.dedupe import resolve_collisions
+
+
+def same_name_job(path, out):
+    """A fan-out job whose template gives both formats one name"""
+    return FanoutJob(path, ["png", "webp"], out, name_template="{stem}.img")
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+@pytest.mark.parametrize("policy, expected", [
+    ("suffix", ["x-2.img", "x.img"]),
+    ("skip", ["x.img"]),
+    ("overwrite", ["x.img"]),
+])
+def test_policy_applies_within_one_job(make_png, tmp_path, policy, expected, pipeline):
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    job = same_name_job(make_png("x.png"), out)
+
+    results = list(BatchConverter(1, collisions=policy, pipeline=pipeline).run([job]))
+
+    assert results[0].ok, results[0].error
+    assert sorted(os.listdir(out)) == expected
+    assert len(results[0].save_paths) == len(expected)
+    with open(os.path.join(out, "x.img"), "rb") as f:
+        magic = f.read(4)
+    # skip keeps the first output (PNG), overwrite the last (WEBP)
+    assert magic == (b"RIFF" if policy == "overwrite" else b"\x89PNG")
+
+
+def test_suffixes_within_a_job_avoid_other_jobs_names(make_png, tmp_path):
+    out = str(tmp_path)
+    taken = FanoutJob(make_png("x-2.png"), ["png"], out, name_template="{stem}.img")
+    job = same_name_job(make_png("x.png"), out)
+    resolve_collisions([job, taken], "suffix")
+    assert [os.path.basename(path) for path, _ in job.outputs()] == ["x.img", "x-3.img"]
+
+
+def same_name_sources(tmp_path, make_png):
+    """Three sources in different folders that all become x.jpg"""
+    paths = []
+    for index, folder in enumerate(("a", "b", "c")):
+        os.makedirs(str(tmp_path / folder))
+        paths.append(make_png(f"{folder}/x.png", size=(16 + index, 16)))
+    return paths
+
+
+@pytest.mark.parametrize("policy, converted, kept_width", [
+    ("suffix", [0, 1, 2], 16),
+    ("skip", [0], 16),
+    ("overwrite", [2], 18),
+])
+def test_collision_policies_between_jobs(make_png, tmp_path, policy, converted, kept_width):
+    from PIL import Image
+
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    jobs = [BatchJob(path, "jpg", out) for path in same_name_sources(tmp_path, make_png)]
+
+    results = sorted(BatchConverter(1, collisions=policy).run(jobs), key=lambda r: r.index)
+
+    assert [r.index for r in results if r.ok] == converted
+    assert all(r.error_category == "collision" for r in results if not r.ok)
+    expected = ["x.jpg"] if policy != "suffix" else ["x-2.jpg", "x-3.jpg", "x.jpg"]
+    assert sorted(os.listdir(out)) == expected
+    with Image.open(os.path.join(out, "x.jpg")) as img:
+        assert img.width == kept_width
+
+
+@pytest.mark.parametrize("mode", ["link", "copy"])
+def test_identical_sources_are_converted_once(make_png, tmp_path, mode):
+    import shutil
+
+    first = make_png("one.png")
+    second = str(tmp_path / "two.png")
+    shutil.copyfile(first, second)
+    other = make_png("three.png", size=(20, 10))
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    jobs = [BatchJob(path, "webp", out) for path in (first, second, other)]
+
+    results = sorted(BatchConverter(1, dedupe=mode).run(jobs), key=lambda r: r.index)
+
+    assert all(result.ok for result in results)
+    assert results[1].duplicate_of == first
+    assert results[0].duplicate_of is None and results[2].duplicate_of is None
+    one, two = (os.path.join(out, name) for name in ("one.webp", "two.webp"))
+    with open(one, "rb") as a, open(two, "rb") as b:
+        assert a.read() == b.read()
+    assert os.path.samefile(one, two) == (mode == "link")
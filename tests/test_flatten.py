@@ -0,0 +1,47 @@
+import io
+
+from PIL import Image
+import pytest
+
+from core.converter import ImageConverter
+from core.flatten import DEEP_MODES, flatten
+
+EXIF = Image.Exif()
+EXIF[0x010F] = "Prism Test Camera"
+
+
+def deep_image(mode):
+    """2x1 image holding 40000 and 300 in a 16/32-bit mode"""
+    if mode == "I;16N":
+        # putdata() on I;16N is unreliable; build it from native bytes
+        native = Image.new("I;16", (2, 1))
+        native.putdata([40000, 300])
+        return Image.frombytes("I;16N", (2, 1), native.tobytes())
+    img = Image.new(mode, (2, 1))
+    img.putdata([40000, 300])
+    return img
+
+
+@pytest.mark.parametrize("mode", DEEP_MODES)
+def test_deep_modes_scale_to_8_bit(mode):
+    rgb = flatten(deep_image(mode))
+    assert rgb.mode == "RGB"
+    assert rgb.getpixel((0, 0)) == (156, 156, 156)
+    assert rgb.getpixel((1, 0)) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("mode", ["RGBA", "LA", "P", "I;16"])
+def test_flattened_jpg_keeps_exif(mode):
+    if mode == "I;16":
+        img = deep_image(mode)
+    else:
+        img = Image.new("RGBA", (8, 8), (255, 0, 0, 128)).convert(mode)
+        if mode == "P":
+            img.info["transparency"] = 0
+    source = io.BytesIO()
+    img.save(source, format="PNG", exif=EXIF.tobytes())
+
+    out = ImageConverter.convert_bytes(source.getvalue(), "jpg", preserve_metadata=True)
+
+    with Image.open(io.BytesIO(out)) as result:
+        assert result.getexif().get(0x010F) == "Prism Test Camera"
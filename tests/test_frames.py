@@ -0,0 +1,63 @@
+import io
+
+from PIL import Image
+import pytest
+
+from core.converter import ImageConverter
+
+DURATIONS = [100, 200, 300]
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+
+
+def animated_gif(loop=0):
+    frames = [Image.new("RGB", (16, 16), color) for color in COLORS]
+    buffer = io.BytesIO()
+    options = {"save_all": True, "append_images": frames[1:], "duration": DURATIONS}
+    if loop is not None:
+        options["loop"] = loop
+    frames[0].save(buffer, format="GIF", **options)
+    return buffer.getvalue()
+
+
+def frame_info(data):
+    """(frame count, durations, loop, first pixel of each frame) of encoded bytes"""
+    with Image.open(io.BytesIO(data)) as img:
+        durations, pixels = [], []
+        for index in range(img.n_frames):
+            img.seek(index)
+            # WEBP sets a frame's duration when the frame is loaded
+            img.load()
+            durations.append(img.info.get("duration"))
+            pixels.append(img.convert("RGB").getpixel((8, 8)))
+        return img.n_frames, durations, img.info.get("loop"), pixels
+
+
+@pytest.mark.parametrize("target", ["gif", "webp"])
+def test_animation_keeps_frames_durations_and_loop(target):
+    count, durations, loop, pixels = frame_info(
+        ImageConverter.convert_bytes(animated_gif(loop=0), target)
+    )
+    assert count == 3
+    assert durations == DURATIONS
+    assert loop == 0
+    for pixel, color in zip(pixels, COLORS):
+        assert max(abs(a - b) for a, b in zip(pixel, color)) < 16
+
+
+def test_gif_that_plays_once_keeps_playing_once():
+    _, _, loop, _ = frame_info(ImageConverter.convert_bytes(animated_gif(loop=None), "gif"))
+    assert loop is None
+
+
+def test_multi_page_tiff_keeps_every_page():
+    data = ImageConverter.convert_bytes(animated_gif(), "tiff")
+    count, _, _, pixels = frame_info(data)
+    assert count == 3
+    assert pixels == COLORS
+
+
+def test_single_frame_target_takes_the_first_frame():
+    data = ImageConverter.convert_bytes(animated_gif(), "png")
+    with Image.open(io.BytesIO(data)) as img:
+        assert getattr(img, "n_frames", 1) == 1
+        assert img.convert("RGB").getpixel((0, 0)) == COLORS[0]
@@ -0,0 +1,29 @@
+import os
+
+from core.batch import BatchConverter, FanoutJob
+from core.journal import JobJournal, job_key
+
+
+def fanout(path, out, name_template=None):
+    return FanoutJob(path, ["png", "webp"], out, name_template=name_template)
+
+
+def test_name_template_changes_job_key(make_png, tmp_path):
+    path = make_png("x.png")
+    out = str(tmp_path)
+    assert job_key(fanout(path, out)) != job_key(fanout(path, out, "{stem}-new.{ext}"))
+
+
+def test_journal_does_not_skip_renamed_outputs(make_png, tmp_path):
+    path = make_png("x.png")
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    journal_path = str(tmp_path / "journal.jsonl")
+
+    first = list(BatchConverter(1, journal=JobJournal(journal_path)).run([fanout(path, out)]))
+    assert first[0].ok and not first[0].cached
+
+    job = fanout(path, out, "{stem}-new.{ext}")
+    second = list(BatchConverter(1, journal=JobJournal(journal_path)).run([job]))
+    assert second[0].ok and not second[0].cached
+    assert sorted(os.listdir(out)) == ["x-new.png", "x-new.webp", "x.png", "x.webp"]
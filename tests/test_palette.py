@@ -0,0 +1,53 @@
+import io
+
+from PIL import Image
+import pytest
+
+from core.converter import ImageConverter
+from core.palette import QUANTIZERS, TRANSPARENT_INDEX, Quantizer, available
+
+
+def half_transparent():
+    """Red left half, fully transparent right half, a faint column in between"""
+    img = Image.new("RGBA", (32, 16), (0, 0, 0, 0))
+    img.paste((220, 30, 30, 255), (0, 0, 16, 16))
+    img.paste((30, 30, 220, 100), (16, 0, 17, 16))
+    return img
+
+
+@pytest.mark.parametrize("method", [m for m in QUANTIZERS if available(m)])
+@pytest.mark.parametrize("dither", [False, True])
+def test_quantize_reserves_transparent_index(method, dither):
+    paletted = Quantizer(method, dither).quantize(half_transparent())
+
+    assert paletted.mode == "P"
+    assert paletted.info["transparency"] == TRANSPARENT_INDEX
+    assert paletted.getpixel((24, 8)) == TRANSPARENT_INDEX
+    # Less than half opaque counts as transparent
+    assert paletted.getpixel((16, 8)) == TRANSPARENT_INDEX
+    assert paletted.getpixel((4, 8)) != TRANSPARENT_INDEX
+    red = paletted.convert("RGB").getpixel((4, 8))
+    assert max(abs(a - b) for a, b in zip(red, (220, 30, 30))) < 24
+
+
+def test_shared_palette_keeps_transparency():
+    colors = Image.new("RGB", (16, 1))
+    colors.putdata([(i * 16, 0, 0) for i in range(16)])
+    palette = colors.convert("P", palette=Image.Palette.ADAPTIVE, colors=16).getpalette()[:48]
+
+    paletted = Quantizer(palette=bytes(palette)).quantize(half_transparent())
+
+    assert paletted.getpixel((24, 8)) == TRANSPARENT_INDEX
+    assert paletted.info["transparency"] == TRANSPARENT_INDEX
+
+
+def test_gif_output_is_transparent_where_the_source_is():
+    buffer = io.BytesIO()
+    half_transparent().save(buffer, format="PNG")
+
+    gif = ImageConverter.convert_bytes(buffer.getvalue(), "gif")
+
+    with Image.open(io.BytesIO(gif)) as img:
+        rgba = img.convert("RGBA")
+        assert rgba.getpixel((24, 8))[3] == 0
+        assert rgba.getpixel((4, 8))[3] == 255
@@ -0,0 +1,26 @@
+import threading
+
+from core.probe import ProbeService
+
+
+def test_header_results_do_not_change_reported_stats(make_png):
+    path = make_png("x.png", size=(20, 10))
+    reports = []
+    done = threading.Event()
+
+    def callback(kind, infos):
+        # Snapshot what the receiver saw when the report arrived
+        reports.append((kind, infos, [(info.format, info.width) for info in infos]))
+        if kind == "info":
+            done.set()
+
+    service = ProbeService(callback)
+    service.submit([path])
+    assert done.wait(5)
+    service.stop()
+
+    (_, stat_infos, stat_seen), (_, header_infos, _) = reports
+    assert [(info.format, info.width) for info in stat_infos] == stat_seen == [(None, None)]
+    assert stat_infos[0] is not header_infos[0]
+    assert (header_infos[0].format, header_infos[0].size) == ("PNG", stat_infos[0].size)
+    assert (header_infos[0].width, header_infos[0].height) == (20, 10)
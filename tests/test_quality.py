@@ -0,0 +1,17 @@
+from core.batch import BatchJob
+from core.quality import QualityCache
+
+
+def test_cached_quality_is_per_encode_options(make_png, tmp_path):
+    path = make_png("photo.png")
+    out = str(tmp_path)
+    cache = QualityCache(out)
+    plain = BatchJob(path, "jpg", out, target_size=20000)
+    cache.store(plain, 72)
+
+    assert cache.lookup(BatchJob(path, "jpg", out, target_size=20000)) == 72
+    assert cache.lookup(BatchJob(path, "jpg", out, target_size=20000,
+                                 preserve_metadata=True)) is None
+    assert cache.lookup(BatchJob(path, "jpg", out, target_size=20000,
+                                 background=(0, 0, 0))) is None
+    assert cache.lookup(BatchJob(path, "jpg", out, target_size=10000)) is None
@@ -0,0 +1,92 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+from core import server as server_module
+from core.server import ConversionServer, HttpError
+
+
+async def exchange(server, payload):
+    """Start server on a free port, send payload and return the raw response"""
+    host, port = await server.start("127.0.0.1", 0)
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(payload)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 10)
+        writer.close()
+        return response
+    finally:
+        await server.close()
+
+
+def test_malformed_request_line_gets_400():
+    server = ConversionServer(workers=1)
+    response = asyncio.run(exchange(server, b"garbage\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert server.stats.counts["bad_requests"] == 1
+
+
+def test_server_errors_are_not_bad_requests():
+    server = ConversionServer(workers=1)
+
+    async def route(*args):
+        raise HttpError(503, "a worker process died; retry the request")
+
+    server.route = route
+    response = asyncio.run(exchange(server, b"POST /convert?format=png HTTP/1.1\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 503 ")
+    assert server.stats.counts["server_errors"] == 1
+    assert server.stats.counts["bad_requests"] == 0
+
+
+def test_negative_content_length_gets_400():
+    server = ConversionServer(workers=1)
+    request = b"POST /convert?format=png HTTP/1.1\r\nContent-Length: -5\r\n\r\n"
+    response = asyncio.run(exchange(server, request))
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+def test_negative_chunk_size_gets_400():
+    server = ConversionServer(workers=1)
+    request = (b"POST /convert?format=png HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+               b"-5\r\nhello\r\n0\r\n\r\n")
+    response = asyncio.run(exchange(server, request))
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+class BrokenExecutor(Executor):
+    """Fails every call the way a pool with a dead worker does"""
+
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def shutdown(self, wait=True, **kwargs):
+        self.closed = True
+
+
+def test_broken_pool_is_replaced_once(monkeypatch):
+    replacements = []
+
+    def fresh_pool(max_workers):
+        replacements.append(max_workers)
+        return BrokenExecutor()
+
+    monkeypatch.setattr(server_module, "ProcessPoolExecutor", fresh_pool)
+    server = ConversionServer(workers=2)
+    broken = server.pool = BrokenExecutor()
+
+    async def convert_concurrently():
+        return await asyncio.gather(
+            *(server.convert(b"", "png", {}) for _ in range(5)), return_exceptions=True
+        )
+
+    errors = asyncio.run(convert_concurrently())
+    assert all(isinstance(e, HttpError) and e.status == 503 for e in errors)
+    assert replacements == [2]
+    assert broken.closed and server.pool is not broken
@@ -0,0 +1,89 @@
+import os
+import time
+
+from core.batch import BatchControl, BatchJob
+from core.workqueue import JobDirectory, _Heartbeat, work
+
+
+def make_jobdir(tmp_path, make_png, sources=3, chunk_size=1, lease_seconds=60):
+    out = str(tmp_path / "out")
+    os.makedirs(out)
+    jobs = [BatchJob(make_png(f"s{index}.png"), "webp", out) for index in range(sources)]
+    return JobDirectory.create(str(tmp_path / "batch"), jobs, chunk_size, lease_seconds)
+
+
+def expire(jobdir, lease):
+    past = jobdir.now() - jobdir.lease_seconds - 10
+    os.utime(lease.path, (past, past))
+
+
+def test_claims_hand_out_each_chunk_once(tmp_path, make_png):
+    jobdir = make_jobdir(tmp_path, make_png)
+
+    leases = [jobdir.claim("w1"), jobdir.claim("w2"), jobdir.claim("w1")]
+
+    assert [lease.chunk for lease in leases] == [0, 1, 2]
+    assert jobdir.claim("w3") is None
+    assert all(lease.held() for lease in leases)
+    assert jobdir.status()["leased"] == 3
+
+
+def test_renewed_lease_is_not_reclaimed(tmp_path, make_png):
+    jobdir = make_jobdir(tmp_path, make_png, sources=1)
+    lease = jobdir.claim("w1")
+    expire(jobdir, lease)
+    assert jobdir.status()["expired"] == 1
+
+    assert lease.renew()
+
+    assert jobdir.claim("w2") is None
+    assert jobdir.status()["leased"] == 1
+
+
+def test_expired_lease_is_reclaimed_once(tmp_path, make_png):
+    jobdir = make_jobdir(tmp_path, make_png, sources=1)
+    stale = jobdir.claim("w1")
+    expire(jobdir, stale)
+
+    taken = jobdir.claim("w2")
+
+    assert taken is not None and taken.chunk == stale.chunk
+    assert jobdir.claim("w3") is None
+    assert taken.held() and not stale.held()
+    assert not stale.renew()
+    # The stale owner giving up must not drop the new owner's lease
+    stale.release()
+    assert taken.held()
+
+
+def test_heartbeat_cancels_chunk_when_lease_is_lost(tmp_path, make_png):
+    jobdir = make_jobdir(tmp_path, make_png, sources=1)
+    lease = jobdir.claim("w1")
+    expire(jobdir, lease)
+    assert jobdir.claim("w2") is not None
+    control = BatchControl()
+    heartbeat = _Heartbeat(lease, control, 0.01)
+    heartbeat.start()
+
+    deadline = time.monotonic() + 5
+    while not control.cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    heartbeat.stop()
+
+    assert heartbeat.lost and control.cancelled
+
+
+def test_complete_records_results_and_frees_the_chunk(tmp_path, make_png):
+    jobdir = make_jobdir(tmp_path, make_png, sources=2, chunk_size=2)
+    events = []
+
+    failed = work(jobdir, {"max_workers": 1}, "w1",
+                  lambda event, **fields: events.append(event))
+
+    assert failed == 0 and jobdir.finished()
+    assert events[0] == "claim" and events[-1] == "chunk"
+    assert not os.path.exists(jobdir.lease_path(0))
+    status = jobdir.status()
+    assert (status["done"], status["converted"], status["failed"]) == (1, 2, 0)
+    assert sorted(os.listdir(str(tmp_path / "out"))) == ["s0.webp", "s1.webp"]
+    assert jobdir.claim("w2") is None
@@ -6,8 +6,22 @@ import customtkinter as ctk
 from tkinter import filedialog
 
 from .colors import COLORS
-from .file_row import FileRow
-from core.converter import ImageConverter
+from .file_list import FileListModel, VirtualFileList
+from .progress import ProgressChannel, ThroughputMeter
+from .thumbnails import ThumbnailLoader
+
+# How often the main loop applies queued progress (about 30 frames/s)
+PROGRESS_INTERVAL_MS = 33
+
+# Paths a folder scan hands to the main loop at a time
+SCAN_CHUNK = 500
+
+# Conversion order choices -> core.schedule policies
+ORDER_CHOICES = {
+    "Largest First": "largest",
+    "Smallest First": "smallest",
+    "As Added": "fifo",
+}
 
 
 class PrismApp(ctk.CTk):
@@ -24,13 +38,30 @@ class PrismApp(ctk.CTk):
         self.grid_columnconfigure(0, weight=1)
 
         # Data storage
-        self.files = []
-        self.file_rows = []
-        self.selected_rows = []
-        self.last_selected_index = None
-        self.file_formats = {}
+        self.model = FileListModel()
+        self.progress = ProgressChannel()
+        self.meter = None
+        self.control = None
+        self.thumbnails = ThumbnailLoader()
+        self.probe = None
+        self.probe_events = ProgressChannel()
+        self._probe_poll = None
 
         self.setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        """Stop background work and close the window
+
+        A running batch is cancelled; its journal keeps what finished so
+        the next Convert All resumes from there.
+        """
+        if self.control is not None:
+            self.control.cancel()
+        self.thumbnails.shutdown()
+        if self.probe is not None:
+            self.probe.stop()
+        self.destroy()
 
     def setup_ui(self):
         """Setup user interface"""
@@ -81,7 +112,20 @@ class PrismApp(ctk.CTk):
             height=32, corner_radius=6,
             command=self.add_files
         )
-        self.btn_add.pack(side="left", padx=20, pady=12)
+        self.btn_add.pack(side="left", padx=(20, 8), pady=12)
+
+        # Add Folder Button
+        self.btn_add_folder = ctk.CTkButton(
+            self.toolbar, text="+  Add Folder",
+            fg_color="transparent",
+            text_color=COLORS["text_main"],
+            hover_color=COLORS["hover"],
+            border_width=1, border_color=COLORS["border"],
+            font=("Segoe UI", 12, "bold"),
+            height=32, corner_radius=6,
+            command=self.add_folder
+        )
+        self.btn_add_folder.pack(side="left", padx=(0, 12), pady=12)
 
         # File Count
         self.lbl_count = ctk.CTkLabel(
@@ -103,6 +147,19 @@ class PrismApp(ctk.CTk):
         )
         self.btn_clear.pack(side="right", padx=20)
 
+        # Pin Button
+        self.btn_pin = ctk.CTkButton(
+            self.toolbar, text="📌 Pin First",
+            fg_color="transparent", 
+            text_color=COLORS["text_dark"], 
+            hover_color=COLORS["hover"],
+            font=("Segoe UI", 11), 
+            width=80, height=32,
+            command=self.toggle_pinned
+        )
+        self.btn_pin.pack(side="right")
+        self.bind("<Control-p>", lambda e: self.toggle_pinned())
+
         # Separator
         ctk.CTkFrame(
             self, height=1, 
@@ -125,12 +182,13 @@ class PrismApp(ctk.CTk):
             text_color=COLORS["text_dark"]
         ).pack(side="left", padx=50, pady=5)
         
-        # Scrollable Area
-        self.scroll_frame = ctk.CTkScrollableFrame(
-            self, fg_color="transparent", 
-            corner_radius=0
+        # Virtualized Scrollable Area
+        self.file_list = VirtualFileList(
+            self, self.model,
+            select_callback=self.on_file_selected,
+            thumbnails=self.thumbnails
         )
-        self.scroll_frame.grid(row=2, column=0, sticky="nsew", pady=(30, 0))
+        self.file_list.grid(row=2, column=0, sticky="nsew", pady=(30, 0))
 
     def _create_footer(self):
         """Create footer with settings and actions"""
@@ -172,6 +230,26 @@ class PrismApp(ctk.CTk):
         self.combo_fmt.pack(pady=5)
         self.combo_fmt.set("PNG")
 
+        ctk.CTkLabel(
+            f_frame, text="ORDER", 
+            font=("Segoe UI", 9, "bold"), 
+            text_color=COLORS["text_dark"]
+        ).pack(anchor="w")
+        
+        self.combo_order = ctk.CTkComboBox(
+            f_frame, 
+            values=list(ORDER_CHOICES),
+            fg_color=COLORS["bg_body"], 
+            border_color=COLORS["border"],
+            button_color=COLORS["border"], 
+            text_color=COLORS["text_main"],
+            font=("Segoe UI", 11),
+            width=150, height=32,
+            state="readonly"
+        )
+        self.combo_order.pack(pady=5)
+        self.combo_order.set("Largest First")
+
     def _create_destination_selector(self):
         """Create destination path selector"""
         p_frame = ctk.CTkFrame(self.footer, fg_color="transparent")
@@ -228,6 +306,25 @@ class PrismApp(ctk.CTk):
             fg_color=COLORS["border"]
         )
         self.sw_qual.pack(pady=2)
+        
+        self.sw_incr = ctk.CTkSwitch(
+            t_frame, text="Skip Unchanged",
+            font=("Segoe UI", 11), 
+            text_color=COLORS["text_dim"],
+            progress_color=COLORS["text_dark"], 
+            fg_color=COLORS["border"]
+        )
+        self.sw_incr.pack(pady=2)
+        
+        # Off by default: hashing same-size files delays the first result
+        self.sw_dedupe = ctk.CTkSwitch(
+            t_frame, text="Merge Duplicates",
+            font=("Segoe UI", 11), 
+            text_color=COLORS["text_dim"],
+            progress_color=COLORS["text_dark"], 
+            fg_color=COLORS["border"]
+        )
+        self.sw_dedupe.pack(pady=2)
 
     def _create_action_bar(self):
         """Create action bar with progress and convert button"""
@@ -262,6 +359,43 @@ class PrismApp(ctk.CTk):
         )
         self.btn_convert.pack(side="right")
 
+        # Cancel and Pause (only active while converting)
+        self.btn_cancel = ctk.CTkButton(
+            action_area, text="Cancel",
+            fg_color="transparent",
+            text_color=COLORS["text_dim"],
+            hover_color=COLORS["hover"],
+            border_width=1, border_color=COLORS["border"],
+            font=("Segoe UI", 11),
+            height=36, width=80,
+            corner_radius=8,
+            state="disabled",
+            command=self.cancel_conversion
+        )
+        self.btn_cancel.pack(side="right", padx=(0, 8))
+
+        self.btn_pause = ctk.CTkButton(
+            action_area, text="Pause",
+            fg_color="transparent",
+            text_color=COLORS["text_dim"],
+            hover_color=COLORS["hover"],
+            border_width=1, border_color=COLORS["border"],
+            font=("Segoe UI", 11),
+            height=36, width=80,
+            corner_radius=8,
+            state="disabled",
+            command=self.toggle_pause
+        )
+        self.btn_pause.pack(side="right", padx=(0, 8))
+
+        # Throughput and ETA
+        self.lbl_stats = ctk.CTkLabel(
+            action_area, text="",
+            font=("Segoe UI", 10),
+            text_color=COLORS["text_dark"]
+        )
+        self.lbl_stats.pack(side="right", padx=(0, 20))
+
     # --- File Management ---
 
     def add_files(self):
@@ -275,41 +409,118 @@ class PrismApp(ctk.CTk):
         default_format = self.combo_fmt.get()
         
         # Set destination to the folder of the first file
-        if not self.files:
+        if not self.model.entries:
             first_file_dir = os.path.dirname(paths[0])
             self.lbl_dest.configure(text=first_file_dir)
         
-        for path in paths:
-            if path not in self.files:
-                self.files.append(path)
-                self.file_formats[path] = default_format
+        added = self.model.add(paths, default_format)
+        self.file_list.refresh()
+        self._probe_new_entries(added)
                 
-                row = FileRow(
-                    self.scroll_frame, path, 
-                    len(self.file_rows), 
-                    select_callback=self.on_file_selected
-                )
-                row.update_target(default_format)
-                self.file_rows.append(row)
-                
-        self.lbl_count.configure(text=f"{len(self.files)} files loaded")
+        self.lbl_count.configure(text=f"{len(self.model)} files loaded")
+
+    def add_folder(self):
+        """Add every image in a folder and its subfolders"""
+        folder = filedialog.askdirectory(title="Select Folder")
+        if not folder:
+            return
+        
+        # Scanning a large tree can take a while; keep the window responsive
+        channel = ProgressChannel()
+        default_format = self.combo_fmt.get()
+        self.btn_add_folder.configure(state="disabled")
+        self.lbl_count.configure(text=f"{len(self.model)} files loaded, scanning...")
+        
+        threading.Thread(
+            target=self.scan_process, args=(folder, channel), daemon=True
+        ).start()
+        self.after(PROGRESS_INTERVAL_MS, self._drain_scan, channel, folder, default_format)
+
+    def scan_process(self, folder, channel):
+        """Walk a folder, queueing image paths in chunks (runs on the scan thread)"""
+        from core.ingest import scan_folder
+        
+        try:
+            chunk = []
+            for entry in scan_folder(folder):
+                chunk.append(entry.path)
+                if len(chunk) >= SCAN_CHUNK:
+                    channel.put("files", chunk)
+                    chunk = []
+            if chunk:
+                channel.put("files", chunk)
+        finally:
+            channel.put("finished")
+
+    def _drain_scan(self, channel, folder, default_format):
+        """Add scanned paths to the list (runs on the main loop)"""
+        finished = False
+        added = 0
+        
+        for event in channel.drain():
+            if event[0] == "files":
+                if not self.model.entries:
+                    self.lbl_dest.configure(text=folder)
+                added += self.model.add(event[1], default_format)
+            elif event[0] == "finished":
+                finished = True
+        
+        if added:
+            self.file_list.refresh()
+            self._probe_new_entries(added)
+        
+        if finished:
+            self.btn_add_folder.configure(state="normal")
+            self.lbl_count.configure(text=f"{len(self.model)} files loaded")
+        else:
+            self.lbl_count.configure(text=f"{len(self.model)} files loaded, scanning...")
+            self.after(PROGRESS_INTERVAL_MS, self._drain_scan, channel, folder, default_format)
+
+    def _probe_new_entries(self, count):
+        """Read size, real format and dimensions of the last count entries off the UI thread"""
+        if count <= 0:
+            return
+        if self.probe is None:
+            # Imported here so the window opens before the conversion stack loads
+            from core.probe import ProbeService
+            self.probe = ProbeService(self.probe_events.put)
+        self.probe.submit(entry.path for entry in self.model.entries[-count:])
+        if self._probe_poll is None:
+            self._probe_poll = self.after(PROGRESS_INTERVAL_MS, self._drain_probe)
+
+    def _drain_probe(self):
+        """Apply probe results to the list (runs on the main loop)"""
+        self._probe_poll = None
+        # Checked before draining so results queued just before the probe
+        # went idle are still picked up
+        busy = self.probe.busy
+        
+        updated = False
+        for _, infos in self.probe_events.drain():
+            if self.model.apply_info(infos):
+                updated = True
+        if updated:
+            self.file_list.refresh()
+        
+        if busy:
+            self._probe_poll = self.after(PROGRESS_INTERVAL_MS, self._drain_probe)
 
     def clear_files(self):
         """Clear all files from list"""
-        for widget in self.scroll_frame.winfo_children():
-            widget.destroy()
-        
-        self.files = []
-        self.file_rows = []
-        self.selected_rows = []
-        self.last_selected_index = None
-        self.file_formats = {}
+        # Results of a running batch are matched to rows by index
+        if self.meter is not None:
+            return
+        self.model.clear()
+        self.thumbnails.clear()
+        self.file_list.scroll_to(0)
+        self.file_list.refresh()
         
         if hasattr(self, 'lbl_dest'):
             self.lbl_dest.configure(text="Select files to set destination...")
         
         self.lbl_count.configure(text="0 files loaded")
         self.progress_bar.set(0)
+        self.lbl_stats.configure(text="")
 
     def browse_folder(self):
         """Browse for destination folder"""
@@ -319,109 +530,200 @@ class PrismApp(ctk.CTk):
 
     # --- Selection Management ---
 
-    def on_file_selected(self, row, event=None):
+    def on_file_selected(self, index, event=None):
         """Handle file row selection"""
-        shift_pressed = event and (event.state & 0x0001)
-        
-        if shift_pressed and self.last_selected_index is not None:
-            # Range selection
-            current_index = self.file_rows.index(row)
-            start = min(self.last_selected_index, current_index)
-            end = max(self.last_selected_index, current_index)
-            
-            for r in self.selected_rows:
-                r.set_selected(False)
-            self.selected_rows = []
-            
-            for i in range(start, end + 1):
-                self.file_rows[i].set_selected(True)
-                self.selected_rows.append(self.file_rows[i])
-        else:
-            # Single selection
-            for r in self.selected_rows:
-                r.set_selected(False)
-            self.selected_rows = [row]
-            row.set_selected(True)
-            self.last_selected_index = self.file_rows.index(row)
+        shift_pressed = bool(event and (event.state & 0x0001))
+        self.model.select(index, extend=shift_pressed)
+        self.file_list.refresh()
         
         # Update format combo
-        if len(self.selected_rows) == 1:
-            file_format = self.file_formats.get(self.selected_rows[0].filepath, "PNG")
-            self.combo_fmt.set(file_format)
-        elif len(self.selected_rows) > 1:
-            formats = [self.file_formats.get(r.filepath, "PNG") for r in self.selected_rows]
-            if len(set(formats)) == 1:
-                self.combo_fmt.set(formats[0])
-            else:
-                self.combo_fmt.set("Mixed")
+        formats = self.model.selected_formats()
+        if len(formats) == 1:
+            self.combo_fmt.set(next(iter(formats)))
+        elif len(formats) > 1:
+            self.combo_fmt.set("Mixed")
 
     def deselect_all(self):
         """Deselect all files"""
-        for row in self.selected_rows:
-            row.set_selected(False)
-        self.selected_rows = []
-        self.last_selected_index = None
+        self.model.deselect_all()
+        self.file_list.refresh()
+
+    def toggle_pinned(self):
+        """Pin the selected files so they convert before the rest"""
+        if not self.model.selected:
+            return
+        self.model.toggle_pinned(self.model.selected)
+        self.file_list.refresh()
 
     def on_format_changed(self, choice):
         """Handle format change"""
-        if self.selected_rows:
+        if self.model.selected:
             # Change format for selected files
-            for row in self.selected_rows:
-                self.file_formats[row.filepath] = choice
-                row.update_target(choice)
+            self.model.set_target(choice, self.model.selected)
             self.deselect_all()
         else:
             # Change format for all files
-            for filepath in self.files:
-                self.file_formats[filepath] = choice
-            for row in self.file_rows:
-                row.update_target(choice)
+            self.model.set_target(choice)
+            self.file_list.refresh()
 
     # --- Conversion ---
 
     def start_conversion_thread(self):
         """Start batch conversion in background thread"""
-        if not self.files:
+        if not self.model.entries or self.meter is not None:
             return
         
-        self.btn_convert.configure(state="disabled")
-        threading.Thread(target=self.convert_process, daemon=True).start()
-
-    def convert_process(self):
-        """Convert all files"""
+        # Imported here so the window can open before the conversion stack loads
+        from core.batch import BatchControl, BatchJob
+        
         output_dir = self.lbl_dest.cget("text")
         
         if output_dir == "Select files to set destination...":
             print("Please select a destination folder first")
-            self.btn_convert.configure(state="normal")
             return
         
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
-        total = len(self.files)
+        # Read every setting here: the worker thread must not touch widgets
+        entries = list(self.model.entries)
+        jobs = [
+            BatchJob(
+                entry.path, entry.target_format, output_dir,
+                preserve_metadata=self.sw_meta.get(),
+                max_compression=self.sw_qual.get(),
+                info=entry.info,
+                priority=1 if entry.pinned else 0
+            )
+            for entry in entries
+        ]
+        incremental = bool(self.sw_incr.get())
+        # Copies (not hard links) keep the outputs independent if one is
+        # edited later
+        dedupe = "copy" if self.sw_dedupe.get() else None
+        order = ORDER_CHOICES.get(self.combo_order.get(), "fifo")
         
-        for i, filepath in enumerate(self.files):
-            try:
-                row = self.file_rows[i]
-                row.set_status("Processing")
-                
-                target_format = self.file_formats.get(filepath, "png").lower()
-                
-                ImageConverter.convert_image(
-                    filepath, target_format, output_dir,
-                    preserve_metadata=self.sw_meta.get(),
-                    max_compression=self.sw_qual.get()
-                )
-                
-                row.set_status("Done")
-            except Exception as e:
-                print(str(e))
-                if i < len(self.file_rows):
-                    self.file_rows[i].set_status("Error")
-            
-            prog = (i + 1) / total
-            self.progress_bar.set(prog)
-        
-        self.btn_convert.configure(state="normal")
-        print("Batch complete.")
+        for entry in entries:
+            entry.status = "Processing"
+        self.file_list.refresh()
+        
+        self.meter = ThroughputMeter(len(jobs))
+        self.control = BatchControl()
+        self.progress_bar.set(0)
+        self.lbl_stats.configure(text=self.meter.summary())
+        self.btn_convert.configure(state="disabled")
+        self.btn_clear.configure(state="disabled")
+        self.btn_pause.configure(state="normal", text="Pause")
+        self.btn_cancel.configure(state="normal")
+        
+        threading.Thread(
+            target=self.convert_process,
+            args=(jobs, output_dir, self.control, incremental, order, dedupe),
+            daemon=True
+        ).start()
+        self.after(PROGRESS_INTERVAL_MS, self._drain_progress)
+
+    def toggle_pause(self):
+        """Pause or resume the running batch (jobs already started finish)"""
+        if self.control is None:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.btn_pause.configure(text="Pause")
+            self.lbl_stats.configure(text=self.meter.summary())
+        else:
+            self.control.pause()
+            self.btn_pause.configure(text="Resume")
+            self.lbl_stats.configure(text="Paused")
+
+    def cancel_conversion(self):
+        """Stop the running batch once the jobs already started finish"""
+        if self.control is None:
+            return
+        self.control.cancel()
+        self.btn_pause.configure(state="disabled")
+        self.btn_cancel.configure(state="disabled")
+        self.lbl_stats.configure(text="Cancelling...")
+
+    def convert_process(self, jobs, output_dir, control, incremental=False, order="fifo",
+                        dedupe=None):
+        """Convert all files (runs on the worker thread)
+
+        Files start in the chosen order (pinned ones first), while results
+        are matched back to their rows by index, so the list keeps its own
+        order. Progress is journaled in the destination folder. A batch
+        that is cancelled, interrupted or stopped by an error leaves the
+        journal behind, and the next run of the same files skips everything
+        it lists as done.
+        """
+        from core.batch import BatchConverter
+        from core.journal import JOURNAL_NAME, JobJournal
+        
+        journal = JobJournal(os.path.join(output_dir, JOURNAL_NAME))
+        failure = None
+        try:
+            converter = BatchConverter(incremental=incremental, journal=journal,
+                                       dedupe=dedupe, schedule=order)
+            for result in converter.run(jobs, control):
+                if not result.ok:
+                    print(result.error)
+                info = result.job.info
+                if info is not None and info.size is not None:
+                    nbytes = info.size
+                else:
+                    try:
+                        nbytes = os.path.getsize(result.job.filepath)
+                    except OSError:
+                        nbytes = 0
+                self.progress.put("result", result.index, result.status, nbytes)
+            if not control.cancelled:
+                journal.discard()
+        except Exception as e:
+            failure = f"{type(e).__name__}: {e}"
+        finally:
+            self.progress.put("finished", failure)
+
+    def _drain_progress(self):
+        """Apply queued progress events in one repaint (runs on the main loop)"""
+        finished = False
+        changed = False
+        failure = None
+        
+        for event in self.progress.drain():
+            if event[0] == "result":
+                _, index, status, nbytes = event
+                if index < len(self.model.entries):
+                    self.model.entries[index].status = status
+                self.meter.update(nbytes=nbytes)
+                changed = True
+            elif event[0] == "finished":
+                finished = True
+                failure = event[1]
+        
+        if changed:
+            self.file_list.refresh()
+            self.progress_bar.set(self.meter.fraction)
+            if not self.control.paused:
+                self.lbl_stats.configure(text=self.meter.summary())
+        
+        if finished:
+            cancelled = self.control.cancelled
+            if cancelled or failure is not None:
+                # Files the batch never reached go back to waiting
+                for entry in self.model.entries:
+                    if entry.status == "Processing":
+                        entry.status = "Pending"
+                self.file_list.refresh()
+                self.lbl_stats.configure(text="Batch failed" if failure else "Cancelled")
+            self.meter = None
+            self.control = None
+            self.btn_convert.configure(state="normal")
+            self.btn_clear.configure(state="normal")
+            self.btn_pause.configure(state="disabled", text="Pause")
+            self.btn_cancel.configure(state="disabled")
+            if failure is not None:
+                print(f"Batch failed: {failure}")
+            else:
+                print("Batch cancelled." if cancelled else "Batch complete.")
+        else:
+            self.after(PROGRESS_INTERVAL_MS, self._drain_progress)
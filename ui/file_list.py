@@ -0,0 +1,307 @@
+"""Virtualized file list backed by a compact model"""
+
+import os
+import sys
+import customtkinter as ctk
+
+from .file_row import FileRow, ROW_HEIGHT
+
+# How often finished thumbnails are picked up while some are rendering
+THUMBNAIL_POLL_MS = 50
+
+# Badge text for Pillow format names that differ from the usual extension
+FORMAT_LABELS = {"JPEG": "JPG", "HEIF": "HEIC"}
+
+
+class FileEntry:
+    """Model record for one file in the list"""
+
+    __slots__ = ("path", "name", "dirname", "source_format",
+                 "target_format", "size", "status", "info", "pinned")
+
+    def __init__(self, path, target_format):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.dirname = os.path.dirname(path)
+        # Guessed from the extension until the probe reads the header
+        self.source_format = self.name.split('.')[-1].upper()
+        self.target_format = target_format
+        self.size = None
+        self.status = "Pending"
+        self.info = None
+        # Pinned files are converted before all others
+        self.pinned = False
+
+    @property
+    def short_dir(self):
+        """Directory shortened for display"""
+        if len(self.dirname) > 25:
+            return "..." + self.dirname[-25:]
+        return self.dirname
+
+    def detail_text(self):
+        """Directory plus dimensions and frame count once probed"""
+        info = self.info
+        text = self.short_dir
+        if info is not None and info.has_header:
+            text += f"  ·  {info.width}×{info.height}"
+            if info.frames and info.frames > 1:
+                text += f"  ·  {info.frames} frames"
+        if self.pinned:
+            text = "📌 " + text
+        return text
+
+    def size_text(self):
+        """Human-readable size, or a placeholder until the probe stats it"""
+        if self.size is None:
+            return "…"
+        if self.size < 0:
+            return "—"
+        return f"{self.size / (1024 * 1024):.1f} MB"
+
+    def apply_info(self, info):
+        """Take the size and real format from a probe result"""
+        self.size = -1 if info.size is None else info.size
+        if info.has_header:
+            self.info = info
+            self.source_format = FORMAT_LABELS.get(info.format, info.format)
+
+
+class FileListModel:
+    """Ordered, deduplicated list of FileEntry with selection state"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Remove all entries"""
+        self.entries = []
+        self.index_by_path = {}
+        self.selected = set()
+        self.anchor = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, paths, target_format):
+        """
+        Append paths that are not already present
+
+        Returns:
+            int: Number of entries added
+        """
+        added = 0
+        for path in paths:
+            # Dialogs and folder scans may spell the same path differently
+            path = os.path.normpath(path)
+            if path in self.index_by_path:
+                continue
+            self.index_by_path[path] = len(self.entries)
+            self.entries.append(FileEntry(path, target_format))
+            added += 1
+        return added
+
+    def apply_info(self, infos):
+        """
+        Store probe results on their entries
+
+        Returns:
+            list: Indices of the entries that were updated
+        """
+        updated = []
+        for info in infos:
+            index = self.index_by_path.get(info.path)
+            if index is not None:
+                self.entries[index].apply_info(info)
+                updated.append(index)
+        return updated
+
+    def select(self, index, extend=False):
+        """Select one entry, or the range from the anchor when extending"""
+        if extend and self.anchor is not None:
+            start = min(self.anchor, index)
+            end = max(self.anchor, index)
+            self.selected = set(range(start, end + 1))
+        else:
+            self.selected = {index}
+            self.anchor = index
+
+    def deselect_all(self):
+        """Clear the selection"""
+        self.selected = set()
+        self.anchor = None
+
+    def selected_formats(self):
+        """Set of target formats among the selected entries"""
+        return {self.entries[i].target_format for i in self.selected}
+
+    def toggle_pinned(self, indices):
+        """Pin the given entries, or unpin them if all are pinned already"""
+        pinned = not all(self.entries[i].pinned for i in indices)
+        for i in indices:
+            self.entries[i].pinned = pinned
+
+    def set_target(self, target_format, indices=None):
+        """Set the target format for the given entries (or all of them)"""
+        if indices is None:
+            for entry in self.entries:
+                entry.target_format = target_format
+        else:
+            for i in indices:
+                self.entries[i].target_format = target_format
+
+
+class VirtualFileList(ctk.CTkFrame):
+    """Scrollable list that only keeps the visible rows as widgets
+
+    A fixed pool of FileRow widgets is laid out with place() and re-bound
+    to model entries as the view scrolls, so memory and redraw cost depend
+    on the window height rather than on the number of files. With a
+    ThumbnailLoader, previews are requested for the rows in view and
+    filled in as they become ready.
+    """
+
+    def __init__(self, master, model, select_callback=None, thumbnails=None, **kwargs):
+        super().__init__(master, fg_color="transparent", corner_radius=0, **kwargs)
+        self.model = model
+        self.select_callback = select_callback
+        self.thumbnails = thumbnails
+        self.top = 0
+        self.rows = []
+        self._thumbnail_poll = None
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.viewport.bind("<Configure>", lambda e: self.refresh())
+        if sys.platform.startswith("linux"):
+            self.bind_all("<Button-4>", self._on_mouse_wheel, add=True)
+            self.bind_all("<Button-5>", self._on_mouse_wheel, add=True)
+        else:
+            self.bind_all("<MouseWheel>", self._on_mouse_wheel, add=True)
+
+    # --- Layout ---
+
+    def _row_pixels(self):
+        """Row height in screen pixels after widget scaling"""
+        return max(int(ROW_HEIGHT * ctk.ScalingTracker.get_widget_scaling(self)), 1)
+
+    def _visible_count(self):
+        """Number of rows that fit in the viewport (including a partial one)"""
+        height = max(self.viewport.winfo_height(), 1)
+        return height // self._row_pixels() + 1
+
+    def _max_top(self):
+        full_rows = max(self.viewport.winfo_height() // self._row_pixels(), 1)
+        return max(len(self.model) - full_rows, 0)
+
+    def _ensure_pool(self, count):
+        """Grow the row pool to at least count widgets"""
+        while len(self.rows) < count:
+            row = FileRow(self.viewport, select_callback=self._on_row_clicked)
+            self.rows.append(row)
+
+    def refresh(self):
+        """Re-bind pool rows to the entries currently in view"""
+        self.top = max(0, min(self.top, self._max_top()))
+        count = self._visible_count()
+        self._ensure_pool(count)
+
+        entries = self.model.entries
+        selected = self.model.selected
+        visible = []
+        for slot, row in enumerate(self.rows):
+            index = self.top + slot
+            if slot < count and index < len(entries):
+                entry = entries[index]
+                visible.append(entry.path)
+                row.bind_entry(entry, index, index in selected, self._thumbnail(entry))
+                row.place(x=0, y=slot * ROW_HEIGHT, relwidth=1)
+            else:
+                row.entry = None
+                row.index = None
+                row.place_forget()
+
+        self._update_scrollbar()
+        if self.thumbnails is not None and self.thumbnails.request(visible):
+            self._schedule_thumbnails()
+
+    def refresh_index(self, index):
+        """Redraw a single entry if it is currently visible"""
+        slot = index - self.top
+        if 0 <= slot < len(self.rows):
+            row = self.rows[slot]
+            if row.index == index:
+                entry = self.model.entries[index]
+                row.bind_entry(entry, index, index in self.model.selected, self._thumbnail(entry))
+
+    # --- Thumbnails ---
+
+    def _thumbnail(self, entry):
+        if self.thumbnails is None:
+            return None
+        return self.thumbnails.get(entry.path)
+
+    def _schedule_thumbnails(self):
+        if self._thumbnail_poll is None:
+            self._thumbnail_poll = self.after(THUMBNAIL_POLL_MS, self._poll_thumbnails)
+
+    def _poll_thumbnails(self):
+        """Show thumbnails finished since the last poll"""
+        self._thumbnail_poll = None
+        for path in self.thumbnails.drain():
+            index = self.model.index_by_path.get(path)
+            if index is not None:
+                self.refresh_index(index)
+        if self.thumbnails.busy:
+            self._schedule_thumbnails()
+
+    def _update_scrollbar(self):
+        total = len(self.model)
+        if total == 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        visible = self.viewport.winfo_height() / self._row_pixels()
+        start = self.top / total
+        self.scrollbar.set(start, min(1.0, start + visible / total))
+
+    # --- Scrolling ---
+
+    def scroll_to(self, top):
+        """Scroll so that entry top is the first visible row"""
+        top = max(0, min(int(top), self._max_top()))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.model))
+        elif action == "scroll":
+            step = int(value)
+            if unit == "pages":
+                step *= max(self._visible_count() - 1, 1)
+            self.scroll_to(self.top + step)
+
+    def _on_mouse_wheel(self, event):
+        if not str(event.widget).startswith(str(self.viewport)):
+            return
+        if sys.platform.startswith("win"):
+            step = -int(event.delta / 120) * 3
+        elif sys.platform == "darwin":
+            step = -event.delta
+        else:
+            step = -3 if event.num == 4 else 3
+        self.scroll_to(self.top + step)
+
+    # --- Selection ---
+
+    def _on_row_clicked(self, row, event=None):
+        if row.index is not None and self.select_callback:
+            self.select_callback(row.index, event)
@@ -1,60 +1,74 @@
 """FileRow widget for displaying individual file information"""
 
-import os
 import customtkinter as ctk
 from .colors import COLORS
 
+# Fixed pixel height of one row, used by the virtual list for layout
+ROW_HEIGHT = 52
+
+_placeholder = None
+
+
+def _placeholder_image():
+    """Transparent 1px image; CTkLabel ignores image=None, so it stands in"""
+    global _placeholder
+    if _placeholder is None:
+        from PIL import Image
+        blank = Image.new("RGBA", (1, 1))
+        _placeholder = ctk.CTkImage(light_image=blank, dark_image=blank, size=(1, 1))
+    return _placeholder
+
 
 class FileRow(ctk.CTkFrame):
-    """Widget for displaying one file row in the list"""
-    
-    def __init__(self, master, filepath, file_index, select_callback=None):
-        super().__init__(master, fg_color="transparent", corner_radius=0, height=50)
-        self.pack(fill="x", pady=1)
+    """Widget for displaying one file row in the list
+
+    Rows are recycled by VirtualFileList: instead of building a widget
+    tree per file, a small pool of rows is re-pointed at whichever
+    FileEntry is currently scrolled into view via bind_entry().
+    """
+
+    def __init__(self, master, select_callback=None):
+        super().__init__(master, fg_color="transparent", corner_radius=0, height=ROW_HEIGHT)
         self.select_callback = select_callback
         self.is_selected = False
-        self.filepath = filepath
-        
-        filename = os.path.basename(filepath)
-        dirname = os.path.dirname(filepath)
-        if len(dirname) > 25:
-            dirname = "..." + dirname[-25:]
-        size_mb = os.path.getsize(filepath) / (1024 * 1024)
-        ext = filename.split('.')[-1].upper()
-
-        # Grid layout for the row
+        self.entry = None
+        self.index = None
+        self.thumbnail = None
+
+        # Grid layout for the row, fixed height so rows tile exactly
+        self.grid_propagate(False)
         self.grid_columnconfigure(1, weight=1)
 
-        # 1. Icon
+        # 1. Icon, replaced by a thumbnail once one is ready
         self.icon = ctk.CTkLabel(
-            self, text="🖼️", width=40, 
+            self, text="🖼️", width=40, height=36,
             text_color=COLORS["text_dark"]
         )
-        self.icon.grid(row=0, column=0, padx=5, pady=10)
+        self.icon.grid(row=0, column=0, padx=5, pady=8)
 
         # 2. Filename & Path
         self.info_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.info_frame.grid(row=0, column=1, sticky="w", padx=5)
-        
+
         self.lbl_name = ctk.CTkLabel(
-            self.info_frame, text=filename, 
-            font=("Segoe UI", 13, "bold"), 
+            self.info_frame, text="",
+            font=("Segoe UI", 13, "bold"),
             text_color=COLORS["text_main"]
         )
         self.lbl_name.pack(anchor="w")
-        
+
         self.lbl_path = ctk.CTkLabel(
-            self.info_frame, text=dirname, 
-            font=("Segoe UI", 10), 
+            self.info_frame, text="",
+            font=("Segoe UI", 10),
             text_color=COLORS["text_dark"]
         )
         self.lbl_path.pack(anchor="w")
 
         # 3. Size
         self.lbl_size = ctk.CTkLabel(
-            self, text=f"{size_mb:.1f} MB", 
-            font=("Segoe UI", 11), 
-            text_color=COLORS["text_dark"], 
+            self, text="",
+            font=("Segoe UI", 11),
+            text_color=COLORS["text_dark"],
             width=80, anchor="w"
         )
         self.lbl_size.grid(row=0, column=2, padx=5)
@@ -62,54 +76,91 @@ class FileRow(ctk.CTkFrame):
         # 4. Conversion Flow (Ext -> Target)
         self.flow_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.flow_frame.grid(row=0, column=3, padx=10)
-        
+
         self.badge_in = ctk.CTkLabel(
-            self.flow_frame, text=ext, 
-            fg_color=COLORS["bg_panel"], 
-            text_color=COLORS["text_dim"], 
-            corner_radius=4, padx=6, 
+            self.flow_frame, text="",
+            fg_color=COLORS["bg_panel"],
+            text_color=COLORS["text_dim"],
+            corner_radius=4, padx=6,
             font=("Segoe UI", 10, "bold")
         )
         self.badge_in.pack(side="left")
-        
-        ctk.CTkLabel(
-            self.flow_frame, text="→", 
-            text_color=COLORS["text_dark"], 
+
+        self.lbl_arrow = ctk.CTkLabel(
+            self.flow_frame, text="→",
+            text_color=COLORS["text_dark"],
             font=("Segoe UI", 14)
-        ).pack(side="left", padx=5)
-        
+        )
+        self.lbl_arrow.pack(side="left", padx=5)
+
         self.badge_out = ctk.CTkLabel(
-            self.flow_frame, text="...", 
-            fg_color="#312e81", 
-            text_color="#818cf8", 
-            corner_radius=4, padx=6, 
+            self.flow_frame, text="...",
+            fg_color="#312e81",
+            text_color="#818cf8",
+            corner_radius=4, padx=6,
             font=("Segoe UI", 10, "bold")
         )
         self.badge_out.pack(side="left")
 
         # 5. Status
         self.lbl_status = ctk.CTkLabel(
-            self, text="Pending", 
-            font=("Segoe UI", 11), 
-            text_color=COLORS["text_dark"], 
+            self, text="Pending",
+            font=("Segoe UI", 11),
+            text_color=COLORS["text_dark"],
             width=80, anchor="e"
         )
         self.lbl_status.grid(row=0, column=4, padx=15)
-        
+
         # Make row clickable
         self.bind("<Button-1>", self.on_click)
-        for widget in [self.icon, self.info_frame, self.lbl_name, 
-                       self.lbl_path, self.lbl_size, self.flow_frame, 
-                       self.badge_in, self.badge_out, self.lbl_status]:
+        for widget in self.child_widgets():
             widget.bind("<Button-1>", self.on_click)
-    
+
+    def child_widgets(self):
+        """Return every widget inside the row"""
+        return [self.icon, self.info_frame, self.lbl_name,
+                self.lbl_path, self.lbl_size, self.flow_frame,
+                self.badge_in, self.lbl_arrow, self.badge_out,
+                self.lbl_status]
+
+    def bind_entry(self, entry, index, selected=False, thumbnail=None):
+        """Point this row at a FileEntry, skipping unchanged labels"""
+        if entry is not self.entry:
+            self.entry = entry
+            self.lbl_name.configure(text=entry.name)
+        self.index = index
+        self._set_text(self.lbl_path, entry.detail_text())
+        self._set_text(self.badge_in, entry.source_format)
+        self.set_thumbnail(thumbnail)
+        self._set_text(self.lbl_size, entry.size_text())
+        self.update_target(entry.target_format)
+        self.set_status(entry.status)
+        self.set_selected(selected)
+
+    def set_thumbnail(self, image):
+        """Show a CTkImage preview, or the placeholder icon for None"""
+        if image is self.thumbnail:
+            return
+        self.thumbnail = image
+        if image is None:
+            self.icon.configure(image=_placeholder_image(), text="🖼️", compound="center")
+        else:
+            self.icon.configure(image=image, text="")
+
+    def _set_text(self, label, text):
+        """Configure label text only when it actually changes"""
+        if label.cget("text") != text:
+            label.configure(text=text)
+
     def on_click(self, event=None):
         """Handle click event"""
         if self.select_callback:
             self.select_callback(self, event)
-    
+
     def set_selected(self, selected):
         """Set selection state"""
+        if selected == self.is_selected:
+            return
         self.is_selected = selected
         if selected:
             self.configure(fg_color=COLORS["border"])
@@ -118,22 +169,18 @@ class FileRow(ctk.CTkFrame):
 
     def update_target(self, target_fmt):
         """Update target format badge"""
-        self.badge_out.configure(text=target_fmt)
+        self._set_text(self.badge_out, target_fmt)
 
     def set_status(self, status):
         """Update status label"""
         if status == "Done":
-            self.lbl_status.configure(
-                text="Complete ✓", 
-                text_color=COLORS["accent_green"]
-            )
+            text, color = "Complete ✓", COLORS["accent_green"]
+        elif status == "Cached":
+            text, color = "Cached ✓", COLORS["text_dim"]
         elif status == "Processing":
-            self.lbl_status.configure(
-                text="Converting...", 
-                text_color=COLORS["accent_indigo"]
-            )
+            text, color = "Converting...", COLORS["accent_indigo"]
         else:
-            self.lbl_status.configure(
-                text=status, 
-                text_color=COLORS["text_dark"]
-            )
+            text, color = status, COLORS["text_dark"]
+
+        if self.lbl_status.cget("text") != text:
+            self.lbl_status.configure(text=text, text_color=color)
@@ -0,0 +1,73 @@
+"""Thread-safe progress channel between batch workers and the UI"""
+
+import queue
+import time
+
+
+class ProgressChannel:
+    """Queue of progress events written by workers, drained by the main loop
+
+    Workers never touch widgets: they put small event tuples here and the
+    Tk main loop pulls everything queued so far once per frame, so a burst
+    of results turns into a single repaint.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def put(self, kind, *args):
+        """Queue one event (safe from any thread)"""
+        self._queue.put((kind,) + args)
+
+    def drain(self):
+        """Return every queued event without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                return events
+
+
+class ThroughputMeter:
+    """Files/s, MB/s and ETA for a running batch"""
+
+    def __init__(self, total_files):
+        self.total_files = total_files
+        self.files_done = 0
+        self.bytes_done = 0
+        self.started = time.monotonic()
+
+    def update(self, files=1, nbytes=0):
+        """Count finished files and the source bytes they covered"""
+        self.files_done += files
+        self.bytes_done += nbytes
+
+    @property
+    def elapsed(self):
+        return max(time.monotonic() - self.started, 1e-6)
+
+    @property
+    def files_per_sec(self):
+        return self.files_done / self.elapsed
+
+    @property
+    def mb_per_sec(self):
+        return self.bytes_done / (1024 * 1024) / self.elapsed
+
+    @property
+    def eta_seconds(self):
+        """Seconds left at the current rate, or None before the first file"""
+        if not self.files_done:
+            return None
+        return (self.total_files - self.files_done) / self.files_per_sec
+
+    @property
+    def fraction(self):
+        return self.files_done / self.total_files if self.total_files else 1.0
+
+    def summary(self):
+        """One-line human-readable rate and ETA"""
+        eta = self.eta_seconds
+        eta_text = "--:--" if eta is None else "%d:%02d" % divmod(int(round(eta)), 60)
+        return f"{self.files_per_sec:.1f} files/s · {self.mb_per_sec:.1f} MB/s · ETA {eta_text}"
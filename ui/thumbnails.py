@@ -0,0 +1,134 @@
+"""Background thumbnail loading for the file list"""
+
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import customtkinter as ctk
+
+from .progress import ProgressChannel
+
+# On-screen thumbnail size (cached thumbnails are twice this for HiDPI)
+DISPLAY_SIZE = 32
+
+# Threads rendering thumbnails; Pillow releases the GIL while decoding
+THUMBNAIL_WORKERS = 2
+
+# Decoded thumbnails kept in memory; the rest are reloaded from disk
+MEMORY_THUMBNAILS = 500
+
+
+class ThumbnailLoader:
+    """Renders thumbnails on worker threads for the Tk main loop
+
+    The file list asks for the paths it is showing via request(); workers
+    fetch each one from the ThumbnailCache (rendering it on a miss) and
+    queue the PNG bytes. drain(), called from the main loop, turns them
+    into CTkImages. Paths scrolled out of view before a worker reaches
+    them are skipped.
+    """
+
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: Optional ThumbnailCache (defaults to the per-user cache)
+        """
+        self.cache = cache
+        self.channel = ProgressChannel()
+        self.images = OrderedDict()
+        self.failed = set()
+        self.pending = set()
+        self.wanted = frozenset()
+        self._pool = None
+
+    @property
+    def busy(self):
+        """Whether thumbnails are still being rendered"""
+        return bool(self.pending)
+
+    def get(self, path):
+        """CTkImage for a path if one is loaded, else None"""
+        image = self.images.get(path)
+        if image is not None:
+            self.images.move_to_end(path)
+        return image
+
+    def request(self, paths):
+        """
+        Ask for thumbnails of the paths now on screen
+
+        Returns:
+            bool: Whether any new work was queued
+        """
+        self.wanted = frozenset(paths)
+        missing = [p for p in paths
+                   if p not in self.images and p not in self.pending and p not in self.failed]
+        if not missing:
+            return False
+
+        if self._pool is None:
+            # Imported here so the window opens before Pillow's codecs load
+            from core.thumbnails import ThumbnailCache
+            if self.cache is None:
+                self.cache = ThumbnailCache()
+            self._pool = ThreadPoolExecutor(THUMBNAIL_WORKERS, "prism-thumbnails")
+
+        for path in missing:
+            self.pending.add(path)
+            self._pool.submit(self._render, path)
+        return True
+
+    def _render(self, path):
+        """Fetch or render one thumbnail (runs on a worker thread)"""
+        if path not in self.wanted:
+            self.channel.put("skipped", path)
+            return
+        try:
+            data = self.cache.thumbnail(path)
+        except Exception:
+            self.channel.put("failed", path)
+        else:
+            self.channel.put("ready", path, data)
+
+    def drain(self):
+        """
+        Turn finished thumbnails into CTkImages (runs on the main loop)
+
+        Returns:
+            list: Paths whose thumbnail just became available
+        """
+        from PIL import Image
+
+        ready = []
+        for event in self.channel.drain():
+            path = event[1]
+            self.pending.discard(path)
+            if event[0] == "ready":
+                try:
+                    img = Image.open(io.BytesIO(event[2]))
+                    img.load()
+                except Exception:
+                    self.failed.add(path)
+                    continue
+                scale = DISPLAY_SIZE / max(img.size)
+                size = (max(round(img.size[0] * scale), 1), max(round(img.size[1] * scale), 1))
+                self.images[path] = ctk.CTkImage(light_image=img, dark_image=img, size=size)
+                ready.append(path)
+            elif event[0] == "failed":
+                self.failed.add(path)
+
+        while len(self.images) > MEMORY_THUMBNAILS:
+            self.images.popitem(last=False)
+        return ready
+
+    def clear(self):
+        """Forget loaded thumbnails (the disk cache is kept)"""
+        self.images.clear()
+        self.failed.clear()
+        self.wanted = frozenset()
+
+    def shutdown(self):
+        """Stop the worker threads without waiting for queued renders"""
+        self.wanted = frozenset()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)